@@ -18,16 +18,13 @@ _TWELVE_DATA_KEY = os.environ.get("TWELVE_DATA_KEY", "")
 import json
 import hashlib
 import time as _time
-from supabase import create_client, Client
+from datetime import date as _date
 
-# ─── Portfolio DB (Supabase — persistent across restarts & deployments) ────────
-_SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
-_SUPABASE_KEY = os.environ.get("SUPABASE_KEY", "")
+# ─── Portfolio DB (Supabase or local SQLite — see portfolio_store) ─────────────
+import portfolio_repo
+import portfolio_service
+import ledger
 
-def _supa() -> Client:
-    if not _SUPABASE_URL or not _SUPABASE_KEY:
-        raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in .env")
-    return create_client(_SUPABASE_URL, _SUPABASE_KEY)
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "fallback-dev-key")
 
@@ -47,16 +44,7 @@ def portfolio_identify():
     if not _re.match(r'^[A-Za-z0-9_\-]+$', username):
         return jsonify({'error': 'Only letters, numbers, _ and - allowed'}), 400
     try:
-        sb = _supa()
-        # Check if user exists
-        res = sb.table('users').select('*').ilike('username', username).execute()
-        if res.data:
-            user = res.data[0]
-        else:
-            # Insert new user
-            ts = int(_time.time())
-            ins = sb.table('users').insert({'username': username, 'created_at': ts}).execute()
-            user = ins.data[0]
+        user = portfolio_repo.identify(username)
         return jsonify({'ok': True, 'username': user['username'], 'created_at': user['created_at']})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -68,11 +56,18 @@ def portfolio_load():
     if not username:
         return jsonify({'error': 'Missing username'}), 400
     try:
-        sb = _supa()
-        res = sb.table('portfolios').select('symbol, qty, avg_price, added_at') \
-                .ilike('username', username).order('added_at').execute()
-        holdings = [{'symbol': r['symbol'], 'qty': r['qty'], 'avg': r['avg_price'], 'addedAt': r['added_at']} for r in res.data]
-        return jsonify({'holdings': holdings})
+        return jsonify({'holdings': portfolio_repo.load(username)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/portfolio/value')
+def portfolio_value():
+    """Holdings priced with batched quotes, plus INR totals (USD converted)."""
+    username = (request.args.get('username') or '').strip()
+    if not username:
+        return jsonify({'error': 'Missing username'}), 400
+    try:
+        return jsonify(portfolio_service.value(portfolio_repo.load(username)))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -88,14 +83,7 @@ def portfolio_save():
     if not username or not symbol or qty is None or avg is None:
         return jsonify({'error': 'Missing fields'}), 400
     try:
-        sb = _supa()
-        # Ensure user exists
-        sb.table('users').upsert({'username': username, 'created_at': int(_time.time())}, on_conflict='username').execute()
-        # Upsert holding
-        sb.table('portfolios').upsert({
-            'username': username, 'symbol': symbol,
-            'qty': float(qty), 'avg_price': float(avg), 'added_at': int(added_at)
-        }, on_conflict='username,symbol').execute()
+        portfolio_repo.save(username, symbol, qty, avg, added_at)
         return jsonify({'ok': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -109,71 +97,142 @@ def portfolio_delete():
     if not username or not symbol:
         return jsonify({'error': 'Missing fields'}), 400
     try:
-        sb = _supa()
-        sb.table('portfolios').delete().ilike('username', username).eq('symbol', symbol).execute()
+        portfolio_repo.delete(username, symbol)
         return jsonify({'ok': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _holding_row(h):
+    """Client holding {symbol, qty, avg, addedAt|added_at} → portfolios row (None if no symbol)."""
+    sym = (h.get('symbol') or '').strip().upper()
+    if not sym:
+        return None
+    return {'symbol': sym, 'qty': float(h.get('qty', 0)), 'avg_price': float(h.get('avg', 0)),
+            'added_at': int(h.get('addedAt') or h.get('added_at') or _time.time() * 1000)}
+
 @app.route('/api/portfolio/sync', methods=['POST'])
 def portfolio_sync():
-    """Full sync — replace all holdings for user with the provided list."""
+    """Full sync — make the stored holdings match the provided list (writes only the diff)."""
     data = request.get_json(silent=True) or {}
     username = (data.get('username') or '').strip()
     holdings = data.get('holdings', [])
     if not username:
         return jsonify({'error': 'Missing username'}), 400
     try:
-        sb = _supa()
-        sb.table('users').upsert({'username': username, 'created_at': int(_time.time())}, on_conflict='username').execute()
-        sb.table('portfolios').delete().ilike('username', username).execute()
-        rows = []
-        for h in holdings:
-            sym = (h.get('symbol') or '').strip().upper()
-            if not sym: continue
-            rows.append({'username': username, 'symbol': sym,
-                         'qty': float(h.get('qty', 0)), 'avg_price': float(h.get('avg', 0)),
-                         'added_at': int(h.get('addedAt', _time.time() * 1000))})
-        if rows:
-            sb.table('portfolios').insert(rows).execute()
-        return jsonify({'ok': True})
+        rows = [r for r in map(_holding_row, holdings) if r]
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({'error': 'Invalid holdings'}), 400
+    try:
+        return jsonify({'ok': True, **portfolio_repo.sync(username, rows)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/portfolio/batch', methods=['POST'])
+def portfolio_batch():
+    """Apply [{op: save|delete, symbol, qty, avg, added_at}, …] in one go; all ops are validated first."""
+    data = request.get_json(silent=True) or {}
+    username = (data.get('username') or '').strip()
+    ops_in   = data.get('ops')
+    if not username or not isinstance(ops_in, list) or not ops_in:
+        return jsonify({'error': 'Missing username or ops'}), 400
+    if len(ops_in) > 500:
+        return jsonify({'error': 'At most 500 ops'}), 400
+    ops = []
+    for i, o in enumerate(ops_in):
+        try:
+            kind = o.get('op')
+            if kind == 'save' and o.get('qty') is not None and o.get('avg') is not None:
+                row = _holding_row(o)
+                if row:
+                    ops.append(('save', row))
+                    continue
+            elif kind == 'delete' and (o.get('symbol') or '').strip():
+                ops.append(('delete', o['symbol'].strip().upper()))
+                continue
+        except (TypeError, ValueError, AttributeError):
+            pass
+        return jsonify({'error': f'Invalid op at index {i}'}), 400
+    try:
+        return jsonify({'ok': True, **portfolio_repo.batch(username, ops)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
+def _trade_row(t):
+    """Client trade {symbol, side, qty, price, date?} → ledger row, or None if invalid."""
+    sym  = (t.get('symbol') or '').strip().upper()
+    side = (t.get('side') or '').strip().lower()
+    qty, price = float(t.get('qty')), float(t.get('price'))
+    day  = _date.fromisoformat(str(t.get('date') or _date.today().isoformat())[:10])
+    if not sym or side not in ('buy', 'sell') or not qty > 0 or not price >= 0 or day > _date.today():
+        return None
+    return {'symbol': sym, 'side': side, 'qty': qty, 'price': price, 'date': day.isoformat()}
+
+@app.route('/api/portfolio/trades', methods=['GET', 'POST'])
+def portfolio_trades():
+    """GET: the user's ledger (optionally ?symbol=). POST {username, trades: [...]}: record buys/sells."""
+    if request.method == 'GET':
+        username = (request.args.get('username') or '').strip()
+        symbol   = (request.args.get('symbol') or '').strip().upper() or None
+        if not username:
+            return jsonify({'error': 'Missing username'}), 400
+        try:
+            return jsonify({'trades': ledger.trades(username, symbol)})
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    data = request.get_json(silent=True) or {}
+    username = (data.get('username') or '').strip()
+    trades_in = data.get('trades')
+    if not username or not isinstance(trades_in, list) or not trades_in:
+        return jsonify({'error': 'Missing username or trades'}), 400
+    if len(trades_in) > 1000:
+        return jsonify({'error': 'At most 1000 trades'}), 400
+    rows = []
+    for i, t in enumerate(trades_in):
+        try:
+            row = _trade_row(t)
+        except (TypeError, ValueError, AttributeError):
+            row = None
+        if row is None:
+            return jsonify({'error': f'Invalid trade at index {i}'}), 400
+        rows.append(row)
+    try:
+        return jsonify({'ok': True, **ledger.record(username, rows)})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-
-
+@app.route('/api/portfolio/positions')
+def portfolio_positions():
+    """Holdings derived from the trade ledger: FIFO lots, realized / unrealized P&L, STCG / LTCG."""
+    username = (request.args.get('username') or '').strip()
+    if not username:
+        return jsonify({'error': 'Missing username'}), 400
+    prices = request.args.get('prices', '1') != '0'
+    lots   = request.args.get('lots', '0') == '1'
+    try:
+        return jsonify(ledger.holdings(username, prices=prices, lots=lots))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/portfolio/debug')
 def portfolio_debug():
-    """Debug: show raw Supabase data for a username (no auth — remove in prod)."""
+    """Debug: show raw portfolio storage rows for a username (no auth — remove in prod)."""
     username = (request.args.get('username') or '').strip()
     if not username:
         return jsonify({'error': 'Pass ?username=YourName'}), 400
     try:
-        sb = _supa()
-        # Check users table
-        users = sb.table('users').select('*').ilike('username', username).execute()
-        # Check portfolios table - try without ordering first
-        portfolios = sb.table('portfolios').select('*').ilike('username', username).execute()
-        # Also try exact match
-        portfolios_exact = sb.table('portfolios').select('*').eq('username', username).execute()
-        # Get all usernames in portfolios table (first 20)
-        all_users = sb.table('portfolios').select('username').limit(20).execute()
-        return jsonify({
-            'queried_username': username,
-            'users_table': users.data,
-            'portfolios_ilike': portfolios.data,
-            'portfolios_exact': portfolios_exact.data,
-            'all_portfolio_usernames': [r['username'] for r in all_users.data],
-        })
+        return jsonify({'queried_username': username, 'backend': portfolio_repo.store().name,
+                        **portfolio_repo.debug(username)})
     except Exception as e:
         return jsonify({'error': str(e), 'type': type(e).__name__}), 500
 
 from stock_routes import stock_bp
 app.register_blueprint(stock_bp)
 
+import compute_pool
+compute_pool.start()
+
 # Initialize bots
 try:
     emi_bot = Chatterbot()
@@ -312,6 +371,14 @@ STOCK_TICKERS = {
     "nvda": "NVDA", "nvidia": "NVDA",
 }
 
+import news_service
+import news_index
+import mf_index
+import mf_service
+import mf_analytics
+news_service.configure(STOCK_TICKERS)
+news_service.start()
+
 # US symbols that must never get .NS appended
 _US_SYMBOLS = {
     'AAPL','MSFT','GOOGL','GOOG','AMZN','META','TSLA','NVDA','NFLX','AMD',
@@ -650,151 +717,61 @@ def metals():
 
 @app.route("/news")
 def news():
-    import xml.etree.ElementTree as ET
-    import html as html_lib
-    from email.utils import parsedate_to_datetime
-    from datetime import datetime, timezone, timedelta
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    FEEDS = [
-        ("https://economictimes.indiatimes.com/markets/stocks/rss.cms", "Economic Times", "#f97316"),
-        ("https://economictimes.indiatimes.com/markets/rss.cms", "Economic Times", "#f97316"),
-        ("https://www.moneycontrol.com/rss/MCtopnews.xml", "MoneyControl", "#ef4444"),
-        ("https://www.moneycontrol.com/rss/marketreports.xml", "MoneyControl", "#ef4444"),
-        ("https://www.moneycontrol.com/rss/latestnews.xml", "MoneyControl", "#ef4444"),
-        ("https://www.livemint.com/rss/markets", "Mint", "#0ea5e9"),
-        ("https://www.business-standard.com/rss/markets-106.rss", "Business Standard", "#8b5cf6"),
-        ("https://www.financialexpress.com/market/feed/", "Financial Express", "#10b981"),
-        ("https://feeds.feedburner.com/ndtvprofit-latest", "NDTV Profit", "#f59e0b"),
-        ("https://feeds.reuters.com/reuters/INbusinessNews", "Reuters", "#dc2626"),
-    ]
-    REJECT = ["ramadan","eid","bollywood","cricket","ipl","movie","weather","horoscope","celebrity","fashion","covid","vaccine","election"]
-    FINANCE = ["stock","share","market","nifty","sensex","bse","nse","rupee","rbi","sebi","ipo","fund","equity","invest","earning","profit","revenue","quarter","budget","economy","gdp","inflation","rate","bank","crore","lakh","billion","dividend","gold","silver","crude","forex"]
-    hdrs = {"User-Agent": "Mozilla/5.0", "Accept": "application/xml"}
-    cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
-    seen, all_articles = set(), []
-    def fetch_feed(url, src, color):
-        res = []
-        try:
-            r = requests.get(url, headers=hdrs, timeout=7)
-            if r.status_code != 200: return res
-            root = ET.fromstring(r.content)
-            ch = root.find("channel")
-            items = ch.findall("item") if ch is not None else root.findall("item")
-            for item in items:
-                title = html_lib.unescape(item.findtext("title","")).strip()
-                if not title: continue
-                tl = title.lower()
-                if any(k in tl for k in REJECT): continue
-                if not any(k in tl for k in FINANCE): continue
-                pub_str = item.findtext("pubDate","")
-                pub_dt = None
-                try:
-                    pub_dt = parsedate_to_datetime(pub_str)
-                    if pub_dt < cutoff: continue
-                except Exception: pass
-                link = item.findtext("link","#").strip()
-                if not link.startswith("http"):
-                    guid = item.findtext("guid","").strip()
-                    if guid.startswith("http"): link = guid
-                res.append({"title": title, "source": src, "color": color, "link": link, "published": pub_str, "pub_dt": pub_dt})
-        except Exception: pass
-        return res
-    with ThreadPoolExecutor(max_workers=6) as ex:
-        for f in as_completed({ex.submit(fetch_feed, u, n, c): None for u,n,c in FEEDS}, timeout=12):
-            try: all_articles.extend(f.result())
-            except Exception: pass
-    unique = []
-    for a in all_articles:
-        k = a["title"].lower()[:60]
-        if k not in seen:
-            seen.add(k); unique.append(a)
-    unique.sort(key=lambda x: x["pub_dt"] if x["pub_dt"] else datetime.min.replace(tzinfo=timezone.utc), reverse=True)
-    for a in unique: a.pop("pub_dt", None)
-    return jsonify(unique[:50])
+    return jsonify(news_service.latest(50))
+
+@app.route("/news/search")
+def news_search():
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"error": "Missing q"}), 400
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    results = news_index.search(q, limit)
+    return jsonify({"query": q, "count": len(results), "results": results})
 
 @app.route("/mf_list")
 def mf_list():
-    import time
-    cache = getattr(mf_list, '_cache', None)
-    if cache and (time.time() - cache['ts']) < 21600:
-        return jsonify(cache['data'])
-    CATS = [
-        ("Liquid","Liquid"),("Overnight","Overnight"),("Ultra Short","Ultra Short Duration"),
-        ("Low Duration","Low Duration"),("Short Duration","Short Duration"),("Short Term","Short Duration"),
-        ("Medium Duration","Medium Duration"),("Long Duration","Long Duration"),("Dynamic Bond","Dynamic Bond"),
-        ("Corporate Bond","Corporate Bond"),("Credit Risk","Credit Risk"),("Gilt","Gilt"),
-        ("Floating Rate","Floating Rate"),("Money Market","Money Market"),("Banking and PSU","Banking & PSU"),
-        ("Banking & PSU","Banking & PSU"),("Large & Mid Cap","Large & Mid Cap"),("Large and Mid Cap","Large & Mid Cap"),
-        ("Large Cap","Large Cap"),("Mid Cap","Mid Cap"),("Midcap","Mid Cap"),("Small Cap","Small Cap"),
-        ("Smallcap","Small Cap"),("Multi Cap","Multi Cap"),("Flexi Cap","Flexi Cap"),("Focused","Focused"),
-        ("Value","Value / Contra"),("Contra","Value / Contra"),("Dividend Yield","Dividend Yield"),
-        ("ELSS","ELSS (Tax Saving)"),("Tax Saver","ELSS (Tax Saving)"),("Infrastructure","Sectoral / Thematic"),
-        ("Technology","Sectoral / Thematic"),("Pharma","Sectoral / Thematic"),("Banking","Sectoral / Thematic"),
-        ("Nifty","Index Fund"),("Sensex","Index Fund"),("Index","Index Fund"),("ETF","ETF"),
-        ("Gold","Gold / Commodities"),("International","International / FOF"),("Overseas","International / FOF"),
-        ("Nasdaq","International / FOF"),("Fund of Fund","International / FOF"),("FOF","International / FOF"),
-        ("Feeder","International / FOF"),("Balanced Advantage","Hybrid"),("Aggressive Hybrid","Hybrid"),
-        ("Conservative Hybrid","Hybrid"),("Hybrid","Hybrid"),("Balanced","Hybrid"),("Arbitrage","Arbitrage"),
-        ("Retirement","Retirement"),("Children","Children"),
-    ]
-    def cat(name):
-        n = name.upper()
-        for kw, c in CATS:
-            if kw.upper() in n: return c
-        return "Other"
-    try:
-        r = requests.get("https://api.mfapi.in/mf", timeout=15)
-        r.raise_for_status()
-        funds = []
-        for f in r.json():
-            name = f.get("schemeName","").strip()
-            nu = name.upper()
-            if "DIRECT" not in nu or "GROWTH" not in nu: continue
-            if any(x in nu for x in ["IDCW","DIVIDEND","BONUS","PAYOUT","REINVEST","ANNUAL","MONTHLY","QUARTERLY","WEEKLY"]): continue
-            funds.append({"code": f.get("schemeCode"), "name": name, "cat": cat(name)})
-        result = {"funds": funds, "total": len(funds)}
-        mf_list._cache = {"ts": time.time(), "data": result}
-        return jsonify(result)
-    except Exception as e:
-        if cache: return jsonify(cache['data'])
-        return jsonify({"error": str(e)}), 500
+    data = mf_service.load_list()
+    return jsonify(data), (500 if "error" in data else 200)
 
 @app.route("/mf_search")
 def mf_search():
-    return jsonify([])
+    data = mf_service.load_list()
+    if "error" in data and not mf_index.ready():
+        return jsonify(data), 500
+    q = request.args.get("q", "").strip()
+    data = mf_index.search(q, request.args.get("cat"),
+                           page=request.args.get("page", 1, type=int),
+                           per_page=request.args.get("per_page", 30, type=int))
+    return jsonify(data), (500 if "error" in data else 200)
 
 @app.route("/mf_detail/<int:scheme_code>")
 def mf_detail(scheme_code):
+    data = mf_service.get_detail(scheme_code)
+    if "error" in data:
+        return jsonify(data), (404 if data["error"] == mf_service.NO_NAV else 500)
+    return jsonify(data)
+
+@app.route("/mf_compare")
+def mf_compare():
     try:
-        r = requests.get(f"https://api.mfapi.in/mf/{scheme_code}", timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        meta = data.get("meta", {})
-        nav_data = data.get("data", [])
-        if not nav_data:
-            return jsonify({"error": "No NAV data found"}), 404
-        def nav_on_date(days_ago):
-            from datetime import datetime, timedelta
-            target = datetime.now() - timedelta(days=days_ago)
-            for entry in reversed(nav_data):
-                try:
-                    if datetime.strptime(entry["date"], "%d-%m-%Y") >= target:
-                        return float(entry["nav"])
-                except: pass
-            return None
-        latest_nav = float(nav_data[0]["nav"])
-        def calc_return(days):
-            old = nav_on_date(days)
-            return round(((latest_nav - old) / old) * 100, 2) if old and old > 0 else None
-        return jsonify({
-            "schemeCode": scheme_code, "schemeName": meta.get("scheme_name",""),
-            "fundHouse": meta.get("fund_house",""), "schemeType": meta.get("scheme_type",""),
-            "schemeCategory": meta.get("scheme_category",""), "latestNAV": latest_nav,
-            "navDate": nav_data[0]["date"], "return_1y": calc_return(365),
-            "return_3y": calc_return(1095), "return_5y": calc_return(1825),
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        codes = list(dict.fromkeys(int(c) for c in request.args.get("codes", "").split(",") if c.strip()))
+    except ValueError:
+        return jsonify({"error": "codes must be scheme numbers"}), 400
+    if not codes:
+        return jsonify({"error": "Missing codes"}), 400
+    if len(codes) > mf_analytics.MAX_COMPARE:
+        return jsonify({"error": f"At most {mf_analytics.MAX_COMPARE} schemes"}), 400
+    growth = request.args.get("growth", "").lower() in ("1", "true", "yes")
+    max_points = min(max(request.args.get("max_points", 500, type=int), 2), 5000)
+    data = mf_analytics.compare(codes, growth, max_points)
+    return jsonify(data), (502 if "error" in data else 200)
+
+@app.route("/mf_analytics/<int:scheme_code>")
+def mf_analytics_route(scheme_code):
+    data = mf_analytics.get_analytics(scheme_code)
+    if "error" in data:
+        return jsonify(data), (404 if data["error"] == mf_service.NO_NAV else 500)
+    return jsonify(data)
 
 # ── Groq AI Integration ───────────────────────────────────────────────────────
 import re as _re
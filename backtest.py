@@ -0,0 +1,118 @@
+"""
+backtest.py — vectorized rule-strategy backtests over the daily candle store.
+
+Python entry point:  run_backtest(symbols, strategy, params, years, cost_bps)
+HTTP:                /si/backtest?symbols=TCS.NS,INFY.NS&strategy=sma_cross&fast=20&slow=50
+
+Closes for every symbol are aligned into one (days × symbols) matrix
+(candle_store.align_closes) and every step — indicators, signals, positions,
+PnL, equity and statistics — is a whole-matrix NumPy/pandas operation, so a
+20-year run over 50 symbols is a handful of array passes. The engine
+(kernels.run_rules / run_sip) runs on a compute_pool worker; the aligned
+matrix reaches it through shared memory.
+
+Strategies (long/flat, one unit of capital per symbol, equal-weight portfolio
+rebalanced daily across symbols that have data that day):
+  sma_cross  long while SMA(fast) > SMA(slow)              fast=20 slow=50
+  ema_cross  long while EMA(fast) > EMA(slow)              fast=12 slow=26
+  rsi        enter when RSI(period) < lower, exit > upper  period=14 lower=30 upper=70
+  sip        buy `amount` on the first trading day of each month, never sell
+             (reports invested / value / XIRR instead of CAGR & Sharpe)
+
+Signals act on the next bar (no look-ahead); cost_bps is charged on every
+change of position.
+"""
+
+import numpy as np
+
+import candle_store as cs
+import compute_pool as cp
+import stock_service as ss
+from kernels import run_rules, run_sip
+
+MAX_SYMBOLS = 50
+
+STRATEGIES = {
+    "sma_cross": {"fast": 20, "slow": 50},
+    "ema_cross": {"fast": 12, "slow": 26},
+    "rsi":       {"period": 14, "lower": 30.0, "upper": 70.0},
+    "sip":       {"amount": 10000.0},
+}
+
+
+def _params(strategy, params):
+    """Defaults merged with caller params, coerced to the defaults' types."""
+    out = dict(STRATEGIES[strategy])
+    for k, v in (params or {}).items():
+        if k in out and v is not None:
+            out[k] = type(out[k])(v)
+    if strategy.endswith("_cross") and not 1 <= out["fast"] < out["slow"] <= 400:
+        raise ValueError("Need 1 <= fast < slow <= 400")
+    if strategy == "rsi" and not (2 <= out["period"] <= 400 and 0 <= out["lower"] < out["upper"] <= 100):
+        raise ValueError("Need 2 <= period <= 400 and 0 <= lower < upper <= 100")
+    if strategy == "sip" and out["amount"] <= 0:
+        raise ValueError("amount must be positive")
+    return out
+
+
+# ── Output ────────────────────────────────────────────────────────────────────
+
+def _thin(days, values, max_points):
+    """Evenly spaced samples of a curve (always keeping the last point)."""
+    n = len(values)
+    if max_points and n > max_points:
+        idx = np.unique(np.r_[np.linspace(0, n - 1, max_points).astype(np.int64), n - 1])
+        days, values = days[idx], values[idx]
+    return {
+        "time":  [str(d) for d in days.astype("datetime64[D]")],
+        "value": np.round(values, 4).tolist(),
+    }
+
+
+# ── Public API ────────────────────────────────────────────────────────────────
+
+def run_backtest(symbols, strategy="sma_cross", params=None, years=10,
+                 cost_bps=10.0, max_points=500):
+    """
+    Backtest `strategy` on the symbols' cached daily closes over the last
+    `years` years. Returns portfolio + per-symbol statistics and a thinned
+    portfolio equity curve (value of 1.0 invested; rupees/dollars for sip).
+    Raises ValueError for an unknown strategy or invalid params.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    p = _params(strategy, params)
+    try:
+        symbols = list(dict.fromkeys(symbols))
+
+        ss.prefetch_daily(symbols)
+        series  = {s: ss.get_daily_series(s) for s in symbols}
+        missing = [s for s, a in series.items() if not len(a)]
+        series  = {s: a for s, a in series.items() if len(a)}
+        if not series:
+            return {"error": "No price history", "missing": missing}
+
+        last  = max(int(cs.trading_days(a["time"][-1:])[0]) for a in series.values())
+        syms, days, closes = cs.align_closes(series, last - int(years * 365.25), pad=True)
+        if len(days) < 2:
+            return {"error": "Not enough history"}
+
+        if strategy == "sip":
+            curve, result = cp.run(run_sip, p, syms, days, closes)
+        else:
+            curve, result = cp.run(run_rules, strategy, p, syms, days, closes, cost_bps / 10000)
+
+        result.update({
+            "strategy": strategy,
+            "params":   p,
+            "symbols":  syms,
+            "missing":  missing,
+            "start":    str(days[0].astype("datetime64[D]")),
+            "end":      str(days[-1].astype("datetime64[D]")),
+            "equity":   _thin(days, curve, max_points),
+        })
+        return result
+    except (cp.PoolBusy, cp.TaskTimeout):
+        raise
+    except Exception as e:
+        return {"error": str(e)}
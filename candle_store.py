@@ -0,0 +1,310 @@
+"""
+candle_store.py — persistent local OHLCV store for stock_service.get_candles().
+
+One memory-mappable .npy file per (symbol, interval), holding a structured
+array with fields time/open/high/low/close/volume sorted by time.
+
+  - load()  opens the file with mmap_mode='r' — no parse, no copy
+  - merge() appends freshly fetched bars, overwriting any overlap (the last
+    stored bar is usually still forming and gets re-fetched on every sync);
+    rebased() tells the caller when the overlap no longer matches and the
+    series has to be fetched in full instead
+  - files are written to a temp path and os.replace()d, so readers holding
+    an old mmap never see a half-written file
+  - the file mtime doubles as "last synced" so refresh throttling survives
+    restarts
+
+Directory: $CANDLE_STORE_DIR or ./data/candles next to this file.
+"""
+
+import os
+import re
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+
+CANDLE_DTYPE = np.dtype([
+    ("time",   "<i8"),
+    ("open",   "<f8"),
+    ("high",   "<f8"),
+    ("low",    "<f8"),
+    ("close",  "<f8"),
+    ("volume", "<i8"),
+])
+
+# File format version, part of the file name. v1 files stored exchange
+# wall-clock seconds instead of unix time; they are ignored (and removed on
+# the first save) so every series is re-fetched once.
+FORMAT = 2
+
+_DIR = os.environ.get(
+    "CANDLE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "candles"),
+)
+
+_locks: dict = {}
+_locks_guard = threading.Lock()
+
+
+def empty():
+    return np.empty(0, dtype=CANDLE_DTYPE)
+
+
+def _path(symbol, interval, version=FORMAT):
+    # ^NSEI, GC=F, M&M.NS … → filesystem-safe names
+    safe = re.sub(r"[^A-Za-z0-9._-]", "_", symbol.upper())
+    suffix = f".v{version}" if version > 1 else ""
+    return os.path.join(_DIR, f"{safe}__{interval}{suffix}.npy")
+
+
+def lock(symbol, interval):
+    """Per-(symbol, interval) lock so concurrent syncs don't both hit Yahoo."""
+    key = (symbol.upper(), interval)
+    with _locks_guard:
+        lk = _locks.get(key)
+        if lk is None:
+            lk = _locks[key] = threading.Lock()
+    return lk
+
+
+def load(symbol, interval):
+    """Stored bars for (symbol, interval), memory-mapped read-only. Empty if none."""
+    p = _path(symbol, interval)
+    try:
+        arr = np.load(p, mmap_mode="r")
+        return arr if arr.dtype == CANDLE_DTYPE else empty()
+    except (FileNotFoundError, ValueError, OSError):
+        return empty()
+
+
+def age(symbol, interval):
+    """Seconds since the store was last synced (inf if never)."""
+    try:
+        return time.time() - os.path.getmtime(_path(symbol, interval))
+    except OSError:
+        return float("inf")
+
+
+def touch(symbol, interval):
+    """Mark as synced without rewriting (upstream had nothing new)."""
+    try:
+        os.utime(_path(symbol, interval))
+    except OSError:
+        pass
+
+
+def save(symbol, interval, arr):
+    os.makedirs(_DIR, exist_ok=True)
+    p   = _path(symbol, interval)
+    tmp = f"{p}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(arr, dtype=CANDLE_DTYPE))
+    os.replace(tmp, p)
+    try:
+        os.remove(_path(symbol, interval, version=1))     # superseded v1 file
+    except OSError:
+        pass
+
+
+def merge(symbol, interval, new, keep_after=None):
+    """
+    Append `new` bars to the stored series and persist.
+    Stored bars at or after new[0].time are replaced by the fresh copy.
+    keep_after (unix s) drops older bars — used to bound intraday files.
+    Returns the merged in-memory array.
+    """
+    old = load(symbol, interval)
+    if len(new):
+        cut    = np.searchsorted(old["time"], new["time"][0], side="left")
+        merged = np.concatenate([old[:cut], new])
+    else:
+        merged = np.array(old)
+    if keep_after is not None and len(merged):
+        merged = merged[np.searchsorted(merged["time"], keep_after, side="left"):]
+    save(symbol, interval, merged)
+    return merged
+
+
+def rebased(old, new, rtol=1e-4):
+    """
+    True if `new` disagrees with the stored closes it overlaps. Yahoo's
+    auto-adjusted history is re-based after a split or dividend, so a delta
+    can't simply be appended then. The last stored bar is left out: it may
+    have been stored while still forming.
+    """
+    if len(old) < 2 or not len(new):
+        return False
+    _, io, inew = np.intersect1d(old["time"][:-1], new["time"], return_indices=True)
+    if not len(io):
+        return False
+    return not np.allclose(new["close"][inew], old["close"][io], rtol=rtol, atol=0)
+
+
+def from_history(hist):
+    """
+    yfinance .history() DataFrame → CANDLE_DTYPE array, fully vectorized.
+    Rows without a close are dropped; missing O/H/L fall back to close and
+    missing volume to 0.
+    """
+    if hist is None or hist.empty:
+        return empty()
+    # true unix seconds whatever the exchange tz (naive indexes are UTC)
+    idx = pd.DatetimeIndex(hist.index)
+    idx = idx.tz_localize("UTC") if idx.tz is None else idx.tz_convert("UTC")
+    t   = ((idx - pd.Timestamp("1970-01-01", tz="UTC")) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+
+    close = hist["Close"].to_numpy(dtype=np.float64)
+    ok    = ~np.isnan(close)
+
+    out = np.empty(int(ok.sum()), dtype=CANDLE_DTYPE)
+    out["time"]  = t[ok]
+    out["close"] = close[ok]
+    for col, field in (("Open", "open"), ("High", "high"), ("Low", "low")):
+        v = hist[col].to_numpy(dtype=np.float64)[ok]
+        out[field] = np.where(np.isnan(v), out["close"], v)
+    vol = hist["Volume"].to_numpy(dtype=np.float64)[ok]
+    out["volume"] = np.nan_to_num(vol, nan=0.0).astype(np.int64)
+
+    # yfinance occasionally repeats the live bar; keep the last copy of each time
+    if len(out) > 1:
+        order = np.argsort(out["time"], kind="stable")
+        out   = out[order]
+        keep  = np.append(out["time"][1:] != out["time"][:-1], True)
+        out   = out[keep]
+    return out
+
+
+# ── Resampling ────────────────────────────────────────────────────────────────
+# Coarser bars are derived from a stored base series instead of being fetched.
+# Each helper returns one bucket key per bar; resample() folds runs of equal
+# keys into a single OHLCV bar (first open, max high, min low, last close,
+# summed volume) with ufunc.reduceat — no Python-level loop over bars.
+
+def intraday_keys(t, step):
+    """
+    Fixed-width buckets of `step` seconds anchored at each session's first bar,
+    so NSE hourly bars start at 09:15 like Yahoo's own 1h bars do.
+    Sessions are split by UTC day (NSE and US sessions don't cross UTC midnight).
+    """
+    day      = t // 86400
+    starts   = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    day_open = np.repeat(t[starts], np.diff(np.r_[starts, len(t)]))
+    return day_open + (t - day_open) // step * step
+
+
+def trading_days(t):
+    # Daily bars are stamped at local midnight (18:30 UTC the day before for
+    # NSE, 04:00/05:00 UTC for US). Rounding to the nearest UTC day recovers
+    # the trading date for any exchange within ±12 h of UTC.
+    return (t + 43200) // 86400
+
+
+def week_keys(t):
+    """Monday-start calendar weeks (1970-01-01 was a Thursday)."""
+    return (trading_days(t) + 3) // 7
+
+
+def month_keys(t):
+    return trading_days(t).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def align_closes(series, start_day, pad=False):
+    """
+    {symbol: daily array} → (symbols, days, closes[days × symbols]) on the union
+    of the symbols' trading dates from start_day on, carrying each close
+    forward over dates that symbol didn't trade. Symbols whose history starts
+    after the first aligned date are dropped, or with pad=True kept with NaN
+    before their first close.
+    """
+    day_sets = {s: trading_days(a["time"]) for s, a in series.items()}
+    calendar = np.unique(np.concatenate([d[d >= start_day] for d in day_sets.values()]))
+    if not len(calendar):
+        return [], calendar, np.empty((0, 0))
+
+    syms, cols = [], []
+    for s, a in series.items():
+        idx = np.searchsorted(day_sets[s], calendar, side="right") - 1
+        if idx[0] < 0 and not pad:
+            continue                      # history starts inside the window
+        col = np.asarray(a["close"], dtype=np.float64)[np.maximum(idx, 0)]
+        syms.append(s)
+        cols.append(np.where(idx < 0, np.nan, col))
+    closes = np.column_stack(cols) if cols else np.empty((len(calendar), 0))
+    return syms, calendar, closes
+
+
+def resample(arr, keys):
+    """Aggregate bars sharing a bucket key; bar time is the first bar's time."""
+    if len(arr) < 2:
+        return np.array(arr)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends   = np.r_[starts[1:], len(arr)] - 1
+    out = np.empty(len(starts), dtype=CANDLE_DTYPE)
+    out["time"]   = arr["time"][starts]
+    out["open"]   = arr["open"][starts]
+    out["high"]   = np.maximum.reduceat(arr["high"], starts)
+    out["low"]    = np.minimum.reduceat(arr["low"], starts)
+    out["close"]  = arr["close"][ends]
+    out["volume"] = np.add.reduceat(arr["volume"], starts)
+    return out
+
+
+def downsample(arr, max_points):
+    """
+    OHLC-aware min/max bucketing: split the series into at most `max_points`
+    runs of consecutive bars and fold each run into one bar. Each bucket keeps
+    its true high and low, so spikes survive however far the series shrinks.
+    """
+    n = len(arr)
+    if not max_points or n <= max_points:
+        return arr
+    return resample(arr, bucket_keys(n, max_points))
+
+
+def bucket_keys(n, max_points):
+    """Bucket id per bar for downsample(); shared so overlays line up with bars."""
+    return np.arange(n, dtype=np.int64) * max_points // n
+
+
+# ── Serialization ─────────────────────────────────────────────────────────────
+# Whole-column conversions: one np.round + tolist per field instead of a
+# float()/round() per cell. Bars with a non-finite close are dropped in bulk.
+
+def _columns(arr):
+    arr = arr[np.isfinite(arr["close"])]
+    return (
+        arr["time"].tolist(),
+        np.round(arr["open"],  2).tolist(),
+        np.round(arr["high"],  2).tolist(),
+        np.round(arr["low"],   2).tolist(),
+        np.round(arr["close"], 2).tolist(),
+        arr["volume"].tolist(),
+    )
+
+
+def to_records(arr):
+    """List of {time, open, high, low, close, volume} dicts (legacy payload)."""
+    keys = ("time", "open", "high", "low", "close", "volume")
+    return [dict(zip(keys, row)) for row in zip(*_columns(arr))]
+
+
+def to_columnar(arr, delta=False):
+    """
+    Parallel arrays. With delta=True, `time` holds the first timestamp followed
+    by successive differences — mostly one repeated small number, which is far
+    shorter as JSON than ten-digit epochs. Decode with a running sum.
+    """
+    t, o, h, l, c, v = _columns(arr)
+    if delta and t:
+        t = np.diff(np.asarray(t, dtype=np.int64), prepend=0).tolist()
+    return {
+        "time":   t,
+        "open":   o,
+        "high":   h,
+        "low":    l,
+        "close":  c,
+        "volume": v,
+        "time_encoding": "delta" if delta else "absolute",
+    }
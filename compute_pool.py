@@ -0,0 +1,302 @@
+"""
+compute_pool.py — process pool for CPU-heavy analytics.
+
+Indicator maths, correlation matrices and backtests are pure NumPy/pandas
+work that holds the GIL; on a single gunicorn worker they would stall
+I/O-bound endpoints like /si/quote and /market. They run here instead:
+
+    compute_pool.start()                        # once, from app.py
+    result = compute_pool.run(fn, arr, x=1)     # submit + wait
+    task   = compute_pool.submit(fn, arr)       # … or submit now,
+    result = task.result()                      #     wait later
+
+  - fn must be a module-level function (it is pickled by reference)
+  - ndarray arguments of SHM_MIN_BYTES or more travel through
+    multiprocessing.shared_memory — the child maps the same pages instead of
+    unpickling a copy; smaller arrays are cheaper to pickle
+  - at most MAX_PENDING tasks may be queued or running; beyond that submit()
+    raises PoolBusy so callers can answer 503 instead of piling up
+  - result() raises TaskTimeout after the task's timeout. A task that is
+    still queued is cancelled; one that is already running can't be
+    interrupted, so its worker and its MAX_PENDING slot stay busy until it
+    finishes. Once every worker is stuck on a timed-out task the pool is
+    recycled: its processes are terminated, which frees their slots, and a
+    fresh pool takes over
+  - if a worker dies (e.g. OOM-killed) the executor is broken for good; the
+    next submit or result that sees BrokenProcessPool replaces it and the
+    task is retried once on the new pool
+  - workers should only import light modules: functions live in kernels.py /
+    fin_math.py (NumPy and pandas), never in modules that import
+    stock_service, so a spawned child doesn't load yfinance and curl_cffi
+
+If start() was never called (scripts, a REPL, spawned children) tasks simply
+run inline in the calling thread.
+
+Env: COMPUTE_WORKERS (default: usable CPU cores — the affinity mask capped by
+the cgroup CPU quota), COMPUTE_MAX_PENDING (default: 4 × workers),
+COMPUTE_TIMEOUT (default 30 s).
+"""
+
+import os
+import math
+import atexit
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as _FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+SHM_MIN_BYTES   = 64 * 1024
+DEFAULT_TIMEOUT = float(os.environ.get("COMPUTE_TIMEOUT", 30))
+
+_executor = None
+_workers  = 0
+_slots    = None
+_stuck    = 0          # timed-out tasks still running on the current executor
+_lock     = threading.Lock()
+
+
+class PoolBusy(RuntimeError):
+    """Too many analytics tasks queued — try again shortly."""
+
+
+class TaskTimeout(TimeoutError):
+    """An analytics task exceeded its timeout."""
+
+
+def _cgroup_cpus():
+    """CPU quota of this container (cgroup v2, then v1), or None if unlimited."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return float(quota) / float(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = float(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = float(f.read())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def _cores():
+    try:
+        n = len(os.sched_getaffinity(0))
+    except AttributeError:
+        n = os.cpu_count() or 1
+    quota = _cgroup_cpus()
+    if quota:
+        n = min(n, max(1, math.ceil(quota)))
+    return n
+
+
+def _new_executor():
+    # spawn: the parent runs request/poller threads, which fork doesn't mix with
+    return ProcessPoolExecutor(max_workers=_workers, mp_context=mp.get_context("spawn"))
+
+
+def start(workers=None):
+    """Start the pool (idempotent). Skipped inside pool children."""
+    global _executor, _workers, _slots
+    if mp.parent_process() is not None:
+        return
+    with _lock:
+        if _executor is not None:
+            return
+        n = workers or int(os.environ.get("COMPUTE_WORKERS", 0)) or _cores()
+        pending = int(os.environ.get("COMPUTE_MAX_PENDING", 0)) or n * 4
+        _workers  = n
+        _executor = _new_executor()
+        _slots    = threading.BoundedSemaphore(pending)
+        atexit.register(shutdown)
+        print(f"✅ Compute pool started: {n} worker(s), {pending} max pending")
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        ex, _executor = _executor, None
+    if ex is not None:
+        ex.shutdown(wait=False, cancel_futures=True)
+
+
+def is_running():
+    return _executor is not None
+
+
+def _replace(old, terminate=False):
+    """Swap in a fresh executor if `old` is still the current one."""
+    global _executor, _stuck
+    with _lock:
+        if _executor is not old or old is None:
+            return
+        _executor, _stuck = _new_executor(), 0
+    if terminate:
+        kill = getattr(old, "terminate_workers", None)          # Python 3.14+
+        if kill is not None:
+            kill()
+        else:
+            for proc in list((getattr(old, "_processes", None) or {}).values()):
+                proc.terminate()
+    old.shutdown(wait=False, cancel_futures=True)
+    print(f"  ⚠ Compute pool {'recycled (workers stuck on timed-out tasks)' if terminate else 'restarted after a worker died'}")
+
+
+def _timed_out(ex, future):
+    """A running task overran: recycle the pool once every worker is stuck."""
+    global _stuck
+    with _lock:
+        if _executor is not ex or future.done():
+            return
+        _stuck += 1
+        recycle = _stuck >= _workers
+
+    def _finished(_):
+        global _stuck
+        with _lock:
+            if _executor is ex and _stuck > 0:
+                _stuck -= 1
+    future.add_done_callback(_finished)
+    if recycle:
+        _replace(ex, terminate=True)
+
+
+# ── Shared-memory argument passing ────────────────────────────────────────────
+
+class _ShmArray:
+    """Picklable handle for an ndarray placed in a shared memory block."""
+
+    def __init__(self, arr):
+        arr = np.ascontiguousarray(arr)
+        self.shape, self.dtype = arr.shape, arr.dtype
+        self._shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        self.name = self._shm.name
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=self._shm.buf)[...] = arr
+
+    def __getstate__(self):
+        return {"name": self.name, "shape": self.shape, "dtype": self.dtype}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._shm = None
+
+    def release(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+def _pack(v, handles):
+    if isinstance(v, np.ndarray) and v.nbytes >= SHM_MIN_BYTES and not v.dtype.hasobject:
+        h = _ShmArray(v)
+        handles.append(h)
+        return h
+    return v
+
+
+def _call(fn, args, kwargs):
+    """Runs in the worker: map shared-memory args, call fn, detach."""
+    opened = []
+
+    def unpack(v):
+        if isinstance(v, _ShmArray):
+            # track=False: the parent owns (and unlinks) the block
+            try:
+                shm = shared_memory.SharedMemory(name=v.name, track=False)
+            except TypeError:                      # Python < 3.13
+                shm = shared_memory.SharedMemory(name=v.name)
+            opened.append(shm)
+            return np.ndarray(v.shape, dtype=v.dtype, buffer=shm.buf)
+        return v
+
+    try:
+        return fn(*[unpack(a) for a in args], **{k: unpack(v) for k, v in kwargs.items()})
+    finally:
+        for shm in opened:
+            try:
+                shm.close()
+            except BufferError:
+                pass   # a view escaped into the result; the mapping dies with the task
+
+
+# ── Submit / await ────────────────────────────────────────────────────────────
+
+class Task:
+    def __init__(self, future=None, value=None, error=None, timeout=DEFAULT_TIMEOUT,
+                 executor=None, retry=None):
+        self._future, self._value, self._error, self._timeout = future, value, error, timeout
+        self._executor, self._retry = executor, retry
+
+    def result(self, timeout=None):
+        if self._future is None:
+            if self._error is not None:
+                raise self._error
+            return self._value
+        try:
+            return self._future.result(timeout=timeout or self._timeout)
+        except _FutureTimeout:
+            if not self._future.cancel():
+                _timed_out(self._executor, self._future)
+            raise TaskTimeout(f"analytics task exceeded {timeout or self._timeout:g} s")
+        except BrokenProcessPool:
+            if self._retry is None:
+                raise
+            _replace(self._executor)
+            return self._retry().result(timeout)
+
+
+def _submit_once(ex, fn, args, kwargs):
+    if not _slots.acquire(blocking=False):
+        raise PoolBusy("analytics workers are busy")
+
+    handles = []
+    try:
+        a  = [_pack(v, handles) for v in args]
+        kw = {k: _pack(v, handles) for k, v in kwargs.items()}
+        future = ex.submit(_call, fn, a, kw)
+    except BaseException:
+        for h in handles:
+            h.release()
+        _slots.release()
+        raise
+
+    def _done(_):
+        for h in handles:
+            h.release()
+        _slots.release()
+    future.add_done_callback(_done)
+    return future
+
+
+def submit(fn, *args, timeout=None, _retry=True, **kwargs):
+    """Queue fn(*args, **kwargs) on the pool. Raises PoolBusy when saturated."""
+    timeout = timeout or DEFAULT_TIMEOUT
+    ex = _executor
+    if ex is None:
+        try:
+            return Task(value=fn(*args, **kwargs), timeout=timeout)
+        except Exception as e:
+            return Task(error=e, timeout=timeout)
+
+    try:
+        future = _submit_once(ex, fn, args, kwargs)
+    except BrokenProcessPool:
+        if not _retry:
+            raise
+        _replace(ex)
+        return submit(fn, *args, timeout=timeout, _retry=False, **kwargs)
+    retry = (lambda: submit(fn, *args, timeout=timeout, _retry=False, **kwargs)) if _retry else None
+    return Task(future=future, timeout=timeout, executor=ex, retry=retry)
+
+
+def run(fn, *args, timeout=None, **kwargs):
+    """submit() and wait for the result."""
+    return submit(fn, *args, timeout=timeout, **kwargs).result()
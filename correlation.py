@@ -0,0 +1,90 @@
+"""
+correlation.py — return correlation / covariance for a basket of symbols.
+
+Daily closes come from the shared candle store (missing or stale histories
+are filled with one batched yf.download via stock_service.prefetch_daily),
+are aligned on the union of their trading dates and turned into one
+(days × symbols) log-return matrix, so both matrices come out of a single
+np.corrcoef / np.cov call instead of per-pair work. That call runs on a
+compute_pool worker, with the close matrix passed through shared memory.
+
+Closes are carried forward across dates a symbol didn't trade (e.g. an NSE
+holiday in a mixed NSE/US basket), giving it a zero return that day.
+Results are memoized per (symbol set, window, last bar date).
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import candle_store as cs
+import compute_pool as cp
+import stock_service as ss
+from kernels import correlation_matrices
+
+MAX_SYMBOLS = 100
+MIN_OBSERVATIONS = 20
+
+WINDOW_DAYS = {"3M": 92, "6M": 183, "1Y": 366, "3Y": 365 * 3 + 1, "5Y": 365 * 5 + 2}
+
+_MEMO_MAX = 256
+_memo: OrderedDict = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def compute(series, window="1Y"):
+    """Correlation and annualized covariance of daily log returns over `window`."""
+    last  = max(int(cs.trading_days(a["time"][-1:])[0]) for a in series.values())
+    start = last - WINDOW_DAYS[window]
+    syms, days, closes = cs.align_closes(series, start)
+    if len(syms) < 2:
+        return {"error": "Not enough overlapping history"}
+
+    ok, corr, cov, n_obs = cp.run(correlation_matrices, closes, MIN_OBSERVATIONS)
+    if corr is None:
+        return {"error": "Not enough overlapping history"}
+    syms = [s for s, keep in zip(syms, ok) if keep]
+    vol  = np.sqrt(np.diag(cov))
+    return {
+        "symbols":      syms,
+        "window":       window,
+        "observations": int(n_obs),
+        "start":        str(np.datetime64(int(days[0]), "D")),
+        "end":          str(np.datetime64(int(days[-1]), "D")),
+        "correlation":  np.round(corr, 4).tolist(),
+        "covariance":   np.round(cov, 6).tolist(),
+        "volatility":   np.round(vol, 4).tolist(),
+    }
+
+
+def get_correlation(symbols, window="1Y"):
+    symbols = list(dict.fromkeys(symbols))
+    try:
+        ss.prefetch_daily(symbols)
+        series  = {s: ss.get_daily_series(s) for s in symbols}
+        missing = [s for s, a in series.items() if not len(a)]
+        series  = {s: a for s, a in series.items() if len(a)}
+        if len(series) < 2:
+            return {"error": "Need at least two symbols with price history", "missing": missing}
+
+        key = (frozenset(series), window,
+               max(int(a["time"][-1]) for a in series.values()))
+        with _memo_lock:
+            hit = _memo.get(key)
+            if hit is not None:
+                _memo.move_to_end(key)
+                return hit
+
+        data = compute(series, window)
+        if "error" not in data:
+            data["missing"] = missing + [s for s in series if s not in data["symbols"]]
+            with _memo_lock:
+                _memo[key] = data
+                while len(_memo) > _MEMO_MAX:
+                    _memo.popitem(last=False)
+        return data
+    except (cp.PoolBusy, cp.TaskTimeout):
+        raise
+    except Exception as e:
+        return {"error": str(e)}
@@ -0,0 +1,116 @@
+"""
+derived_metrics.py — price-derived metrics from the local daily candle store.
+
+Everything here comes from stock_service.get_daily_series(), which keeps the
+full daily history in candle_store, so none of it costs a Twelve Data or
+Yahoo fundamentals call:
+
+  week52_high / week52_low       max high / min low over the last 365 days
+  return_1m / 3m / 1y / 3y       close-to-close, as decimals (0.12 = 12%)
+  volatility                     annualized stdev of 1Y daily log returns
+  max_drawdown                   worst peak-to-trough over 1Y, as a negative decimal
+  beta                           1Y daily-return beta vs NIFTY 50 (INR) or S&P 500 (USD)
+
+Results are memoized per (symbol, last bar time, benchmark last bar time).
+"""
+
+import threading
+
+import numpy as np
+
+import candle_store as cs
+import stock_service as ss
+
+_BENCHMARK = {"INR": "^NSEI", "USD": "^GSPC"}
+_TRADING_DAYS = 252
+
+_memo: dict = {}
+_memo_lock = threading.Lock()
+
+
+def benchmark_for(symbol):
+    return _BENCHMARK.get(ss._symbol_currency(symbol), "^GSPC")
+
+
+def _close_on_or_before(days, close, target_day):
+    i = np.searchsorted(days, target_day, side="right") - 1
+    return close[i] if i >= 0 else np.nan
+
+
+def _ret(days, close, span_days):
+    if not len(close):
+        return None
+    past = _close_on_or_before(days, close, days[-1] - span_days)
+    if not past or np.isnan(past):
+        return None
+    # history shorter than the span → no return rather than a partial one
+    if days[0] > days[-1] - span_days:
+        return None
+    return float(close[-1] / past - 1)
+
+
+def _r(v, d=4):
+    return None if v is None or not np.isfinite(v) else round(float(v), d)
+
+
+def compute(arr, bench=None):
+    """Metrics dict from a daily CANDLE_DTYPE array (and optional benchmark array)."""
+    if not len(arr):
+        return {}
+    days  = cs.trading_days(arr["time"])
+    close = np.asarray(arr["close"], dtype=np.float64)
+
+    yr   = np.searchsorted(days, days[-1] - 365, side="left")
+    c1y  = close[yr:]
+    out  = {
+        "week52_high": _r(np.max(arr["high"][yr:]), 2),
+        "week52_low":  _r(np.min(arr["low"][yr:]), 2),
+        "return_1m":   _r(_ret(days, close, 30)),
+        "return_3m":   _r(_ret(days, close, 91)),
+        "return_1y":   _r(_ret(days, close, 365)),
+        "return_3y":   _r(_ret(days, close, 365 * 3)),
+        "volatility":  None,
+        "max_drawdown": None,
+        "beta":        None,
+    }
+
+    # bad ticks (zero/negative closes) become NaN and fall out through _r()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if len(c1y) >= 20:
+            lr = np.diff(np.log(c1y))
+            out["volatility"]   = _r(lr.std(ddof=1) * np.sqrt(_TRADING_DAYS))
+            out["max_drawdown"] = _r(np.min(c1y / np.maximum.accumulate(c1y) - 1))
+
+        if bench is not None and len(bench):
+            bdays = cs.trading_days(bench["time"])
+            common, ia, ib = np.intersect1d(days[yr:], bdays, assume_unique=True, return_indices=True)
+            if len(common) >= 20:
+                ra = np.diff(np.log(c1y[ia]))
+                rb = np.diff(np.log(np.asarray(bench["close"], dtype=np.float64)[ib]))
+                var = rb.var(ddof=1)
+                if var > 0:
+                    out["beta"] = _r(np.cov(ra, rb, ddof=1)[0, 1] / var, 3)
+    return out
+
+
+def get_derived_metrics(symbol):
+    """Memoized derived metrics for a symbol ({} if there is no daily history)."""
+    try:
+        arr = ss.get_daily_series(symbol)
+        if not len(arr):
+            return {}
+        bsym  = benchmark_for(symbol)
+        bench = ss.get_daily_series(bsym) if bsym != symbol else arr
+        key = (symbol, int(arr["time"][-1]), int(bench["time"][-1]) if len(bench) else 0)
+        with _memo_lock:
+            hit = _memo.get(symbol)
+            if hit and hit[0] == key:
+                return hit[1]
+        data = compute(arr, bench)
+        data["benchmark"] = bsym
+        with _memo_lock:
+            _memo[symbol] = (key, data)
+        return data
+    except Exception as e:
+        print(f"  ⚠ Derived metrics failed for {symbol}: {e}")
+        return {}
@@ -0,0 +1,33 @@
+"""
+fin_math.py — small return calculations shared by the stock and mutual fund
+analytics. NumPy only, so importing it pulls in nothing else.
+"""
+
+import numpy as np
+
+
+def xirr(days, flows):
+    """
+    Annualized money-weighted return for dated cash flows (days since epoch).
+    Bisection on NPV — slower than Newton but can't diverge on long SIP
+    histories. None if the flows don't change sign.
+    """
+    t = (np.asarray(days, dtype=np.float64) - days[0]) / 365.25
+    f = np.asarray(flows, dtype=np.float64)
+
+    def npv(rate):
+        with np.errstate(over="ignore"):
+            return np.sum(f * (1 + rate) ** -t)
+
+    lo, hi = -0.99, 10.0
+    if not npv(lo) > 0 > npv(hi):
+        return None
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if npv(mid) > 0:
+            lo = mid
+        else:
+            hi = mid
+        if hi - lo < 1e-9:
+            break
+    return (lo + hi) / 2
@@ -0,0 +1,123 @@
+"""
+indicators.py — technical indicators over the stock_service candle cache.
+
+Indicators are computed with vectorized pandas (rolling / ewm) on the whole
+base series a timeframe is cut from (stock_service.get_base_array(): 5m bars
+for 1D–1M, daily above), so they never trigger a Yahoo download of their own
+and warm-ups are complete from the first bar shown. Each view bar then takes
+the value at its last base bar, so an indicator reads the same on every
+timeframe (sma20 is a 20-day SMA on 3M and on MAX alike). Each result is
+memoized per (symbol, base, indicator, last-bar timestamp): repeated views,
+timeframe switches and chart toggles are a dict lookup until a new bar
+arrives. Misses are computed on the compute_pool workers (the maths lives in
+kernels.py), one task per indicator, all submitted before any is awaited.
+
+Supported names (set=sma20,ema50,rsi14,macd,bb20):
+  smaN   simple moving average
+  emaN   exponential moving average
+  rsiN   Wilder RSI
+  macd   MACD 12/26/9 → {macd, signal, hist}
+  bbN    Bollinger bands, 2σ → {upper, middle, lower}
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import candle_store as cs
+import compute_pool as cp
+import stock_service as ss
+import kernels
+
+# LRU memo — entries for superseded last-bar timestamps simply age out
+_MEMO_MAX = 2048
+_memo: OrderedDict = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def parse_set(raw):
+    """'sma20, EMA50,macd' → (['sma20', 'ema50', 'macd'], invalid_names)."""
+    names, bad = [], []
+    for tok in (raw or "").split(","):
+        tok = tok.strip().lower()
+        if not tok:
+            continue
+        m = kernels.NAME_RE.match(tok)
+        if not m or (m.group(2) and not 2 <= int(m.group(2)) <= 400):
+            bad.append(tok)
+        elif tok not in names:
+            names.append(tok)
+    return names, bad
+
+
+def _memoized(symbol, base, names, arr):
+    """{name: result} for every name, computing the misses on the pool."""
+    key = (symbol, base, int(arr["time"][-1]), len(arr))
+    results, tasks = {}, {}
+    with _memo_lock:
+        for name in names:
+            hit = _memo.get(key + (name,))
+            if hit is not None:
+                _memo.move_to_end(key + (name,))
+                results[name] = hit
+    close = np.asarray(arr["close"], dtype=np.float64)
+    for name in names:
+        if name not in results:
+            tasks[name] = cp.submit(kernels.indicator, name, close)
+    for name, task in tasks.items():
+        results[name] = task.result()
+    with _memo_lock:
+        for name in tasks:
+            _memo[key + (name,)] = results[name]
+        while len(_memo) > _MEMO_MAX:
+            _memo.popitem(last=False)
+    return results
+
+
+def _to_json(values):
+    """Round in bulk and turn NaN warm-up values into nulls."""
+    r = np.round(values, 4)
+    return np.where(np.isnan(r), None, r).tolist()
+
+
+# ── Public API ────────────────────────────────────────────────────────────────
+
+def get_indicators(symbol, tf="3M", names=("sma20",), max_points=None):
+    """
+    Columnar result aligned with /si/candle for the same symbol/timeframe:
+      {"time": [...], "indicators": {"sma20": {"value": [...]}, "macd": {...}}}
+    With max_points, values are sampled at each downsample bucket's last bar and
+    labelled with the bucket's first bar time — the same times /si/candle
+    returns for that max_points.
+    """
+    try:
+        arr = ss.get_base_array(symbol, tf)
+        first, last = ss.view_buckets(arr, tf)
+        if not len(first):
+            return {"error": "No chart data"}
+
+        results = _memoized(symbol, ss._TF_VIEW.get(tf, ("1d",))[0], names, arr)
+
+        # each view bar shows the value at its last base bar
+        if max_points and len(first) > max_points:
+            keys   = cs.bucket_keys(len(first), max_points)
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            first  = first[starts]
+            last   = last[np.r_[starts[1:], len(keys)] - 1]
+        times = arr["time"][first]
+
+        out = {}
+        for name, series in results.items():
+            out[name] = {k: _to_json(v[last]) for k, v in series.items()}
+        return {
+            "symbol":     symbol,
+            "timeframe":  tf,
+            "time":       times.tolist(),
+            "count":      len(times),
+            "indicators": out,
+        }
+    except (cp.PoolBusy, cp.TaskTimeout):
+        raise
+    except Exception as e:
+        return {"error": str(e)}
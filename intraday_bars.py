@@ -0,0 +1,129 @@
+"""
+intraday_bars.py — 1-minute OHLCV bars built from quotes we already poll.
+
+Every fresh quote seen by stock_service.get_quote() (and the NIFTY 50 batch in
+market_data) is folded into the current minute's bar of a per-symbol ring
+buffer:
+
+  - first price of a minute opens the bar, later ones move high/low/close
+  - volume is the increase of the quote's cumulative day volume over the
+    highest total seen that day (0 for the first one — the delta is
+    unknown). Feeds for the same symbol (market_data's NIFTY 50 batch,
+    get_quote()'s Twelve Data / .info) report slightly different totals,
+    so a smaller one adds nothing; only a new UTC day (NSE and US sessions
+    each fall within one) starts the count over
+  - observations for a minute older than the newest bar are ignored, so a
+    re-served or delayed quote can't rewrite history
+
+Bars use candle_store.CANDLE_DTYPE so stock_service can stitch them onto the
+stored 5m series and resample them with the same helpers. Quotes only arrive
+while someone is watching, so live_bars() returns just the run since the last
+gap longer than GAP_SECONDS; anything earlier comes from the candle store.
+
+CAPACITY minutes per symbol (one NSE or US session plus slack, ~25 KB) and at
+most MAX_SYMBOLS buffers; the least recently updated symbol is dropped first.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import candle_store as cs
+
+CAPACITY    = 512
+MAX_SYMBOLS = 500
+GAP_SECONDS = 600
+
+_rings: OrderedDict = OrderedDict()
+_lock = threading.Lock()
+
+
+class _Ring:
+    __slots__ = ("bars", "n", "cum_volume")
+
+    def __init__(self):
+        self.bars       = np.zeros(CAPACITY, dtype=cs.CANDLE_DTYPE)
+        self.n          = 0          # bars ever written; newest is at (n - 1) % CAPACITY
+        self.cum_volume = None
+
+    def ordered(self):
+        if self.n <= CAPACITY:
+            return self.bars[:self.n].copy()
+        i = self.n % CAPACITY
+        return np.concatenate([self.bars[i:], self.bars[:i]])
+
+
+def observe(symbol, price, cum_volume=None, ts=None):
+    """Fold one quote (price, cumulative day volume, trade time) into the bars."""
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        return
+    if not price > 0:
+        return
+    minute = int(ts if ts else time.time()) // 60 * 60
+
+    with _lock:
+        ring = _rings.get(symbol)
+        if ring is None:
+            ring = _rings[symbol] = _Ring()
+            while len(_rings) > MAX_SYMBOLS:
+                _rings.popitem(last=False)
+        else:
+            _rings.move_to_end(symbol)
+
+        cur = ring.bars[(ring.n - 1) % CAPACITY] if ring.n else None
+        if cur is not None and minute < cur["time"]:
+            return
+
+        dv = 0
+        if cum_volume is not None:
+            cum_volume = int(cum_volume)
+            if ring.cum_volume is None:
+                ring.cum_volume = cum_volume
+            elif minute // 86400 != cur["time"] // 86400:
+                dv = cum_volume                              # new session: it all traded since
+                ring.cum_volume = cum_volume
+            elif cum_volume > ring.cum_volume:
+                dv = cum_volume - ring.cum_volume
+                ring.cum_volume = cum_volume
+
+        if cur is not None and minute == cur["time"]:
+            cur["high"]   = max(cur["high"], price)
+            cur["low"]    = min(cur["low"], price)
+            cur["close"]  = price
+            cur["volume"] += dv
+        else:
+            ring.bars[ring.n % CAPACITY] = (minute, price, price, price, price, dv)
+            ring.n += 1
+
+
+def bars(symbol):
+    """All buffered 1-minute bars for a symbol, oldest first (a copy)."""
+    with _lock:
+        ring = _rings.get(symbol)
+        return ring.ordered() if ring else cs.empty()
+
+
+def live_bars(symbol):
+    """Buffered bars since the last gap longer than GAP_SECONDS."""
+    arr = bars(symbol)
+    if len(arr) < 2:
+        return arr
+    gaps = np.flatnonzero(np.diff(arr["time"]) > GAP_SECONDS)
+    return arr[gaps[-1] + 1:] if len(gaps) else arr
+
+
+def clear(symbol=None):
+    with _lock:
+        if symbol:
+            _rings.pop(symbol, None)
+        else:
+            _rings.clear()
+
+
+def stats():
+    with _lock:
+        return {"symbols": len(_rings), "bars": sum(min(r.n, CAPACITY) for r in _rings.values())}
@@ -0,0 +1,194 @@
+"""
+kernels.py — the pure NumPy/pandas functions that run on compute_pool
+workers: indicator maths, correlation matrices and backtest engines.
+
+Pool children unpickle these by reference, i.e. they import this module.
+It therefore imports nothing but NumPy, pandas and fin_math — never
+stock_service (and with it yfinance / curl_cffi), which the parent-side
+modules indicators.py, correlation.py and backtest.py need for data.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from fin_math import xirr
+
+NAME_RE = re.compile(r"^(sma|ema|rsi|bb)(\d{1,3})$|^macd$")
+TRADING_DAYS = 252
+
+
+# ── Indicators ────────────────────────────────────────────────────────────────
+# Each takes a pandas Series — or a DataFrame with one column per symbol, as
+# the backtest engine passes — and returns a dict of same-shaped results.
+
+def sma(close, n):
+    return {"value": close.rolling(n, min_periods=n).mean()}
+
+
+def ema(close, n):
+    return {"value": close.ewm(span=n, adjust=False, min_periods=n).mean()}
+
+
+def rsi(close, n):
+    diff = close.diff()
+    gain = diff.clip(lower=0).ewm(alpha=1 / n, adjust=False, min_periods=n).mean()
+    loss = (-diff.clip(upper=0)).ewm(alpha=1 / n, adjust=False, min_periods=n).mean()
+    rs   = gain / loss.replace(0, np.nan)
+    val  = 100 - 100 / (1 + rs)
+    # no losses in the window → RSI 100
+    return {"value": val.where(loss != 0, 100.0).where(gain.notna())}
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    line = close.ewm(span=fast, adjust=False).mean() - close.ewm(span=slow, adjust=False).mean()
+    line = line.where(np.arange(len(close)) >= slow - 1)
+    sig  = line.ewm(span=signal, adjust=False, min_periods=signal).mean()
+    return {"macd": line, "signal": sig, "hist": line - sig}
+
+
+def bollinger(close, n, k=2.0):
+    mid = close.rolling(n, min_periods=n).mean()
+    sd  = close.rolling(n, min_periods=n).std(ddof=0)
+    return {"upper": mid + k * sd, "middle": mid, "lower": mid - k * sd}
+
+
+def indicator(name, close):
+    """One indicator over a float close array → {series_name: float ndarray}."""
+    s = pd.Series(np.asarray(close, dtype=np.float64))
+    if name == "macd":
+        out = macd(s)
+    else:
+        m   = NAME_RE.match(name)
+        out = {"sma": sma, "ema": ema, "rsi": rsi, "bb": bollinger}[m.group(1)](s, int(m.group(2)))
+    return {k: v.to_numpy(dtype=np.float64) for k, v in out.items()}
+
+
+# ── Correlation ───────────────────────────────────────────────────────────────
+
+def correlation_matrices(closes, min_observations):
+    """
+    (days × symbols) closes → (kept-column mask, correlation, annualized
+    covariance, observations).
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rets = np.diff(np.log(closes), axis=0)
+    ok = np.all(np.isfinite(rets), axis=0) if len(rets) else np.zeros(closes.shape[1], bool)
+    rets = rets[:, ok]
+    if ok.sum() < 2 or len(rets) < min_observations:
+        return ok, None, None, len(rets)
+    return ok, np.corrcoef(rets, rowvar=False), np.cov(rets, rowvar=False) * TRADING_DAYS, len(rets)
+
+
+# ── Backtest signals ──────────────────────────────────────────────────────────
+
+def positions(strategy, closes, p):
+    """(days × symbols) close DataFrame → 0/1 target position per day."""
+    if strategy == "sma_cross":
+        fast, slow = sma(closes, p["fast"])["value"], sma(closes, p["slow"])["value"]
+        return (fast > slow).astype(np.float64).to_numpy()
+    if strategy == "ema_cross":
+        fast, slow = ema(closes, p["fast"])["value"], ema(closes, p["slow"])["value"]
+        return (fast > slow).astype(np.float64).to_numpy()
+    if strategy == "rsi":
+        r     = rsi(closes, p["period"])["value"].to_numpy()
+        state = np.full(r.shape, np.nan)
+        state[r < p["lower"]] = 1.0
+        state[r > p["upper"]] = 0.0
+        # carry the last entry/exit forward: index of the latest event per column
+        rows = np.where(np.isnan(state), 0, np.arange(len(state))[:, None])
+        last = np.maximum.accumulate(rows, axis=0)
+        held = state[last, np.arange(state.shape[1])]
+        return np.nan_to_num(held, nan=0.0)
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+# ── Backtest statistics ───────────────────────────────────────────────────────
+
+def _r(v, d=4):
+    return None if v is None or not np.isfinite(v) else round(float(v), d)
+
+
+def stats(equity, years):
+    """CAGR / Sharpe / max drawdown of an equity curve starting at 1.0."""
+    daily = np.diff(equity) / equity[:-1]
+    sd    = daily.std(ddof=1) if len(daily) > 1 else 0.0
+    return {
+        "final":        _r(equity[-1]),
+        "total_return": _r(equity[-1] - 1),
+        "cagr":         _r(equity[-1] ** (1 / years) - 1) if years > 0 and equity[-1] > 0 else None,
+        "sharpe":       _r(daily.mean() / sd * np.sqrt(TRADING_DAYS), 3) if sd > 0 else None,
+        "max_drawdown": _r(np.min(equity / np.maximum.accumulate(equity) - 1)),
+    }
+
+
+# ── Backtest engines ──────────────────────────────────────────────────────────
+
+def run_rules(strategy, p, syms, days, closes, cost):
+    listed = np.isfinite(closes)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rets = np.where(listed[1:] & listed[:-1], closes[1:] / closes[:-1] - 1, 0.0)
+
+    pos  = positions(strategy, pd.DataFrame(closes), p) * listed
+    held = pos[:-1]                                   # yesterday's signal earns today's return
+    turn = np.abs(np.diff(np.vstack([np.zeros((1, pos.shape[1])), held]), axis=0))
+    pnl  = held * rets - turn * cost
+
+    years  = (days[-1] - days[0]) / 365.25
+    eq_sym = np.vstack([np.ones((1, len(syms))), np.cumprod(1 + pnl, axis=0)])
+    bh_sym = np.vstack([np.ones((1, len(syms))), np.cumprod(1 + rets, axis=0)])
+
+    active = listed[:-1] & listed[1:]
+    n_act  = np.maximum(active.sum(axis=1), 1)
+    port   = np.r_[1.0, np.cumprod(1 + (pnl * active).sum(axis=1) / n_act)]
+    bh     = np.r_[1.0, np.cumprod(1 + (rets * active).sum(axis=1) / n_act)]
+
+    trades = (turn > 0).sum(axis=0)
+    per_symbol = {}
+    for j, s in enumerate(syms):
+        first = int(np.argmax(listed[:, j]))
+        yrs   = (days[-1] - days[first]) / 365.25
+        st    = stats(eq_sym[first:, j], yrs)
+        st["trades"]       = int(trades[j])
+        st["buy_and_hold"] = stats(bh_sym[first:, j], yrs)
+        per_symbol[s] = st
+    return port, {"portfolio": stats(port, years), "buy_and_hold": stats(bh, years),
+                  "per_symbol": per_symbol}
+
+
+def run_sip(p, syms, days, closes):
+    months  = days.astype("datetime64[D]").astype("datetime64[M]")
+    first   = np.r_[True, months[1:] != months[:-1]]
+    listed  = np.isfinite(closes)
+    buy     = first[:, None] & listed
+    px      = np.where(listed, closes, 1.0)
+    units   = np.cumsum(np.where(buy, p["amount"] / px, 0.0), axis=0)
+    invest  = np.cumsum(np.where(buy, p["amount"], 0.0), axis=0)
+    last_px = pd.DataFrame(closes).ffill().fillna(0).to_numpy()
+    value   = units * last_px
+
+    per_symbol = {}
+    for j, s in enumerate(syms):
+        bdays = days[buy[:, j]]
+        flows = np.r_[-np.full(len(bdays), p["amount"]), value[-1, j]]
+        rate  = xirr(np.r_[bdays, days[-1]], flows) if len(bdays) else None
+        per_symbol[s] = {
+            "invested":    _r(invest[-1, j], 2),
+            "value":       _r(value[-1, j], 2),
+            "gain":        _r(value[-1, j] - invest[-1, j], 2),
+            "xirr":        _r(rate),
+            "instalments": int(len(bdays)),
+        }
+
+    tot_v, tot_i = value.sum(axis=1), invest.sum(axis=1)
+    all_buys = np.repeat(days, buy.sum(axis=1))
+    flows    = np.r_[-np.full(len(all_buys), p["amount"]), tot_v[-1]]
+    rate     = xirr(np.r_[all_buys, days[-1]], flows) if len(all_buys) else None
+    portfolio = {
+        "invested": _r(tot_i[-1], 2),
+        "value":    _r(tot_v[-1], 2),
+        "gain":     _r(tot_v[-1] - tot_i[-1], 2),
+        "xirr":     _r(rate),
+    }
+    return tot_v, {"portfolio": portfolio, "per_symbol": per_symbol}
@@ -0,0 +1,81 @@
+"""
+keyword_matcher.py — many keywords, one compiled regex, one pass per text.
+
+    m = KeywordMatcher([("cricket", "reject", False),
+                        ("tcs", "TCS.NS", True)])
+    m.scan("TCS beats estimates")        # → {"TCS.NS"}
+
+Every keyword goes into a single pattern wrapped in a lookahead, (?=(…)), so
+the scan reports a match starting at every position — overlapping keywords
+aren't swallowed the way plain finditer() would. The text is lowercased once
+up front rather than compiling with re.I, which is several times slower. The
+keywords are compiled as a character trie ("sbi", "sbicard", "sbilife" →
+sbi(?:card|life)?), so each position costs one walk down shared prefixes
+instead of trying every keyword, and the longest keyword wins.
+
+whole_word=False keeps `keyword in text` semantics (the old REJECT/FINANCE
+checks); whole_word=True needs non-alphanumeric characters (or the ends of
+the text) on both sides, so "lt" doesn't fire inside "results". Keywords
+that are prefixes of the one matched at a position ("banking" inside
+"banking and psu") are reported too — callers that rank labels by priority
+need every keyword present, not only the longest.
+"""
+
+import re
+
+
+def _trie_pattern(words):
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def emit(node):
+        alts = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if "" in node:
+            return (body if len(alts) > 1 else "(?:" + body + ")") + "?"
+        return body
+
+    return emit(trie)
+
+
+class KeywordMatcher:
+    def __init__(self, entries):
+        """entries: iterable of (keyword, label, whole_word)."""
+        self._rules = {}                      # keyword → [(label, whole_word)]
+        for kw, label, whole in entries:
+            kw = kw.lower().strip()
+            if kw:
+                self._rules.setdefault(kw, []).append((label, whole))
+        words = sorted(self._rules, key=len, reverse=True)
+        self._prefixes = {w: [p for p in words if p != w and w.startswith(p)] for w in words}
+        self._re = re.compile("(?=(" + _trie_pattern(words) + "))") if words else None
+
+    @staticmethod
+    def _bounded(text, start, end):
+        return ((start == 0 or not text[start - 1].isalnum())
+                and (end == len(text) or not text[end].isalnum()))
+
+    def scan(self, text):
+        """Set of labels whose keywords occur in text."""
+        found = set()
+        if not self._re or not text:
+            return found
+        text = text.lower()
+        for m in self._re.finditer(text):
+            kw, start = m.group(1), m.start()
+            for cand in [kw] + self._prefixes[kw]:
+                for label, whole in self._rules[cand]:
+                    if not whole or self._bounded(text, start, start + len(cand)):
+                        found.add(label)
+        return found
+
+    def first(self, text, order):
+        """The first label of `order` that occurs in text, else None."""
+        found = self.scan(text)
+        return next((label for label in order if label in found), None)
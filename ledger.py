@@ -0,0 +1,325 @@
+"""
+ledger.py — FIFO lot accounting over a user's buy/sell transaction ledger.
+
+The ledger (portfolio_repo.trades / add_trades) is the source of truth; this
+module keeps a Book per user in memory, built once from the stored trades
+and then updated in place as trades are recorded:
+
+  - a Position is one symbol's open lots as a FIFO queue plus running
+    totals: open quantity and cost, realized P&L, and realized gains split
+    into short- and long-term (held more than LONG_TERM_MONTHS, the Indian
+    rule for listed equity)
+  - a buy appends a lot; a sell consumes lots from the front, so recording a
+    trade costs O(lots it closes), never a replay of the history
+  - a backdated trade (dated before the symbol's last trade) changes which
+    lots later sells closed, so only that symbol's trades are replayed
+  - a sell larger than the quantity held on its date is rejected with
+    ValueError before anything is written
+  - record() applies trades to the book before add_trades() stores them,
+    logging the lots each one changes and the totals they started from; if
+    the write fails those are put back (still O(lots closed)), and the
+    trades join each Position's history only once stored
+  - building a book, recording into it and snapshotting it for holdings()
+    hold the same per-user lock, so a book is never built twice at once,
+    nor read or rebuilt while a write is halfway through
+
+holdings() reads the book: one get_quotes() call prices the open positions,
+unrealized P&L is split short/long-term by lot age, and totals are in INR
+(USD converted with get_fx_rate(), as portfolio_service does).
+"""
+
+import bisect
+import calendar
+import threading
+from collections import deque
+from datetime import date
+
+import portfolio_repo
+import stock_service as ss
+
+LONG_TERM_MONTHS = 12
+_EPS = 1e-9
+_MEM_MAX = 256
+
+_books: dict = {}                 # username.lower() → Book
+_lock       = threading.Lock()
+_user_locks: dict = {}            # username.lower() → RLock for building / writing its book
+
+
+def _r(v, d=2):
+    return None if v is None else round(float(v), d)
+
+
+def _day(s):
+    return date.fromisoformat(str(s)[:10])
+
+
+def _add_months(d, months):
+    y, m = divmod(d.month - 1 + months, 12)
+    y, m = d.year + y, m + 1
+    return date(y, m, min(d.day, calendar.monthrange(y, m)[1]))
+
+
+def long_term(bought, sold):
+    """True if a lot bought on `bought` and sold on `sold` was held long enough."""
+    return sold > _add_months(bought, LONG_TERM_MONTHS)
+
+
+class Position:
+    """One symbol's open lots, oldest first, and its running totals."""
+
+    __slots__ = ("symbol", "lots", "trades", "qty", "cost", "realized", "stcg", "ltcg", "_txn")
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.lots   = deque()       # [qty left, price, buy date]
+        self.trades = []            # (date, side, qty, price) as applied
+        self.qty = self.cost = self.realized = self.stcg = self.ltcg = 0.0
+        self._txn   = None          # (totals, lot undo log, pending trades) between begin() and commit()
+
+    def _totals(self):
+        return self.qty, self.cost, self.realized, self.stcg, self.ltcg
+
+    def _apply(self, day, side, qty, price):
+        undo = self._txn[1] if self._txn else None
+        if side == "buy":
+            self.lots.append([qty, price, day])
+            if undo is not None:
+                undo.append(("buy", None, 0.0))
+            self.qty  += qty
+            self.cost += qty * price
+        else:
+            if qty > self.qty + _EPS:
+                raise ValueError(f"Sell of {qty:g} {self.symbol} on {day} exceeds the {self.qty:g} held")
+            left = qty
+            while left > _EPS and self.lots:
+                lot  = self.lots[0]
+                take = min(lot[0], left)
+                gain = take * (price - lot[1])
+                if long_term(lot[2], day):
+                    self.ltcg += gain
+                else:
+                    self.stcg += gain
+                self.realized += gain
+                self.cost -= take * lot[1]
+                lot[0] -= take
+                left   -= take
+                if undo is not None:
+                    undo.append(("take", lot, take))
+                if lot[0] <= _EPS:
+                    self.lots.popleft()
+            self.qty -= qty
+            if self.qty <= _EPS:                         # closed: drop float dust
+                if undo is not None and self.lots:
+                    undo.append(("clear", list(self.lots), 0.0))
+                self.qty = self.cost = 0.0
+                self.lots.clear()
+        (self._txn[2] if self._txn else self.trades).append((day, side, qty, price))
+
+    def begin(self):
+        """Start logging changes so rollback() can undo them until commit()."""
+        self._txn = (self._totals(), [], [])
+
+    def commit(self):
+        if self._txn:
+            self.trades.extend(self._txn[2])
+            self._txn = None
+
+    def rollback(self):
+        """Undo everything applied since begin(), newest first."""
+        if not self._txn:
+            return
+        totals, undo, _ = self._txn
+        for op, lot, take in reversed(undo):
+            if op == "buy":
+                self.lots.pop()
+            elif op == "clear":
+                self.lots.extend(lot)
+            else:
+                lot[0] += take
+                if not self.lots or self.lots[0] is not lot:     # the sell had closed it
+                    self.lots.appendleft(lot)
+        self.qty, self.cost, self.realized, self.stcg, self.ltcg = totals
+        self._txn = None
+
+    def snapshot(self):
+        """Open lots and totals as of now, without the trade history."""
+        c = Position(self.symbol)
+        c.lots = deque([lot[:] for lot in self.lots])
+        c.qty, c.cost, c.realized, c.stcg, c.ltcg = self._totals()
+        return c
+
+    def add(self, day, side, qty, price):
+        """Apply a trade; returns the updated Position (a new one if it was backdated)."""
+        if not self.trades or day >= self.trades[-1][0]:
+            self._apply(day, side, qty, price)
+            return self
+        i   = bisect.bisect_right(self.trades, day, key=lambda t: t[0])
+        pos = Position(self.symbol)
+        for t in self.trades[:i] + [(day, side, qty, price)] + self.trades[i:]:
+            pos._apply(*t)
+        return pos
+
+
+class Book:
+    """All of a user's positions, by symbol."""
+
+    def __init__(self):
+        self.positions = {}
+        self.count = 0
+
+    def add(self, symbol, day, side, qty, price):
+        pos = self.positions.get(symbol) or Position(symbol)
+        self.positions[symbol] = pos.add(day, side, qty, price)
+        self.count += 1
+        return self.positions[symbol]
+
+
+def _key(username):
+    return username.strip().lower()
+
+
+def _user_lock(k):
+    with _lock:
+        lk = _user_locks.get(k)
+        if lk is None:
+            lk = _user_locks[k] = threading.RLock()
+    return lk
+
+
+def book(username):
+    """The user's Book, built from the stored ledger on first use."""
+    k = _key(username)
+    b = _books.get(k)
+    if b is not None:
+        return b
+    with _user_lock(k):
+        b = _books.get(k)                               # built while we waited
+        if b is not None:
+            return b
+        b = Book()
+        for t in portfolio_repo.trades(username):
+            try:
+                b.add(t["symbol"], _day(t["date"]), t["side"], float(t["qty"]), float(t["price"]))
+            except ValueError as e:
+                print(f"  ⚠ Ledger {username}: skipping trade {t.get('id')}: {e}")
+        with _lock:
+            if len(_books) >= _MEM_MAX and k not in _books:
+                _books.pop(next(iter(_books)))
+            _books[k] = b
+    return b
+
+
+def record(username, rows):
+    """
+    Append trades {symbol, side, qty, price, date: "YYYY-MM-DD"} to the
+    ledger, in date order. All of them are checked against the book first;
+    an oversell raises ValueError and nothing is stored.
+    """
+    rows = sorted(rows, key=lambda r: r["date"])
+    with _user_lock(_key(username)):
+        b = book(username)
+        touched, begun = {}, []
+        try:
+            for r in rows:
+                s = r["symbol"]
+                if s not in touched:
+                    touched[s] = b.positions.get(s) or Position(s)
+                    touched[s].begin()
+                    begun.append(touched[s])
+                touched[s] = touched[s].add(_day(r["date"]), r["side"], r["qty"], r["price"])
+            portfolio_repo.add_trades(username, rows)
+        except Exception:
+            for p in begun:
+                p.rollback()
+            raise
+        for p in begun:
+            p.commit()
+        b.positions.update(touched)                     # new symbols and replayed (backdated) positions
+        b.count += len(rows)
+    return {"recorded": len(rows), "positions": [_position(p) for p in touched.values()]}
+
+
+def trades(username, symbol=None):
+    rows = portfolio_repo.trades(username)
+    return [t for t in rows if t["symbol"] == symbol] if symbol else rows
+
+
+def _position(p):
+    return {
+        "symbol":   p.symbol,
+        "qty":      p.qty,
+        "avg":      _r(p.cost / p.qty, 4) if p.qty else None,
+        "invested": _r(p.cost),
+        "lots":     len(p.lots),
+        "realized": _r(p.realized),
+        "stcg":     _r(p.stcg),
+        "ltcg":     _r(p.ltcg),
+    }
+
+
+def holdings(username, prices=True, lots=False):
+    """
+    Open positions derived from the ledger ({symbol, qty, avg, invested,
+    realized, stcg, ltcg, …} plus ltp / unrealized split when priced),
+    closed positions' realized gains, and INR totals.
+    """
+    b = book(username)
+    with _user_lock(_key(username)):                    # record() changes lots in place
+        positions = [p.snapshot() for p in b.positions.values()]
+        count     = b.count
+    open_  = [p for p in positions if p.qty > 0]
+    quotes = ss.get_quotes([p.symbol for p in open_]) if prices and open_ else {}
+    today  = date.today()
+    ccys   = {p.symbol: (quotes.get(p.symbol) or {}).get("currency") or ss._symbol_currency(p.symbol)
+              for p in positions}
+    usd_inr = ss.get_fx_rate("USD", "INR") if "USD" in ccys.values() else None
+
+    tot = dict.fromkeys(("invested", "current", "unrealized", "realized", "stcg", "ltcg"), 0.0)
+    rows, closed = [], []
+    for p in positions:
+        fx = (usd_inr if ccys[p.symbol] == "USD" else 1.0) or 0.0
+        for f in ("realized", "stcg", "ltcg"):
+            tot[f] += getattr(p, f) * fx
+        if not p.qty:
+            closed.append({"symbol": p.symbol, "currency": ccys[p.symbol], "realized": _r(p.realized),
+                           "stcg": _r(p.stcg), "ltcg": _r(p.ltcg)})
+            continue
+        row = dict(_position(p), currency=ccys[p.symbol], first_buy=p.lots[0][2].isoformat())
+        ltp = (quotes.get(p.symbol) or {}).get("current")
+        if ltp is not None:
+            st = lt = lt_qty = 0.0
+            for q, price, d in p.lots:
+                if long_term(d, today):
+                    lt += q * (ltp - price)
+                    lt_qty += q
+                else:
+                    st += q * (ltp - price)
+            cur = p.qty * ltp
+            row.update(ltp=ltp, current=_r(cur), unrealized=_r(cur - p.cost),
+                       unrealized_pct=_r((cur - p.cost) / p.cost * 100) if p.cost else None,
+                       unrealized_st=_r(st), unrealized_lt=_r(lt), long_term_qty=lt_qty)
+            tot["current"]    += cur * fx
+            tot["unrealized"] += (cur - p.cost) * fx
+        if ltp is not None or not prices:              # priced holdings only, as the panel does
+            tot["invested"]   += p.cost * fx
+        if lots:
+            row["open_lots"] = [{"qty": q, "price": price, "date": d.isoformat(),
+                                 "long_term": long_term(d, today)} for q, price, d in p.lots]
+        rows.append(row)
+
+    return {
+        "holdings": rows,
+        "closed":   closed,
+        "totals":   dict({k: _r(v) if prices or k not in ("current", "unrealized") else None
+                          for k, v in tot.items()},
+                         currency="INR", trades=count, priced=sum("ltp" in r for r in rows)),
+        "usd_inr":  _r(usd_inr, 4),
+    }
+
+
+def clear(username=None):
+    if username is None:
+        _books.clear()
+    else:
+        _books.pop(_key(username), None)
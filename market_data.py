@@ -6,6 +6,8 @@ import time as _time
 from datetime import datetime, time as dt_time
 import pytz
 
+import intraday_bars
+
 # Set SKIP_NSE=true in Render env vars — NSE API is geo-blocked outside India.
 # When true, all NSE calls are skipped and Yahoo Finance is used directly.
 _SKIP_NSE = os.environ.get("SKIP_NSE", "false").lower() in ("1", "true", "yes")
@@ -263,6 +265,7 @@ def _get_all_nifty50_data():
                 print(f"  ✓ NSE API returned {len(result)} stocks")
                 _nifty50_cache['ts']   = _time.time()
                 _nifty50_cache['data'] = result
+                _feed_intraday(result)
                 return result
         except Exception as e:
             print(f"  ⚠ NSE equity-stockIndices failed: {e}")
@@ -329,9 +332,18 @@ def _get_all_nifty50_data():
 
     _nifty50_cache['ts']   = _time.time()
     _nifty50_cache['data'] = result
+    _feed_intraday(result)
     return result
 
 
+def _feed_intraday(rows):
+    """Fold a fresh NIFTY 50 batch into the 1-minute bars behind the 1D chart."""
+    if not _is_market_open():
+        return
+    for row in rows:
+        intraday_bars.observe(f"{row['symbol']}.NS", row['price'], row.get('volume'))
+
+
 def _is_market_open():
     """True if NSE is currently open (Mon-Fri 09:15-15:30 IST)."""
     try:
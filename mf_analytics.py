@@ -0,0 +1,229 @@
+"""
+mf_analytics.py — return and risk analytics from a scheme's NAV history.
+
+Everything is computed from nav_store's local (day, nav) arrays with whole-
+array NumPy operations, so /mf_analytics costs one NAV-store lookup plus a
+few vector passes:
+
+  rolling        1Y / 3Y rolling CAGR ending on every NAV date: count,
+                 min / p10 / median / mean / p90 / max, share positive, latest
+  risk           per window (1y, 3y, 5y, all): annualized volatility of daily
+                 log returns, Sharpe over RISK_FREE, max drawdown and its
+                 trough date
+  calendar       return per calendar year, last NAV vs the previous year's
+                 last NAV (the first year from the first NAV, marked partial)
+  sip            SIP_AMOUNT on the first NAV date of each month over the last
+                 1 / 3 / 5 years and the whole history: invested, value, XIRR
+
+Returns are decimals (0.12 = 12%) like derived_metrics. Results are
+memoized per (scheme, last NAV date).
+
+compare() lines several schemes up on the NAV dates they all share (one
+days × funds matrix) and computes point returns, volatility and drawdown
+for every column at once, plus an optional growth-of-10,000 series. Its
+point returns start from the same NAV as nav_store.point_return() (the
+first after the date, via nav_index()) but, like everything here, are
+decimals where /mf_detail's are percentages.
+"""
+
+import threading
+
+import numpy as np
+
+import nav_store
+from fin_math import xirr
+from mf_service import NO_NAV
+
+MAX_COMPARE = 20
+RISK_FREE  = 0.065           # annual, roughly the Indian T-bill yield
+SIP_AMOUNT = 10000.0
+_TRADING_DAYS = 252
+_WINDOWS = {"1y": 365, "3y": 365 * 3, "5y": 365 * 5}
+_MEMO_MAX = 512
+
+_memo: dict = {}
+_memo_lock = threading.Lock()
+
+
+def _r(v, d=4):
+    return None if v is None or not np.isfinite(v) else round(float(v), d)
+
+
+def rolling(days, nav, span):
+    """CAGR over `span` days ending on each NAV date that has that much history."""
+    ends = np.flatnonzero(days - span >= days[0])
+    if not len(ends):
+        return None
+    starts = np.searchsorted(days, days[ends] - span, side="right") - 1
+    cagr   = (nav[ends] / nav[starts]) ** (365.0 / span) - 1
+    p10, med, p90 = np.percentile(cagr, [10, 50, 90])
+    return {
+        "count":    int(len(cagr)),
+        "min":      _r(cagr.min()),
+        "p10":      _r(p10),
+        "median":   _r(med),
+        "mean":     _r(cagr.mean()),
+        "p90":      _r(p90),
+        "max":      _r(cagr.max()),
+        "positive": _r((cagr > 0).mean(), 3),
+        "latest":   _r(cagr[-1]),
+    }
+
+
+def risk(days, nav):
+    if len(nav) < 20:
+        return None
+    lr  = np.diff(np.log(nav))
+    vol = lr.std(ddof=1) * np.sqrt(_TRADING_DAYS)
+    ann = np.expm1(lr.mean() * _TRADING_DAYS)
+    dd  = nav / np.maximum.accumulate(nav) - 1
+    low = int(np.argmin(dd))
+    return {
+        "volatility":    _r(vol),
+        "sharpe":        _r((ann - RISK_FREE) / vol, 3) if vol > 0 else None,
+        "max_drawdown":  _r(dd[low]),
+        "drawdown_date": nav_store.day_str(days[low]) if dd[low] < 0 else None,
+    }
+
+
+def _year(days):
+    return np.asarray(days).astype("datetime64[D]").astype("datetime64[Y]").astype(np.int64) + 1970
+
+
+def calendar(days, nav):
+    years = _year(days)
+    last  = np.flatnonzero(np.r_[years[1:] != years[:-1], True])     # last NAV of each year
+    rets  = nav[last] / np.r_[nav[0], nav[last[:-1]]] - 1
+    # a year is partial if the history starts after its first week or it isn't over yet
+    jan7  = np.datetime64(f"{years[0]}-01-07", "D").astype(np.int64)
+    this  = int(_year(nav_store.today()))
+    return [{"year": int(y), "return": _r(r),
+             "partial": bool((i == 0 and days[0] > jan7) or y >= this)}
+            for i, (y, r) in enumerate(zip(years[last], rets))]
+
+
+def sip(days, nav, span=None):
+    """Monthly SIP_AMOUNT over the last `span` days (whole history if None)."""
+    if span is not None and days[-1] - span < days[0]:
+        return None
+    lo     = 0 if span is None else np.searchsorted(days, days[-1] - span, side="left")
+    d, v   = days[lo:], nav[lo:]
+    months = d.astype("datetime64[D]").astype("datetime64[M]")
+    buy    = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    units  = (SIP_AMOUNT / v[buy]).sum()
+    value  = units * v[-1]
+    flows  = np.r_[-np.full(len(buy), SIP_AMOUNT), value]
+    return {
+        "instalments": int(len(buy)),
+        "invested":    _r(SIP_AMOUNT * len(buy), 2),
+        "value":       _r(value, 2),
+        "xirr":        _r(xirr(np.r_[d[buy], d[-1]], flows)) if len(buy) > 1 else None,
+    }
+
+
+def compute(arr):
+    """Analytics dict from a NAV_DTYPE array ({} if empty)."""
+    if not len(arr):
+        return {}
+    days = np.asarray(arr["day"], dtype=np.int64)
+    nav  = np.asarray(arr["nav"], dtype=np.float64)
+    lo   = {k: np.searchsorted(days, days[-1] - s, side="left") for k, s in _WINDOWS.items()}
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        return {
+            "navDate":  nav_store.day_str(days[-1]),
+            "latestNAV": float(nav[-1]),
+            "since":    nav_store.day_str(days[0]),
+            "rolling":  {"1y": rolling(days, nav, 365), "3y": rolling(days, nav, 365 * 3)},
+            "risk":     dict({k: risk(days[i:], nav[i:]) if days[-1] - _WINDOWS[k] >= days[0] else None
+                              for k, i in lo.items()}, all=risk(days, nav)),
+            "calendar": calendar(days, nav),
+            "sip":      dict({k: sip(days, nav, s) for k, s in _WINDOWS.items()},
+                             all=sip(days, nav), amount=SIP_AMOUNT),
+        }
+
+
+def get_analytics(code):
+    """Memoized analytics for a scheme, or {"error": …}."""
+    try:
+        meta, arr = nav_store.series(code)
+    except Exception as e:
+        return {"error": str(e)}
+    if not len(arr):
+        return {"error": NO_NAV}
+    key = int(arr["day"][-1])
+    with _memo_lock:
+        hit = _memo.get(int(code))
+        if hit and hit[0] == key:
+            return hit[1]
+    data = dict(compute(arr), schemeCode=int(code), schemeName=meta.get("scheme_name", ""))
+    with _memo_lock:
+        if len(_memo) >= _MEMO_MAX and int(code) not in _memo:
+            _memo.pop(next(iter(_memo)))
+        _memo[int(code)] = (key, data)
+    return data
+
+
+def compare(codes, growth=False, max_points=500):
+    """
+    Side-by-side stats for up to MAX_COMPARE schemes over their common NAV
+    dates. Schemes that fail to load are listed under "errors".
+    """
+    loaded = nav_store.series_many(codes)
+    funds, errors = [], {}
+    for code, res in loaded.items():
+        if isinstance(res, Exception):
+            errors[code] = str(res)
+        elif not len(res[1]):
+            errors[code] = NO_NAV
+        else:
+            funds.append((code, res[0], res[1]))
+    if not funds:
+        return {"error": "No NAV data for any scheme", "errors": errors}
+
+    common = funds[0][2]["day"]
+    for _, _, arr in funds[1:]:
+        common = np.intersect1d(common, arr["day"], assume_unique=True)
+    if len(common) < 2:
+        return {"error": "Schemes share no NAV history", "errors": errors}
+    m = np.column_stack([arr["nav"][np.searchsorted(arr["day"], common)] for _, _, arr in funds])
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ret = {}
+        for k, span in _WINDOWS.items():
+            # same start NAV as /mf_detail's return_*: the first one after the date
+            i = nav_store.nav_index(common, common[-1] - span)
+            ret[k] = m[-1] / m[i] - 1 if common[-1] - span >= common[0] else np.full(m.shape[1], np.nan)
+        lr  = np.diff(np.log(m), axis=0)
+        vol = lr.std(axis=0, ddof=1) * np.sqrt(_TRADING_DAYS) if len(lr) > 1 else np.full(m.shape[1], np.nan)
+        dd  = (m / np.maximum.accumulate(m, axis=0) - 1).min(axis=0)
+        years = (common[-1] - common[0]) / 365.25
+        cagr  = (m[-1] / m[0]) ** (1 / years) - 1
+
+    out = {
+        "from":  nav_store.day_str(common[0]),
+        "to":    nav_store.day_str(common[-1]),
+        "days":  int(len(common)),
+        "funds": [{
+            "schemeCode":   code,
+            "schemeName":   meta.get("scheme_name", ""),
+            "nav":          float(m[-1, j]),
+            "return_1y":    _r(ret["1y"][j]),
+            "return_3y":    _r(ret["3y"][j]),
+            "return_5y":    _r(ret["5y"][j]),
+            "cagr":         _r(cagr[j]),
+            "volatility":   _r(vol[j]),
+            "max_drawdown": _r(dd[j]),
+        } for j, (code, meta, _) in enumerate(funds)],
+        "errors": errors,
+    }
+    if growth:
+        n   = len(common)
+        idx = np.arange(n)
+        if max_points and n > max_points:
+            idx = np.unique(np.r_[np.linspace(0, n - 1, max_points).astype(np.int64), n - 1])
+        g = 10000 * m[idx] / m[0]
+        out["growth"] = {
+            "time":   [str(d) for d in common[idx].astype("datetime64[D]")],
+            "series": {str(code): np.round(g[:, j], 2).tolist() for j, (code, _, _) in enumerate(funds)},
+        }
+    return out
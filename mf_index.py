@@ -0,0 +1,150 @@
+"""
+mf_index.py — server-side search over the /mf_list scheme list.
+
+build(funds) is called whenever app.py refreshes the mfapi.in list and swaps
+in a new immutable snapshot; search() only reads the current snapshot, so
+a rebuild never blocks or tears a query.
+
+Scheme names are split into lowercase alphanumeric terms. Each query token
+is matched against the term vocabulary as
+  - the exact term                                   1.0
+  - a term it is a prefix of ("mid" → "midcap")      0.8
+  - a similar term, for tokens of 4+ characters      0.6 × trigram Dice ≥ 0.5
+    ("bluchip" → "bluechip"), via a trigram → term index
+and a scheme's score is the sum of its best match per token; every token
+must match. Ties go to shorter names, then alphabetical order.
+
+Facet counts are taken over all matches before the category filter, so the
+category bar can show how many hits each category holds.
+"""
+
+import re
+import bisect
+
+import numpy as np
+
+PER_PAGE_MAX = 100
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_index = None           # replaced wholesale by build()
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _grams(term):
+    t = f"^{term}$"
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+def build(funds):
+    """Index [{code, name, cat}, …]; replaces the previous snapshot."""
+    global _index
+    postings = {}
+    lengths  = np.empty(len(funds), dtype=np.int32)
+    for i, f in enumerate(funds):
+        toks = _tokens(f["name"])
+        lengths[i] = len(toks)
+        for t in set(toks):
+            postings.setdefault(t, []).append(i)
+
+    terms  = sorted(postings)
+    grams  = {}
+    n_gram = np.empty(len(terms), dtype=np.int32)
+    for tid, t in enumerate(terms):
+        g = _grams(t)
+        n_gram[tid] = len(g)
+        for gram in g:
+            grams.setdefault(gram, []).append(tid)
+
+    alpha  = np.argsort(np.asarray([f["name"].lower() for f in funds]), kind="stable")
+    rank   = np.empty(len(funds), dtype=np.int32)
+    rank[alpha] = np.arange(len(funds), dtype=np.int32)
+
+    cats   = sorted({f["cat"] for f in funds})
+    cat_id = {c: i for i, c in enumerate(cats)}
+    snap = {
+        "funds":    funds,
+        "terms":    terms,
+        "postings": [np.asarray(postings[t], dtype=np.int32) for t in terms],
+        "grams":    {g: np.asarray(v, dtype=np.int32) for g, v in grams.items()},
+        "n_gram":   n_gram,
+        "lengths":  lengths,
+        "alpha":    alpha,                 # scheme ids in name order
+        "rank":     rank,                  # position of each scheme in that order
+        "cats":     cats,
+        "cat_ids":  np.asarray([cat_id[f["cat"]] for f in funds], dtype=np.int32),
+    }
+    _index = snap
+
+
+def ready():
+    return _index is not None
+
+
+def _token_scores(ix, token):
+    """Best match score per scheme for one query token."""
+    terms  = ix["terms"]
+    scores = np.zeros(len(ix["funds"]))
+    lo = bisect.bisect_left(terms, token)
+    hi = lo
+    while hi < len(terms) and terms[hi].startswith(token):
+        hi += 1
+    if hi > lo:
+        scores[np.concatenate(ix["postings"][lo:hi])] = 0.8
+        if terms[lo] == token:
+            scores[ix["postings"][lo]] = 1.0
+
+    if len(token) >= 4 and (lo == hi or terms[lo] != token):
+        q = _grams(token)
+        hits = [ix["grams"][g] for g in q if g in ix["grams"]]
+        if hits:
+            common = np.bincount(np.concatenate(hits), minlength=len(terms))
+            dice   = 2 * common / (len(q) + ix["n_gram"])
+            for tid in np.flatnonzero(dice >= 0.5):
+                ids = ix["postings"][tid]
+                scores[ids] = np.maximum(scores[ids], 0.6 * dice[tid])
+    return scores
+
+
+def search(q="", cat=None, page=1, per_page=30):
+    ix = _index
+    if ix is None:
+        return {"error": "Fund index not ready"}
+    per_page = max(1, min(int(per_page), PER_PAGE_MAX))
+    page     = max(1, int(page))
+
+    n = len(ix["funds"])
+    toks  = _tokens(q or "")
+    score = np.zeros(n)
+    match = np.ones(n, dtype=bool)
+    for t in toks:
+        s = _token_scores(ix, t)
+        match &= s > 0
+        score += s
+
+    facets = np.bincount(ix["cat_ids"][match], minlength=len(ix["cats"]))
+    if cat and cat != "All":
+        cid   = ix["cats"].index(cat) if cat in ix["cats"] else -1
+        match &= ix["cat_ids"] == cid
+
+    if toks:
+        hit = np.flatnonzero(match)
+        hit = hit[np.lexsort((ix["rank"][hit], ix["lengths"][hit], -score[hit]))]
+    else:
+        hit = ix["alpha"][match[ix["alpha"]]]
+    total = len(hit)
+    rows  = hit[(page - 1) * per_page: page * per_page]
+    return {
+        "query":    q or "",
+        "cat":      cat or "All",
+        "page":     page,
+        "per_page": per_page,
+        "total":    total,
+        "pages":    -(-total // per_page),
+        "matched":  int(facets.sum()),
+        "facets":   {c: int(k) for c, k in zip(ix["cats"], facets) if k},
+        "results":  [ix["funds"][i] for i in rows.tolist()],
+    }
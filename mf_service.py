@@ -0,0 +1,209 @@
+"""
+mf_service.py — mutual fund catalog and scheme details from mfapi.in.
+
+load_list() returns every Direct-Growth scheme with a category, cached for
+6 h. Names without "direct" and "growth" are dropped by two substring
+checks; the rest get one KeywordMatcher pass that yields the payout-variant
+filter hit and every CATS keyword present, and the category is the earliest
+CATS entry found, so the old first-match order is kept.
+
+The processed catalog (code → name, category or None when filtered out) is
+written to $MF_STORE_PATH (default ./data/mf_list.json). A refresh only
+classifies schemes whose code is new or whose name changed, and after a
+restart a catalog younger than the TTL is served without downloading; an
+older one is served while a single download refreshes it. The stored rules
+fingerprint forces a full reclassification when CATS or the filters change.
+
+get_detail() answers /mf_detail from nav_store's local NAV history.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+import requests
+
+import mf_index
+import nav_store
+from keyword_matcher import KeywordMatcher
+
+LIST_TTL   = 21600   # 6 h
+LIST_RETRY = 60      # after a failed download, serve what we have this long
+NO_NAV     = "No NAV data found"
+
+CATS = [
+    ("Liquid","Liquid"),("Overnight","Overnight"),("Ultra Short","Ultra Short Duration"),
+    ("Low Duration","Low Duration"),("Short Duration","Short Duration"),("Short Term","Short Duration"),
+    ("Medium Duration","Medium Duration"),("Long Duration","Long Duration"),("Dynamic Bond","Dynamic Bond"),
+    ("Corporate Bond","Corporate Bond"),("Credit Risk","Credit Risk"),("Gilt","Gilt"),
+    ("Floating Rate","Floating Rate"),("Money Market","Money Market"),("Banking and PSU","Banking & PSU"),
+    ("Banking & PSU","Banking & PSU"),("Large & Mid Cap","Large & Mid Cap"),("Large and Mid Cap","Large & Mid Cap"),
+    ("Large Cap","Large Cap"),("Mid Cap","Mid Cap"),("Midcap","Mid Cap"),("Small Cap","Small Cap"),
+    ("Smallcap","Small Cap"),("Multi Cap","Multi Cap"),("Flexi Cap","Flexi Cap"),("Focused","Focused"),
+    ("Value","Value / Contra"),("Contra","Value / Contra"),("Dividend Yield","Dividend Yield"),
+    ("ELSS","ELSS (Tax Saving)"),("Tax Saver","ELSS (Tax Saving)"),("Infrastructure","Sectoral / Thematic"),
+    ("Technology","Sectoral / Thematic"),("Pharma","Sectoral / Thematic"),("Banking","Sectoral / Thematic"),
+    ("Nifty","Index Fund"),("Sensex","Index Fund"),("Index","Index Fund"),("ETF","ETF"),
+    ("Gold","Gold / Commodities"),("International","International / FOF"),("Overseas","International / FOF"),
+    ("Nasdaq","International / FOF"),("Fund of Fund","International / FOF"),("FOF","International / FOF"),
+    ("Feeder","International / FOF"),("Balanced Advantage","Hybrid"),("Aggressive Hybrid","Hybrid"),
+    ("Conservative Hybrid","Hybrid"),("Hybrid","Hybrid"),("Balanced","Hybrid"),("Arbitrage","Arbitrage"),
+    ("Retirement","Retirement"),("Children","Children"),
+]
+REQUIRED = ["DIRECT", "GROWTH"]
+EXCLUDED = ["IDCW","DIVIDEND","BONUS","PAYOUT","REINVEST","ANNUAL","MONTHLY","QUARTERLY","WEEKLY"]
+
+_PATH = os.environ.get(
+    "MF_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "mf_list.json"),
+)
+_RULES = hashlib.sha1(json.dumps([CATS, REQUIRED, EXCLUDED]).encode()).hexdigest()[:12]
+
+# labels: CATS position (priority) for categories, "exclude" for the filter
+_matcher = KeywordMatcher(
+    [(kw, i, False) for i, (kw, _) in enumerate(CATS)]
+    + [(kw, "exclude", False) for kw in EXCLUDED]
+)
+
+_list_cache  = {"ts": 0, "data": None, "schemes": {}, "failed": 0, "error": None}
+_list_lock   = threading.Lock()   # guards _list_cache; never held over the download
+_list_flight = None               # Event while one thread downloads the list
+
+
+def classify(name):
+    """Category for a Direct-Growth scheme name, None if the filters drop it."""
+    low = name.lower()
+    if not all(kw.lower() in low for kw in REQUIRED):
+        return None                    # most of the list; skip the scan
+    found = _matcher.scan(low)
+    if "exclude" in found:
+        return None
+    prio = [l for l in found if isinstance(l, int)]
+    return CATS[min(prio)][1] if prio else "Other"
+
+
+def _result(schemes):
+    funds = [{"code": int(code), "name": name, "cat": cat}
+             for code, (name, cat) in schemes.items() if cat is not None]
+    return {"funds": funds, "total": len(funds)}
+
+
+def _load_store():
+    try:
+        with open(_PATH, encoding="utf-8") as f:
+            d = json.load(f)
+    except (OSError, ValueError):
+        return 0, {}
+    if d.get("rules") != _RULES:
+        return 0, {}                   # rules changed: keep nothing
+    return d.get("ts", 0), d.get("schemes", {})
+
+
+def _save_store(ts, schemes):
+    try:
+        os.makedirs(os.path.dirname(_PATH), exist_ok=True)
+        tmp = f"{_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"rules": _RULES, "ts": ts, "schemes": schemes}, f, ensure_ascii=False)
+        os.replace(tmp, _PATH)
+    except OSError as e:
+        print(f"  ⚠ MF list store write failed: {e}")
+
+
+def _publish(ts, schemes):
+    data = _result(schemes)
+    mf_index.build(data["funds"])
+    _list_cache.update(ts=ts, data=data, schemes=schemes)
+    return data
+
+
+def load_list():
+    """
+    {"funds": [{code, name, cat}, …], "total": n}, or {"error": …}.
+
+    One thread downloads at a time, outside _list_lock; others get the stale
+    list meanwhile, or wait for the download if there is none. A failed
+    download is not retried for LIST_RETRY seconds.
+    """
+    global _list_flight
+    with _list_lock:
+        now = time.time()
+        if _list_cache["data"] and now - _list_cache["ts"] < LIST_TTL:
+            return _list_cache["data"]
+        if not _list_cache["schemes"]:
+            ts, stored = _load_store()
+            if stored:
+                data = _publish(ts, stored)        # stale or not, better than nothing
+                if now - ts < LIST_TTL:
+                    return data
+
+        flight = _list_flight
+        if flight is None:
+            if now - _list_cache["failed"] < LIST_RETRY:
+                return _list_cache["data"] or {"error": _list_cache["error"]}
+            old = _list_cache["schemes"]
+            _list_flight = threading.Event()
+        elif _list_cache["data"]:
+            return _list_cache["data"]
+
+    if flight is not None:
+        flight.wait(20)
+        return _list_cache["data"] or {"error": _list_cache["error"] or "MF list download timed out"}
+    try:
+        return _download_list(old)
+    finally:
+        with _list_lock:
+            done, _list_flight = _list_flight, None
+        done.set()
+
+
+def _download_list(old):
+    try:
+        r = requests.get("https://api.mfapi.in/mf", timeout=15)
+        r.raise_for_status()
+        schemes, fresh = {}, 0
+        for f in r.json():
+            if f.get("schemeCode") is None:
+                continue
+            code = str(f["schemeCode"])
+            name = f.get("schemeName", "").strip()
+            prev = old.get(code)
+            if prev and prev[0] == name:
+                schemes[code] = prev
+            else:
+                schemes[code] = [name, classify(name)]
+                fresh += 1
+    except Exception as e:
+        print(f"  ⚠ MF list download failed: {e}")
+        with _list_lock:
+            _list_cache.update(failed=time.time(), error=str(e))
+            return _list_cache["data"] or {"error": str(e)}
+
+    now = time.time()
+    if fresh or len(schemes) != len(old):
+        print(f"✅ MF list: {len(schemes)} schemes, {fresh} (re)classified")
+    _save_store(now, schemes)
+    with _list_lock:
+        _list_cache.update(failed=0, error=None)
+        return _publish(now, schemes)
+
+
+def get_detail(code):
+    """Scheme meta, latest NAV and 1Y/3Y/5Y point returns from the local NAV store."""
+    try:
+        meta, arr = nav_store.series(code)
+    except Exception as e:
+        return {"error": str(e)}
+    if not len(arr):
+        return {"error": NO_NAV}
+    return {
+        "schemeCode": int(code), "schemeName": meta.get("scheme_name", ""),
+        "fundHouse": meta.get("fund_house", ""), "schemeType": meta.get("scheme_type", ""),
+        "schemeCategory": meta.get("scheme_category", ""), "latestNAV": float(arr["nav"][-1]),
+        "navDate": nav_store.day_str(arr["day"][-1]),
+        "return_1y": nav_store.point_return(arr, 365),
+        "return_3y": nav_store.point_return(arr, 1095),
+        "return_5y": nav_store.point_return(arr, 1825),
+    }
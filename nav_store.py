@@ -0,0 +1,225 @@
+"""
+nav_store.py — persistent local NAV history per mutual fund scheme.
+
+One .npy file per scheme holding a structured array (day, nav) sorted by
+day, where day counts days since 1970-01-01, plus a small .json with the
+mfapi.in scheme meta. series() serves both from memory after the first read.
+
+  - dates are parsed once, vectorized, when a history is downloaded — never
+    per request
+  - a scheme is synced at most once per business day: after the first full
+    download only mfapi.in's /latest NAV is fetched and appended; if it
+    skips over a business day that is missing locally (holiday-free
+    weekdays, so roughly "more than one NAV behind") the full history is
+    fetched again and merged
+  - nav_index() / nav_at() / point_return() are np.searchsorted lookups
+  - series_many() syncs several schemes concurrently over one pooled
+    keep-alive session
+
+Files are written to a temp path and os.replace()d (as candle_store does);
+the .npy mtime is "last synced". Directory: $NAV_STORE_DIR or ./data/nav.
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import requests
+
+NAV_DTYPE = np.dtype([("day", "<i4"), ("nav", "<f8")])
+
+_DIR = os.environ.get(
+    "NAV_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "nav"),
+)
+_API = "https://api.mfapi.in/mf"
+_IST = timezone(timedelta(hours=5, minutes=30))
+_MEM_MAX = 256
+_FETCHERS = 10
+
+# one keep-alive connection pool to mfapi.in, sized for series_many()
+_session = requests.Session()
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=_FETCHERS))
+_pool    = ThreadPoolExecutor(max_workers=_FETCHERS, thread_name_prefix="nav")
+_mem: dict = {}          # code → (meta, arr, synced unix time)
+_locks: dict = {}
+_locks_guard = threading.Lock()
+
+
+def empty():
+    return np.empty(0, dtype=NAV_DTYPE)
+
+
+def today():
+    """Current day number on the Indian calendar (NAVs are dated IST)."""
+    return (datetime.now(_IST).date() - datetime(1970, 1, 1).date()).days
+
+
+def day_str(day):
+    """Day number → mfapi.in's dd-mm-YYYY."""
+    return (datetime(1970, 1, 1) + timedelta(days=int(day))).strftime("%d-%m-%Y")
+
+
+def parse(rows):
+    """mfapi.in [{"date": "dd-mm-YYYY", "nav": "…"}, …] → NAV_DTYPE, oldest first."""
+    ok = [r for r in rows if len(r.get("date", "")) == 10]
+    iso = np.array([f"{r['date'][6:]}-{r['date'][3:5]}-{r['date'][:2]}" for r in ok],
+                   dtype="datetime64[D]")
+    nav = np.array([r.get("nav") or "nan" for r in ok], dtype=np.float64)
+    out = np.empty(len(ok), dtype=NAV_DTYPE)
+    out["day"], out["nav"] = iso.astype(np.int64), nav
+    out = out[np.isfinite(out["nav"]) & (out["nav"] > 0)]
+    out = out[np.argsort(out["day"], kind="stable")]
+    if len(out) > 1:                           # duplicate dates: keep the last copy
+        out = out[np.append(out["day"][1:] != out["day"][:-1], True)]
+    return out
+
+
+def _path(code, ext):
+    return os.path.join(_DIR, f"{int(code)}.{ext}")
+
+
+def _lock(code):
+    with _locks_guard:
+        lk = _locks.get(code)
+        if lk is None:
+            lk = _locks[code] = threading.Lock()
+    return lk
+
+
+def _load(code):
+    try:
+        arr = np.load(_path(code, "npy"))
+        with open(_path(code, "json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        synced = os.path.getmtime(_path(code, "npy"))
+    except (OSError, ValueError):
+        return None
+    if arr.dtype != NAV_DTYPE:
+        return None
+    return meta, arr, synced
+
+
+def _save(code, meta, arr):
+    os.makedirs(_DIR, exist_ok=True)
+    for ext, write in (("json", lambda f: f.write(json.dumps(meta).encode())),
+                       ("npy",  lambda f: np.save(f, arr))):
+        p   = _path(code, ext)
+        tmp = f"{p}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, p)
+
+
+def _touch(code):
+    try:
+        os.utime(_path(code, "npy"))
+    except OSError:
+        pass
+
+
+def _busdays(start, end):
+    """Weekdays in [start, end) — day numbers."""
+    return int(np.busday_count(np.datetime64(int(start), "D"), np.datetime64(int(end), "D")))
+
+
+def _due(synced, last_day):
+    """True once a business day has started since the last sync and NAV."""
+    synced_day = int((synced + 19800) // 86400)          # IST day of the sync
+    now = today()
+    return now > synced_day and _busdays(last_day + 1, now + 1) > 0
+
+
+def _fetch(code, latest=False):
+    r = _session.get(f"{_API}/{int(code)}" + ("/latest" if latest else ""), timeout=10)
+    r.raise_for_status()
+    d = r.json()
+    return d.get("meta") or {}, parse(d.get("data") or [])
+
+
+def _sync(code, cur):
+    """Bring a stored scheme up to date; returns (meta, arr, synced)."""
+    meta, arr, _ = cur
+    last = int(arr["day"][-1])
+    _, new = _fetch(code, latest=True)
+    if not len(new) or new["day"][-1] <= last:
+        _touch(code)                                     # nothing newer upstream
+        return meta, arr, time.time()
+    if _busdays(last + 1, new["day"][0]) > 0:
+        meta, new = _fetch(code)                         # missed NAVs: full history
+    arr = np.concatenate([arr, new[new["day"] > last]])
+    _save(code, meta, arr)
+    return meta, arr, time.time()
+
+
+def series(code):
+    """
+    (meta, NAV_DTYPE array) for a scheme, syncing first when due.
+    Raises requests errors only when there is no local copy to fall back on.
+    """
+    code = int(code)
+    cur = _mem.get(code)
+    if cur and not _due(cur[2], int(cur[1]["day"][-1])):
+        return cur[0], cur[1]
+    with _lock(code):
+        cur = _mem.get(code) or _load(code)
+        if cur is None or not len(cur[1]):
+            meta, arr = _fetch(code)
+            if len(arr):
+                _save(code, meta, arr)
+            cur = (meta, arr, time.time())
+        elif _due(cur[2], int(cur[1]["day"][-1])):
+            try:
+                cur = _sync(code, cur)
+            except (requests.RequestException, ValueError) as e:
+                print(f"  ⚠ NAV sync failed for {code}: {e}")
+                cur = (cur[0], cur[1], time.time())      # serve stale, retry tomorrow
+        if len(cur[1]):
+            if len(_mem) >= _MEM_MAX and code not in _mem:
+                _mem.pop(next(iter(_mem)))
+            _mem[code] = cur
+        return cur[0], cur[1]
+
+
+def series_many(codes):
+    """
+    {code: (meta, arr) or the exception raised} for several schemes; the
+    ones that need a download are fetched concurrently.
+    """
+    def one(code):
+        try:
+            return series(code)
+        except Exception as e:
+            return e
+    codes = [int(c) for c in codes]
+    return dict(zip(codes, _pool.map(one, codes)))
+
+
+def nav_index(days, day):
+    """Index of the first NAV dated after `day` (the old nav_on_date() rule); len(days) if none."""
+    return np.searchsorted(days, day, side="right")
+
+
+def nav_at(arr, day):
+    """First NAV dated after `day`, else None."""
+    i = nav_index(arr["day"], day)
+    return float(arr["nav"][i]) if i < len(arr) else None
+
+
+def point_return(arr, days):
+    """% change from the NAV `days` ago to the latest, else None."""
+    if not len(arr):
+        return None
+    old = nav_at(arr, today() - days)
+    return round(float(arr["nav"][-1] - old) / old * 100, 2) if old else None
+
+
+def clear(code=None):
+    if code is None:
+        _mem.clear()
+    else:
+        _mem.pop(int(code), None)
@@ -0,0 +1,185 @@
+"""
+news_index.py — in-memory full-text search over the news_service store.
+
+    search("hdfc results")     →  best matches, BM25 × recency
+
+  - headlines are lowercased and split on non-alphanumerics ("m&m" stays one
+    token); a few stopwords are dropped
+  - postings are term → {doc id: term frequency}; each doc's terms are kept
+    too, so an expired article is unindexed without scanning the vocabulary
+  - the last query token also matches as a prefix ("tata mot…"): bisect on a
+    sorted vocabulary, at most MAX_EXPANSIONS terms
+  - score = BM25 (k1 1.2, b 0.75) × (1 + 2^(−age / RECENCY_HALF_LIFE)),
+    evaluated per query term as one NumPy expression over that term's posting
+    (cached as id / tf arrays until the posting changes) into a dense score
+    array, so a term found in thousands of headlines is still one vector op
+  - the index follows the store through news_service.on_change (and checks
+    news_service.version() before each query): only added or removed articles
+    are (un)indexed, and a removed article's doc id goes to the next one
+    added, so the per-doc arrays stay the size of the store. After a restart
+    the first sync indexes the persisted store in one pass — there is no
+    separate index file
+
+Articles older than news_service.RETENTION_DAYS leave the store and
+therefore the index.
+"""
+
+import re
+import math
+import time
+import bisect
+import threading
+
+import numpy as np
+
+import news_service
+
+K1, B = 1.2, 0.75
+RECENCY_HALF_LIFE = 3 * 86400
+MAX_EXPANSIONS    = 50
+
+_TOKEN_RE  = re.compile(r"[a-z0-9&]+")
+_STOPWORDS = {"a", "an", "the", "of", "in", "on", "to", "for", "and", "or", "at", "by",
+              "is", "as", "with", "from", "its", "it", "be", "are", "was"}
+
+_lock     = threading.Lock()
+_postings: dict = {}     # term → {doc: tf}
+_vocab:    list = []     # sorted terms, for prefix lookups
+_docs:     dict = {}     # doc → (article, length, terms)
+_arrays:   dict = {}     # term → (doc ids, tfs) as ndarrays, built on demand
+_lengths   = np.zeros(1024)            # by doc id
+_times     = np.zeros(1024)
+_ids:      dict = {}     # article dedupe key → doc
+_free:     list = []     # ids of removed docs, reused before _next_id grows
+_next_id  = 0
+_total_len = 0
+_version  = -1
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _add(article, bulk=False):
+    global _next_id, _total_len, _lengths, _times
+    toks = tokenize(article["title"])
+    if _free:
+        doc = _free.pop()
+    else:
+        doc = _next_id
+        _next_id += 1
+    if doc >= len(_lengths):
+        _lengths = np.resize(_lengths, 2 * len(_lengths))
+        _times   = np.resize(_times, 2 * len(_times))
+    _lengths[doc], _times[doc] = len(toks), article["ts"]
+    tf = {}
+    for t in toks:
+        tf[t] = tf.get(t, 0) + 1
+    for t, n in tf.items():
+        post = _postings.get(t)
+        if post is None:
+            post = _postings[t] = {}
+            if not bulk:
+                bisect.insort(_vocab, t)
+        post[doc] = n
+        _arrays.pop(t, None)
+    _docs[doc] = (article, len(toks), tuple(tf))
+    _ids[news_service._key(article["title"])] = doc
+    _total_len += len(toks)
+
+
+def _remove(key):
+    global _total_len
+    doc = _ids.pop(key)
+    _, length, terms = _docs.pop(doc)
+    for t in terms:
+        post = _postings[t]
+        del post[doc]
+        _arrays.pop(t, None)
+        if not post:
+            del _postings[t]
+            del _vocab[bisect.bisect_left(_vocab, t)]
+    _total_len -= length
+    _free.append(doc)
+
+
+def _sync():
+    """Catch up with the article store if it changed since the last query."""
+    global _version
+    v = news_service.version()
+    if v == _version and _ids:
+        return
+    current = {news_service._key(a["title"]): a for a in news_service.articles()}
+    with _lock:
+        # gone, or replaced under the same headline (a feed copy of an ingested article)
+        for k in [k for k, d in _ids.items() if current.get(k) is not _docs[d][0]]:
+            _remove(k)
+        new  = [a for k, a in current.items() if k not in _ids]
+        bulk = len(new) > 1000          # e.g. the first sync after a restart
+        for a in new:
+            _add(a, bulk)
+        if bulk:
+            _vocab[:] = sorted(_postings)
+        _version = v
+
+
+def _posting(t):
+    a = _arrays.get(t)
+    if a is None:
+        post = _postings[t]
+        a = _arrays[t] = (np.fromiter(post.keys(), np.int64, len(post)),
+                          np.fromiter(post.values(), np.float64, len(post)))
+    return a
+
+
+def _expand(token):
+    i = bisect.bisect_left(_vocab, token)
+    out = []
+    while i < len(_vocab) and _vocab[i].startswith(token) and len(out) < MAX_EXPANSIONS:
+        out.append(_vocab[i])
+        i += 1
+    return out
+
+
+def search(query, limit=20):
+    """Ranked articles for a free-text query, each with a "score"."""
+    _sync()
+    toks = tokenize(query)
+    if not toks:
+        return []
+    now = time.time()
+    with _lock:
+        n = len(_docs)
+        if not n:
+            return []
+        avg = _total_len / n
+        terms = set(toks[:-1])
+        terms.update(_expand(toks[-1]) if len(toks[-1]) >= 2 else [toks[-1]])
+
+        scores = np.zeros(_next_id)
+        for t in terms:
+            if t not in _postings:
+                continue
+            ids, tf = _posting(t)
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            scores[ids] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * _lengths[ids] / avg))
+
+        hit = np.flatnonzero(scores)
+        if not len(hit):
+            return []
+        age    = np.maximum(now - _times[hit], 0)
+        ranked = scores[hit] * (1 + 0.5 ** (age / RECENCY_HALF_LIFE))
+        top    = np.argpartition(-ranked, limit - 1)[:limit] if len(hit) > limit else np.arange(len(hit))
+        top    = top[np.argsort(-ranked[top])]
+        return [dict({k: _docs[d][0].get(k) for k in ("title", "source", "color", "link",
+                                                     "published", "symbols", "origin")},
+                     score=round(float(r), 4))
+                for d, r in zip(hit[top].tolist(), ranked[top])]
+
+
+def stats():
+    with _lock:
+        return {"articles": len(_docs), "terms": len(_postings)}
+
+
+news_service.on_change.append(_sync)
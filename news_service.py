@@ -0,0 +1,354 @@
+"""
+news_service.py — background RSS aggregator behind /news.
+
+A daemon thread polls FEEDS every POLL_SECONDS:
+
+  - conditional GETs: each feed's ETag / Last-Modified is replayed as
+    If-None-Match / If-Modified-Since, so unchanged feeds cost a 304
+  - only items whose GUID (or link) hasn't been seen before are filtered and
+    parsed into articles; rejected items are remembered too
+  - articles are deduplicated across feeds by normalized headline and kept
+    newest-first in memory, so /news is a slice of a list
+  - the store (articles, seen GUIDs, feed validators) is written to
+    $NEWS_STORE_PATH (default ./data/news.json) after every poll that changed
+    it and reloaded on start, so a restart neither refetches everything nor
+    loses history
+
+Headlines go through one compiled KeywordMatcher pass that applies the
+REJECT / FINANCE filters and tags the article with every symbol whose
+STOCK_TICKERS alias appears as a whole word (ambiguous aliases like "hero" or
+"bajaj" are skipped). for_symbol() reads the resulting symbol → articles
+index; stock_service.get_news() checks it before asking Yahoo.
+
+ingest() adds articles fetched elsewhere (Yahoo per-symbol news) with an
+"origin"; they are kept for search (news_index.py) but never shown by /news
+or for_symbol(), until a feed carries the same headline — the feed copy then
+takes the entry over, keeping the ingested symbol tags. version() changes whenever the store does, and callables
+in on_change run (on the polling/ingesting thread) after every change.
+
+Articles older than RETENTION_DAYS are dropped; /news itself shows the last
+24 h like before.
+"""
+
+import os
+import json
+import time
+import html
+import threading
+import multiprocessing as mp
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from keyword_matcher import KeywordMatcher
+
+FEEDS = [
+    ("https://economictimes.indiatimes.com/markets/stocks/rss.cms", "Economic Times", "#f97316"),
+    ("https://economictimes.indiatimes.com/markets/rss.cms", "Economic Times", "#f97316"),
+    ("https://www.moneycontrol.com/rss/MCtopnews.xml", "MoneyControl", "#ef4444"),
+    ("https://www.moneycontrol.com/rss/marketreports.xml", "MoneyControl", "#ef4444"),
+    ("https://www.moneycontrol.com/rss/latestnews.xml", "MoneyControl", "#ef4444"),
+    ("https://www.livemint.com/rss/markets", "Mint", "#0ea5e9"),
+    ("https://www.business-standard.com/rss/markets-106.rss", "Business Standard", "#8b5cf6"),
+    ("https://www.financialexpress.com/market/feed/", "Financial Express", "#10b981"),
+    ("https://feeds.feedburner.com/ndtvprofit-latest", "NDTV Profit", "#f59e0b"),
+    ("https://feeds.reuters.com/reuters/INbusinessNews", "Reuters", "#dc2626"),
+]
+REJECT = ["ramadan","eid","bollywood","cricket","ipl","movie","weather","horoscope","celebrity","fashion","covid","vaccine","election"]
+FINANCE = ["stock","share","market","nifty","sensex","bse","nse","rupee","rbi","sebi","ipo","fund","equity","invest","earning","profit","revenue","quarter","budget","economy","gdp","inflation","rate","bank","crore","lakh","billion","dividend","gold","silver","crude","forex"]
+
+# STOCK_TICKERS aliases that are common words or name several companies
+AMBIGUOUS_ALIASES = {
+    "hero", "bob", "rec", "lt", "max", "page", "supreme", "shree", "avenue", "varun",
+    "asian", "apollo", "torrent", "persistent", "oracle", "bajaj", "hdfc", "axis",
+    "adani", "chola", "sriram", "bharti", "mahindra", "meta",
+}
+
+POLL_SECONDS   = int(os.environ.get("NEWS_POLL_SECONDS", 120))
+RETENTION_DAYS = 30
+WINDOW_HOURS   = 24
+
+_PATH = os.environ.get(
+    "NEWS_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "news.json"),
+)
+_HEADERS = {"User-Agent": "Mozilla/5.0", "Accept": "application/xml"}
+
+_lock     = threading.Lock()
+_articles: list = []     # newest first
+_by_key:   dict = {}     # dedupe key → article
+_seen:     dict = {}     # guid → first-seen unix time
+_feeds:    dict = {}     # url → {"etag": …, "modified": …}
+_by_symbol: dict = {}    # symbol → [article, …] newest first
+_version  = 0
+on_change: list = []
+_loaded   = False
+_thread   = None
+_pool     = ThreadPoolExecutor(max_workers=6, thread_name_prefix="news")
+_filters  = KeywordMatcher([(k, "reject", False) for k in REJECT]
+                           + [(k, "finance", False) for k in FINANCE])
+_matcher  = None        # _filters + ticker aliases, once configure()d
+
+
+def _key(title):
+    return title.lower()[:60]
+
+
+def configure(tickers):
+    """
+    Build the headline matcher from an alias → symbol map (app.STOCK_TICKERS)
+    and re-tag the stored articles. Until called, only the filters apply.
+    """
+    global _matcher
+    entries  = [(k, "reject", False) for k in REJECT]
+    entries += [(k, "finance", False) for k in FINANCE]
+    for alias, sym in tickers.items():
+        if alias not in AMBIGUOUS_ALIASES:
+            entries.append((alias, sym, True))
+    for sym in set(tickers.values()):
+        base = sym.split(".")[0]
+        if len(base) >= 3 and base.lower() not in AMBIGUOUS_ALIASES:
+            entries.append((base, sym, True))
+    _matcher = KeywordMatcher(entries)
+    _load()
+    with _lock:
+        for a in _articles:
+            if not a.get("origin"):       # ingested ones keep their source's tag
+                a["symbols"] = _classify(a["title"])[1]
+        _reindex()
+
+
+def _classify(title):
+    """(keep?, [symbols]) from a single matcher pass over the headline."""
+    labels = (_matcher or _filters).scan(title)
+    keep = "finance" in labels and "reject" not in labels
+    return keep, sorted(labels - {"finance", "reject"})
+
+
+def _reindex():
+    """Rebuild the symbol index from _articles (caller holds _lock)."""
+    global _version
+    _version += 1
+    _by_symbol.clear()
+    for a in _articles:
+        if a.get("origin"):
+            continue
+        for sym in a.get("symbols", ()):
+            _by_symbol.setdefault(sym, []).append(a)
+
+
+# ── Persistence ───────────────────────────────────────────────────────────────
+
+def _load():
+    global _loaded
+    with _lock:
+        if _loaded:
+            return
+        _loaded = True
+        try:
+            with open(_PATH, encoding="utf-8") as f:
+                d = json.load(f)
+        except (OSError, ValueError):
+            return
+        _seen.update(d.get("seen", {}))
+        _feeds.update(d.get("feeds", {}))
+        for a in d.get("articles", []):
+            _by_key.setdefault(_key(a["title"]), a)
+        _articles[:] = sorted(_by_key.values(), key=lambda a: a["ts"], reverse=True)
+        _reindex()
+
+
+def _save():
+    with _lock:
+        d = {"feeds": _feeds, "seen": _seen, "articles": _articles}
+        body = json.dumps(d, ensure_ascii=False)
+    try:
+        os.makedirs(os.path.dirname(_PATH), exist_ok=True)
+        tmp = f"{_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp, _PATH)
+    except OSError as e:
+        print(f"  ⚠ News store write failed: {e}")
+
+
+# ── Polling ───────────────────────────────────────────────────────────────────
+
+def _fetch_feed(url, src, color):
+    """New articles from one feed (empty on 304 / error)."""
+    with _lock:
+        v = dict(_feeds.get(url, {}))
+    hdrs = dict(_HEADERS)
+    if v.get("etag"):
+        hdrs["If-None-Match"] = v["etag"]
+    if v.get("modified"):
+        hdrs["If-Modified-Since"] = v["modified"]
+    try:
+        r = requests.get(url, headers=hdrs, timeout=7)
+    except requests.RequestException:
+        return []
+    if r.status_code != 200:
+        return []
+
+    with _lock:
+        _feeds[url] = {"etag": r.headers.get("ETag"), "modified": r.headers.get("Last-Modified")}
+    try:
+        root = ET.fromstring(r.content)
+    except ET.ParseError:
+        return []
+    ch    = root.find("channel")
+    items = ch.findall("item") if ch is not None else root.findall("item")
+
+    now, res = time.time(), []
+    for item in items:
+        link = item.findtext("link", "#").strip()
+        guid = item.findtext("guid", "").strip() or link or item.findtext("title", "")
+        with _lock:
+            if guid in _seen:
+                continue
+            _seen[guid] = now
+        title = html.unescape(item.findtext("title", "")).strip()
+        if not title:
+            continue
+        keep, symbols = _classify(title)
+        if not keep:
+            continue
+        pub_str = item.findtext("pubDate", "")
+        try:
+            ts = parsedate_to_datetime(pub_str).timestamp()
+        except Exception:
+            ts = now           # undated items sort by when we first saw them
+        if not link.startswith("http") and guid.startswith("http"):
+            link = guid
+        res.append({"title": title, "source": src, "color": color, "link": link,
+                    "published": pub_str, "ts": ts, "symbols": symbols})
+    return res
+
+
+def poll_once():
+    """Poll every feed once; returns the number of new articles stored."""
+    _load()
+    new = []
+    for res in _pool.map(lambda f: _fetch_feed(*f), FEEDS):
+        new.extend(res)
+
+    floor = time.time() - RETENTION_DAYS * 86400
+    with _lock:
+        added = 0
+        for a in new:
+            k   = _key(a["title"])
+            old = _by_key.get(k)
+            if a["ts"] < floor or (old is not None and not old.get("origin")):
+                continue
+            if old is not None:             # feed copy of an ingested headline: show it
+                a["symbols"] = sorted(set(a["symbols"]) | set(old.get("symbols", ())))
+            _by_key[k] = a
+            added += 1
+        expired = [k for k, a in _by_key.items() if a["ts"] < floor]
+        for k in expired:
+            del _by_key[k]
+        for g in [g for g, t in _seen.items() if t < floor]:
+            del _seen[g]
+        if added or expired:
+            _articles[:] = sorted(_by_key.values(), key=lambda a: a["ts"], reverse=True)
+            _reindex()
+    if new or expired:
+        _save()
+    if added or expired:
+        _changed()
+    return added
+
+
+def _run():
+    while True:
+        try:
+            n = poll_once()
+            if n:
+                print(f"📰 News: {n} new article(s)")
+        except Exception as e:
+            print(f"  ⚠ News poll failed: {e}")
+        time.sleep(POLL_SECONDS)
+
+
+def start():
+    """Start the background poller (idempotent, skipped in worker processes)."""
+    global _thread
+    if mp.parent_process() is not None:
+        return
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(target=_run, name="news-poller", daemon=True)
+    _thread.start()
+
+
+# ── Reads ─────────────────────────────────────────────────────────────────────
+
+def ingest(items, origin, symbol=None):
+    """
+    Store articles from another source: dicts with title/source/link/ts.
+    Headlines already stored are skipped. Returns the number added.
+    """
+    _load()
+    floor = time.time() - RETENTION_DAYS * 86400
+    added = 0
+    with _lock:
+        for it in items:
+            k = _key(it["title"])
+            if not it["title"] or it["ts"] < floor or k in _by_key:
+                continue
+            _by_key[k] = {"title": it["title"], "source": it.get("source", ""), "color": "#64748b",
+                          "link": it.get("link", ""), "published": "", "ts": it["ts"],
+                          "symbols": [symbol] if symbol else [], "origin": origin}
+            added += 1
+        if added:
+            _articles[:] = sorted(_by_key.values(), key=lambda a: a["ts"], reverse=True)
+            _reindex()
+    if added:
+        _save()
+        _changed()
+    return added
+
+
+def _changed():
+    for fn in on_change:
+        try:
+            fn()
+        except Exception as e:
+            print(f"  ⚠ News change hook failed: {e}")
+
+
+def version():
+    return _version
+
+
+def articles():
+    """Snapshot of the whole store, newest first."""
+    _load()
+    with _lock:
+        return list(_articles)
+
+
+def latest(limit=50, hours=WINDOW_HOURS):
+    """Newest articles from the last `hours`, in the /news payload shape."""
+    _load()
+    if _thread is None and not _articles:
+        poll_once()             # no poller (scripts, tests): fill synchronously
+    cutoff = time.time() - hours * 3600
+    out = []
+    for a in articles():
+        if a["ts"] < cutoff or len(out) >= limit:
+            break
+        if a.get("origin"):
+            continue
+        out.append({k: a.get(k) for k in ("title", "source", "color", "link", "published", "symbols")})
+    return out
+
+
+def for_symbol(symbol, limit=12):
+    """Stored articles tagged with symbol, newest first."""
+    _load()
+    with _lock:
+        return list(_by_symbol.get(symbol, ())[:limit])
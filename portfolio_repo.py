@@ -0,0 +1,184 @@
+"""
+portfolio_repo.py — storage access for the /api/portfolio/* routes.
+
+The storage itself is a portfolio_store backend chosen by $PORTFOLIO_BACKEND
+(Supabase by default, or a local SQLite file); this module adds what is the
+same for both:
+
+  - users are memoized by case-folded username → the spelling stored in
+    the users table; a username seen for the first time is looked up once
+    (accounts created as "Bilal" and typed as "bilal" still match). Writes
+    no longer upsert the users row each time
+  - holdings are a read-through cache per user (HOLDINGS_TTL) that every
+    write through this module invalidates, so the panels' 2-minute polling
+    from each open tab mostly never reaches the database. A read that
+    overlapped a write doesn't fill the cache (per-user write generation)
+  - sync() and batch() diff against the stored holdings and send at most
+    one batched upsert and one batched delete, so writes scale with what
+    changed rather than with portfolio size
+
+Functions raise on database errors; the routes turn them into 500s.
+"""
+
+import time
+import threading
+
+import portfolio_store
+
+HOLDINGS_TTL = 300
+
+_store     = None
+_lock      = threading.Lock()
+_users:    dict = {}     # username.lower() → users row
+_holdings: dict = {}     # username.lower() → (loaded at, [holding, …])
+_gen:      dict = {}     # username.lower() → writes so far; never reset
+
+
+def store():
+    """The configured backend, opened on first use."""
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = portfolio_store.open_store()
+    return _store
+
+
+def _key(username):
+    return username.strip().lower()
+
+
+def find_user(username):
+    """The users row for username (any case), or None."""
+    k = _key(username)
+    user = _users.get(k)
+    if user:
+        return user
+    user = store().find_user(username)
+    if user:
+        _users[k] = user
+    return user
+
+
+def identify(username):
+    """Existing users row for username, creating it if needed."""
+    user = find_user(username)
+    if user is None:
+        user = _users[_key(username)] = store().create_user(username)
+    return user
+
+
+def _owner(username):
+    """Stored spelling of username, registering the user on first write."""
+    return identify(username)['username']
+
+
+def load(username):
+    """Holdings for a user, oldest first: [{symbol, qty, avg, addedAt}, …]."""
+    k = _key(username)
+    hit = _holdings.get(k)
+    if hit and time.time() - hit[0] < HOLDINGS_TTL:
+        return list(hit[1])
+    gen   = _gen.get(k, 0)
+    user  = find_user(username)
+    owner = user['username'] if user else username      # rows may predate the users table
+    rows = [{'symbol': r['symbol'], 'qty': r['qty'], 'avg': r['avg_price'], 'addedAt': r['added_at']}
+            for r in store().holdings(owner)]
+    with _lock:
+        if _gen.get(k, 0) == gen:                       # no write landed during the read
+            _holdings[k] = (time.time(), rows)
+    return list(rows)
+
+
+def _invalidate(username):
+    k = _key(username)
+    with _lock:
+        _gen[k] = _gen.get(k, 0) + 1
+        _holdings.pop(k, None)
+
+
+def save(username, symbol, qty, avg, added_at):
+    owner = _owner(username)
+    try:
+        store().apply(owner, [{'symbol': symbol, 'qty': float(qty), 'avg_price': float(avg),
+                               'added_at': int(added_at)}], [], {})
+    finally:
+        _invalidate(username)
+
+
+def delete(username, symbol):
+    user  = find_user(username)
+    owner = user['username'] if user else username
+    try:
+        store().apply(owner, [], [symbol], {})
+    finally:
+        _invalidate(username)
+
+
+def _apply(username, upserts, deletes):
+    """One batched upsert and one batched delete for a user, as atomic as the backend allows."""
+    if not upserts and not deletes:
+        return {'upserted': 0, 'deleted': 0}
+    owner  = _owner(username)
+    before = {h['symbol']: h for h in load(username)}
+    try:
+        store().apply(owner, upserts, deletes, before)
+    finally:
+        _invalidate(username)
+    return {'upserted': len(upserts), 'deleted': len(deletes)}
+
+
+def _changed(row, cur):
+    return (cur is None or float(cur['qty']) != row['qty'] or float(cur['avg']) != row['avg_price']
+            or int(cur['addedAt'] or 0) != row['added_at'])
+
+
+def sync(username, holdings):
+    """
+    Make the stored holdings equal `holdings` (rows with symbol / qty /
+    avg_price / added_at), writing only what differs from what is stored.
+    """
+    current = {h['symbol']: h for h in load(username)}
+    wanted  = {r['symbol']: r for r in holdings}
+    upserts = [r for s, r in wanted.items() if _changed(r, current.get(s))]
+    deletes = [s for s in current if s not in wanted]
+    return _apply(username, upserts, deletes)
+
+
+def batch(username, ops):
+    """
+    Apply [("save", row) | ("delete", symbol), …] in order as one upsert and
+    one delete; a later op on the same symbol overrides an earlier one.
+    """
+    final = {}
+    for op, arg in ops:
+        if op == 'save':
+            final[arg['symbol']] = arg
+        else:
+            final[arg] = None
+    current = {h['symbol'] for h in load(username)}
+    upserts = [r for r in final.values() if r is not None]
+    deletes = [s for s, r in final.items() if r is None and s in current]
+    return _apply(username, upserts, deletes)
+
+
+def trades(username):
+    """Ledger rows for a user in (date, id) order — uncached; ledger.py keeps the derived book."""
+    user = find_user(username)
+    return store().trades(user['username']) if user else []
+
+
+def add_trades(username, rows):
+    """Append rows {symbol, side, qty, price, date} to a user's ledger."""
+    store().add_trades(_owner(username), rows)
+
+
+def debug(username):
+    return store().debug(username)
+
+
+def clear():
+    _users.clear()
+    _holdings.clear()
+    if _store is not None:
+        _store.clear()
@@ -0,0 +1,76 @@
+"""
+portfolio_service.py — server-side valuation behind /api/portfolio/value.
+
+value(holdings) prices every holding with one stock_service.get_quotes()
+call and converts USD positions to INR with the cached get_fx_rate(), so
+the portfolio panel's refresh is a single request instead of a quote and a
+profile fetch per holding plus a client-side FX call.
+
+Per holding it returns invested / current / P&L in the holding's own
+currency; totals are in INR over the holdings that have a price (the same
+rule the panel used). Names and logos are included when stock_service
+already has the profile cached; the client fetches the rest once.
+"""
+
+import stock_service as ss
+
+
+def _r(v, d=2):
+    return None if v is None else round(float(v), d)
+
+
+def value(holdings):
+    syms   = [h["symbol"] for h in holdings]
+    quotes = ss.get_quotes(syms) if syms else {}
+    usd_inr = None
+    if any(q.get("currency") == "USD" for q in quotes.values()):
+        usd_inr = ss.get_fx_rate("USD", "INR")
+
+    rows, tot_i, tot_c, priced, ccys = [], 0.0, 0.0, 0, set()
+    for h in holdings:
+        q    = quotes.get(h["symbol"]) or {}
+        ltp  = q.get("current")
+        ccy  = q.get("currency") or ss._symbol_currency(h["symbol"])
+        qty, avg = float(h["qty"]), float(h["avg"])
+        inv  = qty * avg
+        cur  = qty * ltp if ltp is not None else None
+        pnl  = cur - inv if cur is not None else None
+        fx   = usd_inr if ccy == "USD" else 1.0
+        if cur is not None and fx:
+            tot_i += inv * fx
+            tot_c += cur * fx
+            priced += 1
+        ccys.add(ccy)
+        prof = ss._get(f"profile:{h['symbol']}") or {}
+        rows.append({
+            "symbol":     h["symbol"],
+            "qty":        qty,
+            "avg":        avg,
+            "addedAt":    h.get("addedAt"),
+            "currency":   ccy,
+            "ltp":        ltp,
+            "change_pct": q.get("change_pct"),
+            "invested":   _r(inv),
+            "current":    _r(cur),
+            "pnl":        _r(pnl),
+            "pnl_pct":    _r(pnl / inv * 100) if pnl is not None and inv else None,
+            "name":       prof.get("name"),
+            "logo":       prof.get("logo"),
+            "logo_domain": prof.get("logo_domain"),
+        })
+
+    pnl = tot_c - tot_i
+    return {
+        "holdings": rows,
+        "totals": {
+            "currency": "INR",
+            "invested": _r(tot_i),
+            "current":  _r(tot_c),
+            "pnl":      _r(pnl),
+            "pnl_pct":  _r(pnl / tot_i * 100) if tot_i > 0 else None,
+            "priced":   priced,
+            "count":    len(rows),
+        },
+        "usd_inr": _r(usd_inr, 4),
+        "mixed":   len(ccys) > 1,
+    }
@@ -0,0 +1,283 @@
+"""
+portfolio_store.py — storage backends behind portfolio_repo.
+
+Two implementations of the same small interface, picked by
+$PORTFOLIO_BACKEND:
+
+  supabase (default)  the hosted users / portfolios tables over PostgREST
+  sqlite              a local file, $PORTFOLIO_DB_PATH (default
+                      ./data/portfolio.db), in WAL mode so reads never wait
+                      on a writer; (username, symbol) is the clustered
+                      primary key and usernames compare case-insensitively
+
+Interface (rows use the portfolios column names):
+
+  find_user(username)              users row for any spelling, or None
+  create_user(username)            insert and return the users row
+  holdings(owner)                  [{symbol, qty, avg_price, added_at}, …], oldest first
+  apply(owner, upserts, deletes, before)
+                                   upsert rows and delete symbols together;
+                                   `before` is {symbol: holding} as last read,
+                                   for backends that have to undo by hand
+  trades(owner)                    ledger rows {id, symbol, side, qty, price, date},
+                                   in (date, id) order
+  add_trades(owner, rows)          append ledger rows in one insert
+  debug(username)                  raw rows for /api/portfolio/debug
+
+Caching and diffing stay in portfolio_repo; backends only talk to storage
+and raise on errors.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+_COLS = "symbol, qty, avg_price, added_at"
+_TRADE_COLS = "id, symbol, side, qty, price, date"
+
+
+class SupabaseStore:
+    """
+    One Supabase client for the process, created on first use. Rows saved
+    under another spelling of a username by old code are found with one
+    ilike read per user; only users that have such rows keep being matched
+    with ilike. The trade ledger needs a `transactions` table with the
+    columns of the SQLite schema below.
+    """
+
+    name = "supabase"
+
+    def __init__(self, url, key):
+        self.url, self.key = url, key
+        self._client  = None
+        self._lock    = threading.Lock()
+        self._checked: set = set()   # users whose rows were checked for other spellings
+        self._legacy:  set = set()   # … and found some
+
+    def client(self):
+        if self._client is None:
+            if not self.url or not self.key:
+                raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in .env")
+            from supabase import create_client
+            with self._lock:
+                if self._client is None:
+                    self._client = create_client(self.url, self.key)
+        return self._client
+
+    def find_user(self, username):
+        res = self.client().table('users').select('*').eq('username', username).execute()
+        if not res.data:
+            res = self.client().table('users').select('*').ilike('username', username).execute()   # legacy spelling
+        return res.data[0] if res.data else None
+
+    def create_user(self, username):
+        ins = self.client().table('users').insert({'username': username, 'created_at': int(time.time())}).execute()
+        return ins.data[0]
+
+    def _mine(self, query, owner):
+        """Filter a portfolios query to one user's rows."""
+        if owner.lower() in self._legacy:
+            return query.ilike('username', owner)
+        return query.eq('username', owner)
+
+    def holdings(self, owner):
+        k = owner.lower()
+        q = self.client().table('portfolios').select('username, ' + _COLS)
+        if k not in self._checked:
+            # once per user: rows saved under another spelling of the name?
+            res = q.ilike('username', owner).order('added_at').execute()
+            if any(r['username'] != owner for r in res.data):
+                self._legacy.add(k)
+            self._checked.add(k)
+        else:
+            res = self._mine(q, owner).order('added_at').execute()
+        return res.data
+
+    def apply(self, owner, upserts, deletes, before):
+        """
+        PostgREST has no multi-request transaction, so if the delete fails
+        after the upsert went through, the upserted symbols are put back
+        the way they were.
+        """
+        sb = self.client()
+        if upserts:
+            sb.table('portfolios').upsert([dict(r, username=owner) for r in upserts],
+                                          on_conflict='username,symbol').execute()
+        if deletes:
+            try:
+                self._mine(sb.table('portfolios').delete(), owner).in_('symbol', deletes).execute()
+            except Exception:
+                self._restore(owner, [r['symbol'] for r in upserts], before)
+                raise
+
+    def _restore(self, owner, symbols, before):
+        sb = self.client()
+        try:
+            old = [{'username': owner, 'symbol': s, 'qty': before[s]['qty'],
+                    'avg_price': before[s]['avg'], 'added_at': before[s]['addedAt']}
+                   for s in symbols if s in before]
+            new = [s for s in symbols if s not in before]
+            if old:
+                sb.table('portfolios').upsert(old, on_conflict='username,symbol').execute()
+            if new:
+                sb.table('portfolios').delete().eq('username', owner).in_('symbol', new).execute()
+        except Exception as e:
+            print(f"  ⚠ Portfolio rollback failed for {owner}: {e}")
+
+    def trades(self, owner):
+        res = (self.client().table('transactions').select(_TRADE_COLS).eq('username', owner)
+               .order('date').order('id').execute())
+        return res.data
+
+    def add_trades(self, owner, rows):
+        now = int(time.time())
+        self.client().table('transactions').insert(
+            [dict(r, username=owner, created_at=now) for r in rows]).execute()
+
+    def debug(self, username):
+        sb = self.client()
+        # Check users table
+        users = sb.table('users').select('*').ilike('username', username).execute()
+        # Check portfolios table - try without ordering first
+        portfolios = sb.table('portfolios').select('*').ilike('username', username).execute()
+        # Also try exact match
+        portfolios_exact = sb.table('portfolios').select('*').eq('username', username).execute()
+        # Get all usernames in portfolios table (first 20)
+        all_users = sb.table('portfolios').select('username').limit(20).execute()
+        return {
+            'users_table': users.data,
+            'portfolios_ilike': portfolios.data,
+            'portfolios_exact': portfolios_exact.data,
+            'all_portfolio_usernames': [r['username'] for r in all_users.data],
+        }
+
+    def clear(self):
+        self._checked.clear()
+        self._legacy.clear()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id         INTEGER PRIMARY KEY,
+    username   TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    created_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS portfolios (
+    username   TEXT NOT NULL COLLATE NOCASE,
+    symbol     TEXT NOT NULL,
+    qty        REAL NOT NULL,
+    avg_price  REAL NOT NULL,
+    added_at   INTEGER,
+    PRIMARY KEY (username, symbol)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS transactions (
+    id         INTEGER PRIMARY KEY,
+    username   TEXT NOT NULL COLLATE NOCASE,
+    symbol     TEXT NOT NULL,
+    side       TEXT NOT NULL CHECK (side IN ('buy', 'sell')),
+    qty        REAL NOT NULL CHECK (qty > 0),
+    price      REAL NOT NULL CHECK (price >= 0),
+    date       TEXT NOT NULL,
+    created_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_user ON transactions (username, date, id);
+"""
+
+_UPSERT = f"""
+INSERT INTO portfolios (username, {_COLS}) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (username, symbol) DO UPDATE SET
+    qty = excluded.qty, avg_price = excluded.avg_price, added_at = excluded.added_at
+"""
+
+
+class SQLiteStore:
+    """
+    Local SQLite file, one connection per thread. Each apply() is a single
+    transaction, so a sync or batch lands completely or not at all.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path   = path
+        self._local = threading.local()
+        with self._db() as db:
+            db.executescript(_SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=10)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")      # durable at checkpoints; fine for WAL
+            self._local.db = db
+        return db
+
+    def find_user(self, username):
+        row = self._db().execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        return dict(row) if row else None
+
+    def create_user(self, username):
+        with self._db() as db:
+            db.execute("INSERT OR IGNORE INTO users (username, created_at) VALUES (?, ?)",
+                       (username, int(time.time())))
+        return self.find_user(username)
+
+    def holdings(self, owner):
+        rows = self._db().execute(
+            f"SELECT {_COLS} FROM portfolios WHERE username = ? ORDER BY added_at", (owner,))
+        return [dict(r) for r in rows]
+
+    def apply(self, owner, upserts, deletes, before=None):
+        with self._db() as db:                           # commits, or rolls back on error
+            if upserts:
+                db.executemany(_UPSERT, [(owner, r['symbol'], r['qty'], r['avg_price'], r['added_at'])
+                                         for r in upserts])
+            if deletes:
+                db.executemany("DELETE FROM portfolios WHERE username = ? AND symbol = ?",
+                               [(owner, s) for s in deletes])
+
+    def trades(self, owner):
+        rows = self._db().execute(
+            f"SELECT {_TRADE_COLS} FROM transactions WHERE username = ? ORDER BY date, id", (owner,))
+        return [dict(r) for r in rows]
+
+    def add_trades(self, owner, rows):
+        now = int(time.time())
+        with self._db() as db:
+            db.executemany(
+                "INSERT INTO transactions (username, symbol, side, qty, price, date, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(owner, r['symbol'], r['side'], r['qty'], r['price'], r['date'], now) for r in rows])
+
+    def debug(self, username):
+        db = self._db()
+        users = db.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchall()
+        rows  = db.execute("SELECT * FROM portfolios WHERE username = ?", (username,)).fetchall()
+        names = db.execute("SELECT DISTINCT username FROM portfolios LIMIT 20").fetchall()
+        return {
+            'users_table': [dict(r) for r in users],
+            'portfolios_ilike': [dict(r) for r in rows],
+            'portfolios_exact': [dict(r) for r in rows if r['username'] == username],
+            'all_portfolio_usernames': [r['username'] for r in names],
+        }
+
+    def clear(self):
+        pass
+
+
+def open_store():
+    """The backend named by $PORTFOLIO_BACKEND."""
+    kind = os.environ.get("PORTFOLIO_BACKEND", "supabase").strip().lower()
+    if kind == "sqlite":
+        return SQLiteStore(os.environ.get(
+            "PORTFOLIO_DB_PATH",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "portfolio.db"),
+        ))
+    if kind == "supabase":
+        return SupabaseStore(os.environ.get("SUPABASE_URL", ""), os.environ.get("SUPABASE_KEY", ""))
+    raise RuntimeError(f"Unknown PORTFOLIO_BACKEND {kind!r} (use supabase or sqlite)")
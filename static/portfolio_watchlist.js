@@ -42,7 +42,6 @@ const FinTracker = (() => {
     const cls    = v => parseFloat(v)>=0?'pt-up':'pt-down';
 
     // ── API helpers ───────────────────────────────────────────────────────────
-    const fetchQ = async sym => { try{ const r=await fetch(`/si/quote?symbol=${encodeURIComponent(sym)}`); const d=await r.json(); return d?.error?null:d; }catch{return null;} };
     const fetchP = async sym => { try{ const r=await fetch(`/si/profile?symbol=${encodeURIComponent(sym)}`); const d=await r.json(); return d?.error?null:d; }catch{return null;} };
 
     // ── Server portfolio API ──────────────────────────────────────────────────
@@ -56,39 +55,76 @@ const FinTracker = (() => {
         } catch { return _portfolioCache; }
     }
 
-    async function serverSave(holding) {
-        if (!_username) return;
-        await fetch('/api/portfolio/save', {
-            method: 'POST',
-            headers: {'Content-Type':'application/json'},
-            body: JSON.stringify({ username: _username, ...holding })
-        });
+    // Edits made in quick succession go out as one /api/portfolio/batch call
+    let _pendingOps = [], _flushTimer = null, _flushWaiters = [];
+    function serverWrite(op) {
+        if (!_username) return Promise.resolve();
+        _pendingOps.push(op);
+        clearTimeout(_flushTimer);
+        _flushTimer = setTimeout(flushWrites, 250);
+        return new Promise(res => _flushWaiters.push(res));
     }
-
-    async function serverDelete(symbol) {
-        if (!_username) return;
-        await fetch('/api/portfolio/delete', {
-            method: 'POST',
-            headers: {'Content-Type':'application/json'},
-            body: JSON.stringify({ username: _username, symbol })
-        });
+    async function flushWrites() {
+        const ops = _pendingOps, waiters = _flushWaiters;
+        _pendingOps = []; _flushWaiters = []; _flushTimer = null;
+        let ok = false;
+        try {
+            const r = await fetch('/api/portfolio/batch', {
+                method: 'POST',
+                headers: {'Content-Type':'application/json'},
+                body: JSON.stringify({ username: _username, ops })
+            });
+            ok = r.ok;
+        } catch {}
+        if (!ok) {
+            // the edits were already applied locally: put back what the server has
+            toast('Could not save your changes — portfolio reloaded', 'error');
+            await serverLoad();
+        }
+        waiters.forEach(res => res());
     }
+    const serverSave   = holding => serverWrite({ op: 'save', ...holding });
+    const serverDelete = symbol  => serverWrite({ op: 'delete', symbol });
 
-    // ── USD/INR exchange rate (cached for 10 min) ─────────────────────────────
-    let _usdInr = null;
-    let _usdInrTs = 0;
-    async function getUsdInr() {
-        const now = Date.now();
-        if (_usdInr && (now - _usdInrTs) < 600000) return _usdInr; // cache 10 min
+    // ── Server-side valuation (batched quotes + cached USD/INR) ──────────────
+    async function fetchValue() {
+        if (!_username) return null;
         try {
-            const r = await fetch('https://api.frankfurter.app/latest?from=USD&to=INR');
+            const r = await fetch(`/api/portfolio/value?username=${encodeURIComponent(_username)}`);
             const d = await r.json();
-            _usdInr = d.rates?.INR || 84.0;
-        } catch {
-            _usdInr = _usdInr || 84.0; // fallback
+            return d?.error ? null : d;
+        } catch { return null; }
+    }
+
+    // names/logos: from the valuation when the server has them, else fetched once
+    const _profiles = {};
+    async function fillProfiles(rows) {
+        rows.forEach(r => { if (r.name) _profiles[r.symbol] = {name:r.name, logo:r.logo, logo_domain:r.logo_domain}; });
+        const missing = rows.filter(r => !_profiles[r.symbol]).map(r => r.symbol);
+        await Promise.all(missing.map(async sym => { const p = await fetchP(sym); if (p) _profiles[sym] = p; }));
+    }
+    // 1M trend per holding from one /si/sparklines call; lines are kept for
+    // 15 min so the 30 s refresh only asks for symbols it hasn't seen
+    let _sparks = {}, _sparkLevels = 0, _sparkAt = 0;
+    function sparkSvg(line) {
+        const v=line.v, w=72, h=22, n=v.length-1;
+        const pts=v.map((y,i)=>`${(i/n*w).toFixed(1)},${(h-y/(_sparkLevels-1)*h).toFixed(1)}`).join(' ');
+        const col=v[n]>=v[0]?'#16a34a':'#dc2626';
+        return `<svg viewBox="0 0 ${w} ${h}" preserveAspectRatio="none"><polyline points="${pts}" fill="none" stroke="${col}" stroke-width="1.5" stroke-linejoin="round"/></svg>`;
+    }
+    async function attachSparklines(c) {
+        const slots=[...c.querySelectorAll('.pt-spark[data-sym]')];
+        if (!slots.length) return;
+        if (Date.now()-_sparkAt > 15*60*1000) { _sparks = {}; _sparkAt = Date.now(); }
+        const missing=[...new Set(slots.map(el=>el.dataset.sym))].filter(s=>!(s in _sparks));
+        if (missing.length) {
+            try {
+                const r = await fetch('/si/sparklines?range=1M&points=30&symbols='+encodeURIComponent(missing.join(',')));
+                const d = await r.json();
+                if (d?.series) { _sparkLevels = d.levels; missing.forEach(s => { _sparks[s] = d.series[s] || null; }); }
+            } catch {}
         }
-        _usdInrTs = now;
-        return _usdInr;
+        slots.forEach(el => { const line=_sparks[el.dataset.sym]; if (line&&line.v.length>1) el.innerHTML=sparkSvg(line); });
     }
     function toast(msg, type='success') {
         const t=document.createElement('div');
@@ -299,17 +335,17 @@ const FinTracker = (() => {
         }
 
         closeModal();
-        renderPortfolio();
         // Persist to server
         await serverSave({symbol:sym, qty:finalQty, avg:finalAvg, added_at:addedAt});
+        renderPortfolio();
     }
 
     async function removeHolding(sym) {
         if(!confirm(`Remove ${display(sym)} from your portfolio?`))return;
         _portfolioCache = _portfolioCache.filter(h=>h.symbol!==sym);
         toast(`${display(sym)} removed`,'info');
-        renderPortfolio();
         await serverDelete(sym);
+        renderPortfolio();
     }
 
     async function renderPortfolio() {
@@ -338,31 +374,29 @@ const FinTracker = (() => {
 
         // skeleton
         content.innerHTML=`<div class="pt-table-wrap"><table class="pt-table">
-            <thead><tr><th>Stock</th><th>Qty</th><th>Avg Buy</th><th>LTP</th><th>Invested</th><th>Curr. Value</th><th>P&amp;L</th><th>Return</th><th></th></tr></thead>
-            <tbody>${port.map(()=>`<tr>${Array(9).fill(`<td><div class="pt-skel" style="height:13px;border-radius:4px;"></div></td>`).join('')}</tr>`).join('')}</tbody>
+            <thead><tr><th>Stock</th><th>Qty</th><th>Avg Buy</th><th>LTP</th><th>1M</th><th>Invested</th><th>Curr. Value</th><th>P&amp;L</th><th>Return</th><th></th></tr></thead>
+            <tbody>${port.map(()=>`<tr>${Array(10).fill(`<td><div class="pt-skel" style="height:13px;border-radius:4px;"></div></td>`).join('')}</tr>`).join('')}</tbody>
         </table></div>`;
 
-        const results=await Promise.all(port.map(async h=>{
-            const [q,p]=await Promise.all([fetchQ(h.symbol),fetchP(h.symbol)]);
-            return{h,q,p};
+        const v = await fetchValue();
+        if (v) _portfolioCache = v.holdings.map(({symbol,qty,avg,addedAt})=>({symbol,qty,avg,addedAt}));
+        const priced = v ? v.holdings : port;
+        await fillProfiles(priced);
+        const results = priced.map(r=>({
+            h: {symbol:r.symbol, qty:r.qty, avg:r.avg, addedAt:r.addedAt},
+            q: r.ltp!=null ? {current:r.ltp, currency:r.currency} : null,
+            p: _profiles[r.symbol] || null,
         }));
+        const usdInr = v?.usd_inr;
 
-        // Fetch live USD/INR rate for cross-currency portfolio totals
-        const usdInr = await getUsdInr();
-
-        let totI=0,totC=0,hasLive=false;
+        // totals come from the server, already converted to INR
+        const totI=v?.totals.invested||0, totC=v?.totals.current||0, hasLive=!!v?.totals.priced;
         const rows=results.map(({h,q,p})=>{
             const isUS = q?.currency==='USD';
             const ltp=q?.current??null, curr=isUS?'$':'₹';
             const inv=h.qty*h.avg, cv=ltp!=null?h.qty*ltp:null;
             const pnl=cv!=null?cv-inv:null, pnlP=pnl!=null&&inv?(pnl/inv)*100:null;
             const name=p?.name||display(h.symbol);
-            // Convert USD values to INR for aggregate totals
-            if(cv!=null){
-                totI += isUS ? inv*usdInr : inv;
-                totC += isUS ? cv*usdInr  : cv;
-                hasLive=true;
-            }
             return `<tr class="pt-tr" onclick="showStockFromPortfolio('${h.symbol}')" style="cursor:pointer;" title="View ${display(h.symbol)}">
                 <td><div class="pt-stock-cell">
                     <div class="pt-logo-wrap">${mkLogo(name, p?.logo, p?.logo_domain, '34px', '9px')}</div>
@@ -371,6 +405,7 @@ const FinTracker = (() => {
                 <td class="pt-mono">${fmtN(h.qty,h.qty%1===0?0:2)}</td>
                 <td class="pt-mono">${curr}${fmtN(h.avg)}</td>
                 <td class="pt-mono ${ltp!=null?(ltp>=h.avg?'pt-up':'pt-down'):''}">${ltp!=null?curr+fmtN(ltp):'—'}</td>
+                <td class="pt-spark" data-sym="${h.symbol}"></td>
                 <td class="pt-mono">${fmtMoney(inv,curr)}</td>
                 <td class="pt-mono">${cv!=null?fmtMoney(cv,curr):'—'}</td>
                 <td class="pt-mono ${pnl!=null?cls(pnl):''}">${pnl!=null?(pnl>=0?'+':'')+fmtMoney(pnl,curr):'—'}</td>
@@ -391,7 +426,7 @@ const FinTracker = (() => {
         const totPnl=totC-totI, totPct=totI>0?(totPnl/totI)*100:0;
         // Check if portfolio has mixed currencies
         // Show/hide currency pill badge in the header
-        const hasMixedCcy = results.some(({q})=>q?.currency==='USD') && results.some(({q})=>q?.currency!=='USD');
+        const hasMixedCcy = !!(v?.mixed && usdInr);
         const ccyBadge = document.getElementById('pt-ccy-badge');
         if (ccyBadge) {
             if (hasMixedCcy) {
@@ -410,9 +445,10 @@ const FinTracker = (() => {
         </div>`;
 
         content.innerHTML=`<div class="pt-table-wrap"><table class="pt-table">
-            <thead><tr><th>Stock</th><th>Qty</th><th>Avg Buy</th><th>LTP</th><th>Invested</th><th>Curr. Value</th><th>P&amp;L</th><th>Return</th><th></th></tr></thead>
+            <thead><tr><th>Stock</th><th>Qty</th><th>Avg Buy</th><th>LTP</th><th>1M</th><th>Invested</th><th>Curr. Value</th><th>P&amp;L</th><th>Return</th><th></th></tr></thead>
             <tbody>${rows}</tbody>
         </table></div>`;
+        attachSparklines(content);
     }
 
     async function startPortfolioRefresh() {
@@ -420,10 +456,7 @@ const FinTracker = (() => {
         // Load from server first, then render
         if (_username) await serverLoad();
         renderPortfolio();
-        _pt = setInterval(async () => {
-            if (_username) await serverLoad();
-            renderPortfolio();
-        }, 120000); // 2 min — matches backend cache TTL, avoids hammering yfinance
+        _pt = setInterval(renderPortfolio, 120000); // 2 min — matches backend cache TTL, avoids hammering yfinance
     }
     function stopPortfolioRefresh(){if(_pt){clearInterval(_pt);_pt=null;}}
 
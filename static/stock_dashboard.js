@@ -9,6 +9,7 @@ const StockDashboard = (() => {
     let _chart = null;
     let _currentTF = '3M';
     let _chartType = 'area'; // 'area' or 'candle'
+    const _overlays = new Set(); // price-pane indicators: 'sma20', 'ema50', 'bb20'
 
     const $id = id => document.getElementById(id);
     const fmt = (v, d=2) => v == null ? '—' : parseFloat(v).toLocaleString('en-IN', {minimumFractionDigits:d, maximumFractionDigits:d});
@@ -201,6 +202,11 @@ const StockDashboard = (() => {
                         <button class="si-ct-btn active" id="si-ct-area" onclick="StockDashboard.setChartType('area')"><i class="fas fa-chart-area"></i> Area</button>
                         <button class="si-ct-btn" id="si-ct-candle" onclick="StockDashboard.setChartType('candle')"><i class="fas fa-chart-bar"></i> Candle</button>
                     </div>
+                    <div class="si-chart-type-bar">
+                        ${[['sma20','SMA 20'],['ema50','EMA 50'],['bb20','BB 20']].map(([k, label]) =>
+                            `<button class="si-ct-btn${_overlays.has(k)?' active':''}" id="si-ov-${k}" onclick="StockDashboard.toggleOverlay('${k}')">${label}</button>`
+                        ).join('')}
+                    </div>
                     <div class="si-tf-bar">
                         ${['1D','1W','1M','3M','6M','1Y','5Y','MAX'].map(tf =>
                             `<button class="si-tf-btn${tf===_currentTF?' active':''}" onclick="StockDashboard.changeTimeframe('${tf}')">${tf}</button>`
@@ -223,6 +229,9 @@ const StockDashboard = (() => {
             ${mc('Div Yield',    metrics.dividend_yield != null ? pctOf(metrics.dividend_yield) : '—')}
             ${mc('Price/Book',   fmt(metrics.price_to_book))}
             ${mc('Debt/Equity',  fmt(metrics.debt_equity))}
+            ${mc('1Y Return',    metrics.return_1y != null ? fmtPct(metrics.return_1y*100) : '—', metrics.return_1y >= 0 ? 'si-up' : 'si-down')}
+            ${mc('Volatility',   metrics.volatility != null ? pctOf(metrics.volatility) : '—')}
+            ${mc('Max Drawdown', metrics.max_drawdown != null ? pctOf(metrics.max_drawdown) : '—', 'si-down')}
         </div>
 
         <!-- ── ANALYST + NEWS ── -->
@@ -379,18 +388,34 @@ const StockDashboard = (() => {
         if (!c) return;
         c.innerHTML = '<div class="si-loading-sm"><i class="fas fa-spinner fa-spin"></i> Loading chart…</div>';
 
-        fetch(`/si/candle?symbol=${encodeURIComponent(symbol)}&timeframe=${tf}`)
+        // Roughly one bar per horizontal pixel; the server buckets longer histories down
+        const maxPoints = Math.max(200, Math.round(c.clientWidth || 600));
+        fetch(`/si/candle?symbol=${encodeURIComponent(symbol)}&timeframe=${tf}&format=columnar&delta=1&max_points=${maxPoints}`)
             .then(r => r.json())
             .then(data => {
-                if (data.error || !data.candles?.length) {
+                const candles = data.error ? [] : fromColumnar(data);
+                if (!candles.length) {
                     c.innerHTML = '<div class="si-chart-empty">Chart data unavailable for this timeframe.</div>';
                     return;
                 }
-                buildChart(c, data.candles, tf);
+                buildChart(c, candles, tf);
+                if (_overlays.size) loadOverlays(symbol, tf, maxPoints);
             })
             .catch(() => { c.innerHTML = '<div class="si-chart-empty">Failed to load chart.</div>'; });
     }
 
+    // Columnar /si/candle payload → [{time, open, high, low, close, volume}]
+    function fromColumnar(d) {
+        if (d.candles) return d.candles;
+        const times = d.time || [];
+        const delta = d.time_encoding === 'delta';
+        let t = 0;
+        return times.map((v, i) => {
+            t = delta ? t + v : v;
+            return { time: t, open: d.open[i], high: d.high[i], low: d.low[i], close: d.close[i], volume: d.volume[i] };
+        });
+    }
+
     function buildChart(container, candles, tf) {
         container.innerHTML = '';
 
@@ -511,6 +536,49 @@ const StockDashboard = (() => {
         }
     }
 
+    // ── Indicator overlays (/si/indicators — computed from the same candle cache) ──
+    const OVERLAY_COLORS = { sma20: '#f59e0b', ema50: '#8b5cf6', bb20: '#64748b' };
+
+    function loadOverlays(symbol, tf, maxPoints) {
+        const set = [..._overlays].join(',');
+        fetch(`/si/indicators?symbol=${encodeURIComponent(symbol)}&timeframe=${tf}&set=${set}&max_points=${maxPoints}`)
+            .then(r => r.json())
+            .then(data => {
+                if (data.error || !_chart || symbol !== _symbol || tf !== _currentTF) return;
+                const intraday = tf === '1D' || tf === '1W';
+                const toTime = t => intraday ? t : new Date(t*1000).toISOString().slice(0,10);
+                Object.entries(data.indicators || {}).forEach(([name, series]) => {
+                    Object.entries(series).forEach(([part, values]) => {
+                        const seen = new Set();
+                        const points = [];
+                        data.time.forEach((t, i) => {
+                            const key = toTime(t);
+                            if (values[i] == null || seen.has(key)) return;
+                            seen.add(key);
+                            points.push({ time: key, value: values[i] });
+                        });
+                        const line = _chart.addLineSeries({
+                            color: OVERLAY_COLORS[name] || '#0ea5e9',
+                            lineWidth: part === 'middle' || part === 'value' ? 2 : 1,
+                            lineStyle: part === 'upper' || part === 'lower' ? LightweightCharts.LineStyle.Dashed : LightweightCharts.LineStyle.Solid,
+                            priceLineVisible: false,
+                            lastValueVisible: false,
+                            crosshairMarkerVisible: false,
+                        });
+                        line.setData(points);
+                    });
+                });
+            })
+            .catch(() => {});
+    }
+
+    function toggleOverlay(name) {
+        if (_overlays.has(name)) _overlays.delete(name); else _overlays.add(name);
+        const btn = $id(`si-ov-${name}`);
+        if (btn) btn.classList.toggle('active', _overlays.has(name));
+        loadChart(_symbol, _currentTF);
+    }
+
     // ── News ──────────────────────────────────────────────────────────────────
     function loadNews(symbol) {
         const c = $id('si-news-container');
@@ -698,5 +766,5 @@ const StockDashboard = (() => {
         });
     });
 
-    return { load, changeTimeframe, setChartType, stopAutoRefresh };
+    return { load, changeTimeframe, setChartType, toggleOverlay, stopAutoRefresh };
 })();
\ No newline at end of file
@@ -8,9 +8,21 @@ Add to app.py:
 """
 from flask import Blueprint, request, jsonify
 import stock_service as ss
+import indicators as ind
+import correlation as corr
+import backtest as bt
+import compute_pool as cp
 
 stock_bp = Blueprint("stock_intel", __name__)
 
+_TIMEFRAMES = {"1D","1W","1M","3M","6M","1Y","5Y","MAX"}
+
+@stock_bp.errorhandler(cp.PoolBusy)
+def _pool_busy(e): return jsonify({"error":str(e)}),503,{"Retry-After":"2"}
+
+@stock_bp.errorhandler(cp.TaskTimeout)
+def _pool_timeout(e): return jsonify({"error":str(e)}),504
+
 def _sym():
     s=(request.args.get("symbol") or request.form.get("symbol") or "").upper().strip().lstrip("$")
     return s or None
@@ -35,10 +47,69 @@ def si_candle():
     sym=_sym()
     if not sym: return jsonify({"error":"Missing symbol"}),400
     tf=request.args.get("timeframe","3M").upper()
-    if tf not in {"1D","1W","1M","3M","6M","1Y","5Y","MAX"}: return jsonify({"error":"Invalid timeframe"}),400
-    data=ss.get_candles(sym,tf)
+    if tf not in _TIMEFRAMES: return jsonify({"error":"Invalid timeframe"}),400
+    fmt=request.args.get("format","rows").lower()
+    if fmt not in {"rows","columnar"}: return jsonify({"error":"Invalid format"}),400
+    delta=request.args.get("delta","").lower() in ("1","true","yes")
+    max_points=request.args.get("max_points",type=int)
+    if max_points is not None and max_points<2: return jsonify({"error":"max_points must be >= 2"}),400
+    data=ss.get_candles(sym,tf,fmt=fmt,delta=delta,max_points=max_points)
     return jsonify(data),(502 if "error" in data else 200)
 
+@stock_bp.route("/si/indicators")
+def si_indicators():
+    sym=_sym()
+    if not sym: return jsonify({"error":"Missing symbol"}),400
+    tf=request.args.get("timeframe","3M").upper()
+    if tf not in _TIMEFRAMES: return jsonify({"error":"Invalid timeframe"}),400
+    names,bad=ind.parse_set(request.args.get("set","sma20"))
+    if bad: return jsonify({"error":f"Unknown indicator(s): {', '.join(bad)}"}),400
+    if not names: return jsonify({"error":"Empty indicator set"}),400
+    max_points=request.args.get("max_points",type=int)
+    if max_points is not None and max_points<2: return jsonify({"error":"max_points must be >= 2"}),400
+    data=ind.get_indicators(sym,tf,names,max_points=max_points)
+    return jsonify(data),(502 if "error" in data else 200)
+
+@stock_bp.route("/si/correlation")
+def si_correlation():
+    syms=[s.strip().upper().lstrip("$") for s in (request.args.get("symbols") or "").split(",") if s.strip()]
+    syms=list(dict.fromkeys(syms))
+    if len(syms)<2: return jsonify({"error":"Pass at least two symbols"}),400
+    if len(syms)>corr.MAX_SYMBOLS: return jsonify({"error":f"At most {corr.MAX_SYMBOLS} symbols"}),400
+    window=request.args.get("window","1Y").upper()
+    if window not in corr.WINDOW_DAYS: return jsonify({"error":"Invalid window"}),400
+    data=corr.get_correlation(syms,window)
+    return jsonify(data),(502 if "error" in data else 200)
+
+@stock_bp.route("/si/backtest")
+def si_backtest():
+    syms=[s.strip().upper().lstrip("$") for s in (request.args.get("symbols") or request.args.get("symbol") or "").split(",") if s.strip()]
+    syms=list(dict.fromkeys(syms))
+    if not syms: return jsonify({"error":"Missing symbols"}),400
+    if len(syms)>bt.MAX_SYMBOLS: return jsonify({"error":f"At most {bt.MAX_SYMBOLS} symbols"}),400
+    strategy=request.args.get("strategy","sma_cross").lower()
+    try:
+        params={k:request.args.get(k) for k in bt.STRATEGIES.get(strategy,{}) if request.args.get(k) is not None}
+        years=float(request.args.get("years",10))
+        cost=float(request.args.get("cost_bps",10))
+        if not 0<years<=50 or not 0<=cost<=500: raise ValueError("years must be in (0, 50], cost_bps in [0, 500]")
+        data=bt.run_backtest(syms,strategy,params,years=years,cost_bps=cost)
+    except ValueError as e:
+        return jsonify({"error":str(e)}),400
+    return jsonify(data),(502 if "error" in data else 200)
+
+@stock_bp.route("/si/sparklines")
+def si_sparklines():
+    syms=[s.strip().upper().lstrip("$") for s in (request.args.get("symbols") or "").split(",") if s.strip()]
+    syms=list(dict.fromkeys(syms))
+    if not syms: return jsonify({"error":"Missing symbols"}),400
+    if len(syms)>100: return jsonify({"error":"At most 100 symbols"}),400
+    rng=request.args.get("range","1M").upper()
+    if rng not in ss._SPARK_DAYS: return jsonify({"error":"Invalid range"}),400
+    points=request.args.get("points",30,type=int)
+    if not 2<=points<=200: return jsonify({"error":"points must be in [2, 200]"}),400
+    return jsonify(ss.get_sparklines(syms,rng,points))
+
 @stock_bp.route("/si/profile")
 def si_profile():
     sym=_sym()
@@ -7,8 +7,15 @@ Key fixes (2026-04):
   - get_quote() has 3-tier fallback: Twelve Data → yfinance .info → yfinance .history()
   - yfinance .history() is the most reliable tier — always works even when market is closed
   - ALL yf.Ticker().info calls consolidated via _get_ticker_data() (1 call, not 4)
+  - One shared Ticker per symbol; info/balance sheet/financials/recommendations
+    fetched once per 6 h as a lazily filled fundamentals bundle
   - Threading Event locks prevent duplicate concurrent fetches for the same symbol
   - Increased cache TTLs: quote 30s→120s, candles 60s→900s, news 300s→900s
+  - Candles persisted locally (candle_store.py); refreshes fetch only new bars
+  - Fresh quotes feed 1-minute bars (intraday_bars.py); the 1D chart is served
+    from them and only backfills from Yahoo across gaps
+  - get_quotes() prices many symbols with batched Twelve Data / yf.download
+    calls; get_fx_rate() caches FX spot rates for 10 min
 """
 
 import time
@@ -16,8 +23,13 @@ import threading
 import os
 import requests
 from datetime import datetime, timezone
+import numpy as np
 import yfinance as yf
 
+import candle_store as cs
+import intraday_bars as ib
+import news_service
+
 # ── Cache ──────────────────────────────────────────────────────────────────────
 _cache: dict = {}
 _cache_lock = threading.Lock()
@@ -71,6 +83,38 @@ def _symbol_currency(symbol):
 _TWELVE_DATA_KEY = os.environ.get("TWELVE_DATA_KEY", "")
 
 
+def _td_parse_quote(symbol, d):
+    """One Twelve Data /quote payload → get_quote() dict, or None if unusable."""
+    # Error responses from Twelve Data have a "code" or "status":"error" field
+    if not isinstance(d, dict) or "code" in d or d.get("status") == "error":
+        return None
+    cur  = _safe(d.get("close"))
+    prev = _safe(d.get("previous_close"))
+    if not cur or cur == 0:
+        return None   # Empty/zero response — fall through to yfinance
+    chg  = _safe((cur or 0) - (prev or 0))
+    chgp = _safe(((chg / prev) * 100) if prev else 0)
+    # currency from response; fall back to symbol-suffix inference
+    currency = d.get("currency") or _symbol_currency(symbol)
+    return {
+        "symbol":      symbol,
+        "current":     cur,
+        "change":      chg,
+        "change_pct":  chgp,
+        "high":        _safe(d.get("high")),
+        "low":         _safe(d.get("low")),
+        "open":        _safe(d.get("open")),
+        "prev_close":  prev,
+        "volume":      int(d.get("volume", 0) or 0),
+        "avg_volume":  None,
+        "currency":    currency,
+        "_source":     "twelvedata",
+        # last trade time; None once the market has closed
+        "_as_of":      (int(d.get("last_quote_at") or time.time())
+                        if d.get("is_market_open") else None),
+    }
+
+
 def _twelve_data_quote(symbol):
     """
     Fetch quote from Twelve Data API (free tier: 800 req/day, no IP blocking).
@@ -88,80 +132,161 @@ def _twelve_data_quote(symbol):
         r = requests.get(url, timeout=8)
         if r.status_code != 200:
             return None
-        d = r.json()
-        # Error responses from Twelve Data have a "code" or "status":"error" field
-        if "code" in d or ("status" in d and d.get("status") == "error"):
-            return None
-        cur  = _safe(d.get("close"))
-        prev = _safe(d.get("previous_close"))
-        if not cur or cur == 0:
-            return None   # Empty/zero response — fall through to yfinance
-        chg  = _safe((cur or 0) - (prev or 0))
-        chgp = _safe(((chg / prev) * 100) if prev else 0)
-        # currency from response; fall back to symbol-suffix inference
-        currency = d.get("currency") or _symbol_currency(symbol)
-        return {
-            "symbol":      symbol,
-            "current":     cur,
-            "change":      chg,
-            "change_pct":  chgp,
-            "high":        _safe(d.get("high")),
-            "low":         _safe(d.get("low")),
-            "open":        _safe(d.get("open")),
-            "prev_close":  prev,
-            "volume":      int(d.get("volume", 0) or 0),
-            "avg_volume":  None,
-            "currency":    currency,
-            "_source":     "twelvedata",
-        }
+        return _td_parse_quote(symbol, r.json())
     except Exception as e:
         print(f"  ⚠ Twelve Data quote failed for {symbol}: {e}")
         return None
 
 
-# ── Deduplicating yf.Ticker().info fetch ──────────────────────────────────────
-# Concurrent requests for the same symbol wait for the first fetch instead of
-# all hitting Yahoo Finance simultaneously.
-_inflight: dict = {}
-_inflight_lock = threading.Lock()
+_TD_BATCH = 50
 
 
-def _get_ticker_data(symbol):
+def _twelve_data_quotes(symbols):
     """
-    Fetch yf.Ticker info ONCE and cache for 120 s.
-    Used by get_profile(), get_metrics(), get_analyst() so they all share 1 HTTP call.
+    Batched Twelve Data quotes: one /quote?symbol=A,B,… call per _TD_BATCH
+    symbols (each symbol still costs one credit). {symbol: quote} for the
+    ones that came back usable.
     """
-    cache_key = f"ticker_data:{symbol}"
+    out = {}
+    if not _TWELVE_DATA_KEY or not symbols:
+        return out
+    for i in range(0, len(symbols), _TD_BATCH):
+        chunk = {_td_symbol(s): s for s in symbols[i:i + _TD_BATCH]}
+        try:
+            r = requests.get("https://api.twelvedata.com/quote",
+                             params={"symbol": ",".join(chunk), "apikey": _TWELVE_DATA_KEY},
+                             timeout=10)
+            if r.status_code != 200:
+                continue
+            d = r.json()
+        except Exception as e:
+            print(f"  ⚠ Twelve Data batch quote failed for {len(chunk)} symbols: {e}")
+            continue
+        # a single symbol comes back flat, several as {td_symbol: payload}
+        payloads = {next(iter(chunk)): d} if len(chunk) == 1 else d
+        for td_sym, sym in chunk.items():
+            q = _td_parse_quote(sym, payloads.get(td_sym) if isinstance(payloads, dict) else None)
+            if q:
+                out[sym] = q
+    return out
+
+
+# ── Shared yfinance Ticker registry ──────────────────────────────────────────
+# One yf.Ticker per symbol, all on one HTTP session. A Ticker memoizes .info,
+# .balance_sheet etc. for its whole lifetime, so entries are recycled after
+# _FUNDAMENTALS_TTL to let those refresh.
+_FUNDAMENTALS_TTL = 21600   # 6 h — accounting data changes quarterly
+_TICKERS_MAX      = 512
+
+_tickers: dict = {}
+_tickers_lock = threading.Lock()
+_yf_session = None
+
+
+def _shared_session():
+    """curl_cffi session when available (what yfinance itself uses), else None → yfinance default."""
+    global _yf_session
+    if _yf_session is None:
+        try:
+            from curl_cffi import requests as _cffi
+            _yf_session = _cffi.Session(impersonate="chrome")
+        except Exception:
+            _yf_session = False
+    return _yf_session or None
+
+
+def _ticker(symbol):
+    now = time.time()
+    with _tickers_lock:
+        e = _tickers.get(symbol)
+        if e and now - e[1] < _FUNDAMENTALS_TTL:
+            return e[0]
+        if len(_tickers) >= _TICKERS_MAX:
+            oldest = min(_tickers, key=lambda s: _tickers[s][1])
+            del _tickers[oldest]
+        t = yf.Ticker(symbol, session=_shared_session())
+        _tickers[symbol] = (t, now)
+        return t
+
+
+# ── Deduplicating fetch ───────────────────────────────────────────────────────
+# Concurrent requests for the same key wait for the first fetch instead of
+# all hitting Yahoo Finance simultaneously, and get its result — or its
+# exception — from the in-flight entry. A None result is cached as _EMPTY.
+_inflight: dict = {}
+_inflight_lock = threading.Lock()
+_EMPTY = object()
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event, self.value, self.error = threading.Event(), None, None
+
+
+def _fetch_once(cache_key, ttl, fn):
+    """Cached value for cache_key, or run fn() once across threads and cache it."""
     cached = _get(cache_key)
-    if cached:
-        return cached
+    if cached is not None:
+        return None if cached is _EMPTY else cached
 
     with _inflight_lock:
-        if symbol in _inflight:
-            event = _inflight[symbol]
-            is_leader = False
-        else:
-            event = threading.Event()
-            _inflight[symbol] = event
-            is_leader = True
+        flight    = _inflight.get(cache_key)
+        is_leader = flight is None
+        if is_leader:
+            flight = _inflight[cache_key] = _Flight()
 
     if not is_leader:
-        event.wait(timeout=20)
-        result = _get(cache_key)
-        return result if result else {"info": {}, "error": "timeout waiting for fetch"}
+        if not flight.event.wait(timeout=20):
+            raise TimeoutError("timeout waiting for fetch")
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
 
     try:
-        t = yf.Ticker(symbol)
-        info = t.info or {}
-        data = {"info": info, "_ticker": symbol}
-        _set(cache_key, data, 120)
-        return data
+        flight.value = fn()
+        _set(cache_key, _EMPTY if flight.value is None else flight.value, ttl)
+        return flight.value
     except Exception as e:
-        return {"info": {}, "error": str(e)}
+        flight.error = e
+        raise
     finally:
-        event.set()
+        flight.event.set()
         with _inflight_lock:
-            _inflight.pop(symbol, None)
+            _inflight.pop(cache_key, None)
+
+
+# ── Fundamentals bundle ───────────────────────────────────────────────────────
+# info, balance_sheet, financials and recommendations for a symbol, each
+# fetched at most once per _FUNDAMENTALS_TTL through the shared Ticker and
+# shared by get_profile(), get_metrics() and get_analyst(). Parts are fetched
+# lazily, so a part nobody asks for costs no round-trip.
+def _get_fundamental(symbol, part):
+    def fetch():
+        v = getattr(_ticker(symbol), part)
+        return (v or {}) if part == "info" else v
+    return _fetch_once(f"fund_{part}:{symbol}", _FUNDAMENTALS_TTL, fetch)
+
+
+def _peek_info(symbol, max_age):
+    """Cached .info if fetched within max_age seconds — never triggers a fetch."""
+    with _cache_lock:
+        e = _cache.get(f"fund_info:{symbol}")
+    if e and time.time() - e["ts"] < min(max_age, e["ttl"]) and e["data"] is not _EMPTY:
+        return e["data"]
+    return None
+
+
+def _get_ticker_data(symbol):
+    """
+    Shared .info from the fundamentals bundle — one Yahoo call per 6 h,
+    used by get_profile(), get_metrics() and get_analyst().
+    """
+    try:
+        return {"info": _get_fundamental(symbol, "info"), "_ticker": symbol}
+    except Exception as e:
+        return {"info": {}, "error": str(e)}
 
 
 # ── Logo helper ────────────────────────────────────────────────────────────────
@@ -281,6 +406,12 @@ def get_profile(symbol):
     return data
 
 
+def _observe(quote):
+    """Feed a fresh quote with a known trade time into the intraday bars."""
+    if quote.get("_as_of"):
+        ib.observe(quote["symbol"], quote["current"], quote.get("volume"), quote["_as_of"])
+
+
 def get_quote(symbol):
     """
     Three-tier fallback to guarantee a valid price is always returned:
@@ -290,12 +421,16 @@ def get_quote(symbol):
       Will be used for most requests after the cache warms up.
 
     Tier 2 — yfinance .info (shared cache, no extra HTTP call)
+      Only used when the fundamentals bundle fetched .info in the last 120 s.
       Works when market is open and .info has currentPrice/regularMarketPrice.
       May return 0 on Indian stocks when market is closed — detected and skipped.
 
     Tier 3 — yfinance .history(period='5d')
       ALWAYS reliable. Returns OHLCV even on weekends, holidays, after market close.
       This is what was used before and we keep it as the guaranteed fallback.
+
+    Tier 1/2 quotes taken while the market is open also update intraday_bars;
+    tier 3 has no trade time, so it doesn't.
     """
     k = f"quote:{symbol}"
     c = _get(k)
@@ -306,12 +441,13 @@ def get_quote(symbol):
     td_quote = _twelve_data_quote(symbol)
     if td_quote and (td_quote.get("current") or 0) > 0:
         _set(k, td_quote, 120)
+        _observe(td_quote)
         return td_quote
 
-    # ── Tier 2: yfinance .info (from shared cache — no extra HTTP call) ───────
+    # ── Tier 2: yfinance .info — only if the bundle fetched it in the last 120 s ─
+    # (the bundle lives for hours; an older .info price would be stale)
     try:
-        td   = _get_ticker_data(symbol)
-        info = td.get("info", {})
+        info = _peek_info(symbol, 120) or {}
         cur  = _safe(info.get("currentPrice") or info.get("regularMarketPrice"))
         prev = _safe(info.get("previousClose") or info.get("regularMarketPreviousClose"))
         if cur and cur > 0:
@@ -330,8 +466,11 @@ def get_quote(symbol):
                 "avg_volume": info.get("averageVolume"),
                 "currency":   info.get("currency") or _symbol_currency(symbol),
                 "_source":    "yfinance_info",
+                "_as_of":     (info.get("regularMarketTime")
+                               if info.get("marketState") == "REGULAR" else None),
             }
             _set(k, data, 120)
+            _observe(data)
             return data
     except Exception:
         pass
@@ -339,7 +478,7 @@ def get_quote(symbol):
     # ── Tier 3: yfinance .history() — guaranteed fallback ─────────────────────
     # Works market open OR closed, weekends, holidays. Always returns OHLCV.
     try:
-        hist = yf.Ticker(symbol).history(period='5d')
+        hist = _ticker(symbol).history(period='5d')
         if not hist.empty and len(hist) >= 1:
             cur  = round(float(hist['Close'].iloc[-1]), 2)
             prev = round(float(hist['Close'].iloc[-2]), 2) if len(hist) >= 2 else cur
@@ -367,6 +506,104 @@ def get_quote(symbol):
 
     return {"error": f"No price data available for {symbol}"}
 
+def _history_quotes(symbols):
+    """Tier-3 quotes for many symbols from one yf.download(period='5d')."""
+    import pandas as pd
+
+    out = {}
+    try:
+        df = yf.download(symbols, period="5d", interval="1d", group_by="ticker",
+                         auto_adjust=False, threads=True, progress=False)
+    except Exception as e:
+        print(f"  ⚠ Batch quote download failed for {len(symbols)} symbols: {e}")
+        return out
+    if df is None or df.empty:
+        return out
+    multi = isinstance(df.columns, pd.MultiIndex)
+    for sym in symbols:
+        if multi and sym not in df.columns.get_level_values(0):
+            continue
+        hist = (df[sym] if multi else df).dropna(subset=["Close"])
+        if hist.empty:
+            continue
+        cur  = round(float(hist['Close'].iloc[-1]), 2)
+        prev = round(float(hist['Close'].iloc[-2]), 2) if len(hist) >= 2 else cur
+        chg  = round(cur - prev, 2)
+        vol  = hist['Volume'].iloc[-1]
+        out[sym] = {
+            "symbol":     sym,
+            "current":    cur,
+            "change":     chg,
+            "change_pct": round((chg / prev * 100) if prev else 0, 2),
+            "high":       round(float(hist['High'].iloc[-1]), 2),
+            "low":        round(float(hist['Low'].iloc[-1]),  2),
+            "open":       round(float(hist['Open'].iloc[-1]), 2),
+            "prev_close": prev,
+            "volume":     int(vol) if vol == vol else 0,  # NaN guard
+            "avg_volume": None,
+            "currency":   _symbol_currency(sym),
+            "_source":    "yfinance_history",
+        }
+    return out
+
+
+def get_quotes(symbols):
+    """
+    {symbol: quote} for many symbols at once, same tiers as get_quote() but
+    batched: cached quotes first, then one Twelve Data call per _TD_BATCH
+    symbols, then one yf.download() for whatever is still missing. Every
+    quote fetched here lands in the per-symbol quote cache too.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    out     = {s: _get(f"quote:{s}") for s in symbols}
+    missing = [s for s, q in out.items() if not q]
+
+    fetched = _twelve_data_quotes(missing)
+    still   = [s for s in missing if s not in fetched]
+    if still:
+        fetched.update(_history_quotes(still))
+    for sym, q in fetched.items():
+        _set(f"quote:{sym}", q, 120)
+        _observe(q)
+        out[sym] = q
+    for sym in missing:
+        if sym not in fetched:
+            out[sym] = {"error": f"No price data available for {sym}"}
+    return out
+
+
+# ── FX ─────────────────────────────────────────────────────────────────────────
+_FX_TTL      = 600
+_FX_FALLBACK = {("USD", "INR"): 84.0}
+_fx_last: dict = {}
+
+
+def get_fx_rate(base="USD", quote="INR"):
+    """
+    Spot rate base→quote from Frankfurter (ECB), cached 10 min. On failure the
+    last rate seen (or a fixed fallback) is returned rather than nothing.
+    """
+    if base == quote:
+        return 1.0
+    k = f"fx:{base}{quote}"
+    c = _get(k)
+    if c:
+        return c
+    try:
+        r = requests.get(f"https://api.frankfurter.app/latest?from={base}&to={quote}", timeout=6)
+        r.raise_for_status()
+        rate = float(r.json()["rates"][quote])
+        _fx_last[(base, quote)] = rate
+        _set(k, rate, _FX_TTL)
+        return rate
+    except Exception as e:
+        print(f"  ⚠ FX {base}/{quote} failed: {e}")
+        rate = _fx_last.get((base, quote)) or _FX_FALLBACK.get((base, quote))
+        if rate:
+            _set(k, rate, 60)           # retry in a minute, not on every request
+        return rate
+
+
 def _twelve_data_statistics(symbol):
     """
     Fetch comprehensive fundamental statistics from Twelve Data API.
@@ -453,13 +690,16 @@ def _twelve_data_statistics(symbol):
 
 def get_metrics(symbol):
     """
-    Key fundamentals with three-source fallback so ANY available data is shown:
+    Key fundamentals. Price-derived figures come from the local daily candle
+    store; upstream APIs are only asked for true accounting fundamentals:
 
-      Source 1 — Twelve Data statistics (comprehensive, reliable, no IP throttle)
-        PE, P/B, beta, 52W high/low, margins, ROE/ROA, debt/equity, market cap, etc.
+      Source 1 — derived_metrics (local daily candles, no upstream call)
+        52W high/low, beta vs NIFTY 50 / S&P 500, 1M/3M/1Y/3Y returns,
+        annualized volatility, max drawdown.
 
-      Source 2 — yfinance fast_info (lightweight, always available)
-        market_cap, year_high (52W high), year_low (52W low)
+      Source 2 — Twelve Data statistics (comprehensive, reliable, no IP throttle)
+        PE, P/B, margins, ROE/ROA, debt/equity, market cap, etc.
+        Its 52W/beta values are only used if there is no local history.
 
       Source 3 — yfinance .info (from shared _get_ticker_data cache)
         Fallback for any field not covered above.
@@ -467,25 +707,18 @@ def get_metrics(symbol):
       Source 4 — Computed from balance_sheet + financials (for ROE only)
         Most reliable for ROE — already shown to work.
     """
+    from derived_metrics import get_derived_metrics
+
     k = f"metrics:{symbol}"
     c = _get(k)
     if c:
         return c
     try:
-        # Source 1: Twelve Data statistics
-        tds  = _twelve_data_statistics(symbol)
+        # Source 1: derived from local daily candles
+        dm   = get_derived_metrics(symbol)
 
-        # Source 2: yfinance fast_info (lightweight, no .info parsing needed)
-        fi_data = {}
-        try:
-            fi = yf.Ticker(symbol).fast_info
-            fi_data = {
-                "market_cap":  getattr(fi, "market_cap",  None),
-                "week52_high": getattr(fi, "year_high",   None),
-                "week52_low":  getattr(fi, "year_low",    None),
-            }
-        except Exception:
-            pass
+        # Source 2: Twelve Data statistics
+        tds  = _twelve_data_statistics(symbol)
 
         # Source 3: yfinance .info (shared cache — no extra HTTP call)
         td   = _get_ticker_data(symbol)
@@ -495,9 +728,8 @@ def get_metrics(symbol):
         roe = tds.get("roe") or _safe(info.get("returnOnEquity"))
         if roe is None:
             try:
-                t   = yf.Ticker(symbol)
-                bs  = t.balance_sheet
-                inc = t.financials
+                bs  = _get_fundamental(symbol, "balance_sheet")
+                inc = _get_fundamental(symbol, "financials")
                 if bs is not None and not bs.empty and inc is not None and not inc.empty:
                     eq_keys = [k for k in bs.index if "Stockholders" in k or "equity" in k.lower() or "Equity" in k]
                     ni_keys = [k for k in inc.index if "Net Income" in k or "NetIncome" in k]
@@ -534,21 +766,29 @@ def get_metrics(symbol):
             "roe":               roe,
             "roa":               first(tds.get("roa"),                info.get("returnOnAssets")),
             # Risk / structure
-            "beta":              first(tds.get("beta"),               info.get("beta")),
+            "beta":              first(dm.get("beta"),                tds.get("beta"),  info.get("beta")),
             "debt_equity":       first(tds.get("debt_equity"),        info.get("debtToEquity")),
             "current_ratio":     first(tds.get("current_ratio"),      info.get("currentRatio")),
             "quick_ratio":       _safe(info.get("quickRatio")),
             # Income / dividends
             "dividend_yield":    first(tds.get("dividend_yield"),     info.get("dividendYield")),
-            # 52-week range: TD stats → fast_info → .info
-            "week52_high":       first(tds.get("week52_high"),        fi_data.get("week52_high"),  info.get("fiftyTwoWeekHigh")),
-            "week52_low":        first(tds.get("week52_low"),         fi_data.get("week52_low"),   info.get("fiftyTwoWeekLow")),
-            # Market cap: TD stats → fast_info → .info
-            "market_cap":        first(tds.get("market_cap"),         fi_data.get("market_cap"),   info.get("marketCap")),
+            # 52-week range: local candles → TD stats → .info
+            "week52_high":       first(dm.get("week52_high"),         tds.get("week52_high"),  info.get("fiftyTwoWeekHigh")),
+            "week52_low":        first(dm.get("week52_low"),          tds.get("week52_low"),   info.get("fiftyTwoWeekLow")),
+            # Market cap: TD stats → .info
+            "market_cap":        first(tds.get("market_cap"),         info.get("marketCap")),
             # Cash flow
             "free_cashflow":     first(tds.get("free_cashflow"),      info.get("freeCashflow")),
             "total_cash":        first(tds.get("total_cash"),         info.get("totalCash")),
             "total_debt":        first(tds.get("total_debt"),         info.get("totalDebt")),
+            # Price-derived (local candles only)
+            "return_1m":         dm.get("return_1m"),
+            "return_3m":         dm.get("return_3m"),
+            "return_1y":         dm.get("return_1y"),
+            "return_3y":         dm.get("return_3y"),
+            "volatility":        dm.get("volatility"),
+            "max_drawdown":      dm.get("max_drawdown"),
+            "beta_benchmark":    dm.get("benchmark"),
         }
         _set(k, data, 3600)
         return data
@@ -558,7 +798,7 @@ def get_metrics(symbol):
 
 
 def get_analyst(symbol):
-    """Uses shared ticker info; recommendations fetched separately (cached 1h)."""
+    """Uses shared ticker info; recommendations come from the fundamentals bundle."""
     k = f"analyst:{symbol}"
     c = _get(k)
     if c:
@@ -569,8 +809,7 @@ def get_analyst(symbol):
 
         sb = buy = hold = sell = ssell = 0
         try:
-            t   = yf.Ticker(symbol)
-            rdf = t.recommendations
+            rdf = _get_fundamental(symbol, "recommendations")
             if rdf is not None and not rdf.empty:
                 for _, row in rdf.tail(10).iterrows():
                     g = str(row.get("To Grade", row.get("Action", ""))).lower()
@@ -611,14 +850,29 @@ def get_analyst(symbol):
         return {"error": str(e)}
 
 
+_LOCAL_NEWS_MIN = 5
+
+
 def get_news(symbol):
-    """Fetch news. TTL 900 s (15 min) — was 300 s (5 min). 3x fewer Yahoo calls."""
+    """
+    Fetch news. TTL 900 s (15 min) — was 300 s (5 min). 3x fewer Yahoo calls.
+    Headlines the RSS aggregator tagged with this symbol are read first; Yahoo
+    is only asked when there are fewer than _LOCAL_NEWS_MIN of them, and its
+    articles fill in after the local ones.
+    """
     k = f"news:{symbol}"
     c = _get(k)
     if c:
         return c
+    local = [{"headline": a["title"], "source": a["source"], "url": a["link"],
+              "datetime": int(a["ts"]), "summary": ""}
+             for a in news_service.for_symbol(symbol, 12)]
+    if len(local) >= _LOCAL_NEWS_MIN:
+        data = {"symbol": symbol, "articles": local, "count": len(local)}
+        _set(k, data, 900)
+        return data
     try:
-        raw = yf.Ticker(symbol).news or []
+        raw = _ticker(symbol).news or []
         articles = []
         for a in raw[:12]:
             try:
@@ -654,86 +908,381 @@ def get_news(symbol):
             except Exception:
                 continue
 
+        news_service.ingest([{"title": x["headline"], "source": x["source"], "link": x["url"],
+                              "ts": x["datetime"]} for x in articles if x["datetime"]],
+                            origin="yahoo", symbol=symbol)
+        seen     = {x["headline"].lower() for x in local}
+        articles = (local + [x for x in articles if x["headline"].lower() not in seen])[:12]
         data = {"symbol": symbol, "articles": articles, "count": len(articles)}
         _set(k, data, 900)   # 15 min — was 5 min
         return data
     except Exception as e:
+        if local:
+            return {"symbol": symbol, "articles": local, "count": len(local)}
         return {"error": str(e), "articles": []}
 
 
 # ── Candle helpers ─────────────────────────────────────────────────────────────
-_TF_INTERVAL = {
-    "1D":  "5m",
-    "1W":  "15m",
-    "1M":  "1h",
-    "3M":  "1d",
-    "6M":  "1d",
-    "1Y":  "1d",
-    "5Y":  "1wk",
-    "MAX": "1mo",
+# Only two series are fetched per symbol and kept in candle_store:
+#   5m  — intraday base for 1D / 1W / 1M
+#   1d  — daily base (full history) for 3M … MAX
+# Every timeframe is a slice of its base, resampled to the bar size the chart
+# uses, so switching chart tabs never costs an extra upstream call.
+_TF_VIEW = {
+    # tf:   (base, bars)
+    "1D":  ("5m", None),
+    "1W":  ("5m", 900),      # 15-minute bars
+    "1M":  ("5m", 3600),     # hourly bars
+    "3M":  ("1d", None),
+    "6M":  ("1d", None),
+    "1Y":  ("1d", None),
+    "5Y":  ("1d", "week"),
+    "MAX": ("1d", "month"),
 }
 
-def _tf_dates(tf):
+_TF_DAYS = {
+    "1D":  2,
+    "1W":  7,
+    "1M":  31,
+    "3M":  92,
+    "6M":  183,
+    "1Y":  366,
+    "5Y":  365*5+2,
+    "MAX": None,
+}
+
+# Initial fetch span per base (None = full history). Yahoo keeps 60 days of 5m bars.
+_BASE_DAYS = {"5m": 31, "1d": None}
+
+# Store re-sync interval per base: intraday 300 s, daily 900 s
+_BASE_TTL = {"5m": 300, "1d": 900}
+
+# 1D view cache — short, since quote polling keeps extending it
+_LIVE_TTL = 60
+
+
+def _tf_start(tf):
+    """Unix start of a timeframe window (midnight, N days ago), or None for MAX."""
     from datetime import date, timedelta
-    today = date.today()
-    end   = today + timedelta(days=1)
-    delta = {
-        "1D":  timedelta(days=2),
-        "1W":  timedelta(days=7),
-        "1M":  timedelta(days=31),
-        "3M":  timedelta(days=92),
-        "6M":  timedelta(days=183),
-        "1Y":  timedelta(days=366),
-        "5Y":  timedelta(days=365*5+2),
-        "MAX": None,
-    }.get(tf)
-    if delta is None:
-        return None, None
-    return str(today - delta), str(end)
-
-
-def get_candles(symbol, tf="3M"):
-    """
-    TTL: intraday (1D/1W) = 300 s, longer timeframes = 900 s.
-    Was 60 s for all — massive reduction in Yahoo calls.
+    days = _TF_DAYS.get(tf)
+    if days is None:
+        return None
+    start = date.today() - timedelta(days=days)
+    return int(datetime(start.year, start.month, start.day).timestamp())
+
+
+def _view_keys(arr, bars):
+    t = arr["time"]
+    if bars == "week":
+        return cs.week_keys(t)
+    if bars == "month":
+        return cs.month_keys(t)
+    return cs.intraday_keys(t, bars)
+
+
+def view_buckets(arr, tf):
+    """
+    How a timeframe's bars come out of its full base series `arr`:
+    (first, last) index arrays into `arr`, the first and last base bar of
+    each view bar. A view bar's time is arr["time"][first].
+    """
+    _, bars = _TF_VIEW.get(tf, ("1d", None))
+    start = _tf_start(tf)
+    lo = 0 if start is None else int(np.searchsorted(arr["time"], start, side="left"))
+    n  = len(arr) - lo
+    if bars is None or n < 2:
+        first = np.arange(lo, len(arr))
+        return first, first
+    keys  = _view_keys(arr[lo:], bars)
+    first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return lo + first, lo + np.r_[first[1:], n] - 1
+
+
+def _full_history(ticker, interval, days):
+    if days is None:
+        return ticker.history(period="max", interval=interval)
+    from datetime import timedelta
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    return ticker.history(start=start, interval=interval)
+
+
+def _sync_candles(symbol, interval):
+    """
+    Bring the local store for (symbol, interval) up to date and return it.
+    Empty store → fetch the full window once. Otherwise fetch only from the
+    second-to-last stored bar onward (the last may still be forming); if that
+    overlap no longer matches the store, the adjusted history was re-based
+    by a split or dividend and the full window is fetched again. So is it
+    when the store ends before the base's window (Yahoo serves 5m bars
+    for ~60 days only, so a delta from further back comes back empty).
+    """
+    ttl = _BASE_TTL.get(interval, 900)
+    if cs.age(symbol, interval) < ttl:
+        return cs.load(symbol, interval)
+
+    with cs.lock(symbol, interval):
+        # another thread may have synced while we waited
+        if cs.age(symbol, interval) < ttl:
+            return cs.load(symbol, interval)
+
+        stored = cs.load(symbol, interval)
+        days   = _BASE_DAYS.get(interval)
+        ticker = _ticker(symbol)
+        refetch = None
+        if len(stored):
+            since = int(stored["time"][max(len(stored) - 2, 0)])
+            if days is not None and since < time.time() - days * 86400:
+                refetch = f"store ends before the {days}-day window"
+            else:
+                new = cs.from_history(ticker.history(start=datetime.fromtimestamp(since, tz=timezone.utc),
+                                                     interval=interval))
+                if cs.rebased(stored, new):
+                    refetch = "adjusted history changed"
+        if not len(stored) or refetch:
+            if refetch:
+                print(f"  ↻ {symbol} {interval}: {refetch}, re-fetching")
+            new = cs.from_history(_full_history(ticker, interval, days))
+
+        if not len(new):
+            cs.touch(symbol, interval)
+            return stored
+
+        # Keep intraday files bounded to twice their widest window
+        keep_after = None
+        if days is not None:
+            keep_after = int(time.time()) - days * 2 * 86400
+        if refetch:
+            cs.save(symbol, interval, new[np.searchsorted(new["time"], keep_after or 0, side="left"):])
+            return cs.load(symbol, interval)
+        return cs.merge(symbol, interval, new, keep_after=keep_after)
+
+
+def _intraday_view(symbol):
+    """
+    5m base for the 1D chart: stored 5m bars up to where the intraday_bars
+    run begins, then the live 1-minute bars folded into 5-minute buckets.
+    Yahoo is only asked (via _sync_candles) when there's no live run or the
+    store doesn't reach its start.
+    """
+    live = ib.live_bars(symbol)
+    if not len(live):
+        return _sync_candles(symbol, "5m")
+    cut    = int(live["time"][0]) // 300 * 300
+    stored = cs.load(symbol, "5m")
+    if not len(stored) or stored["time"][-1] + 300 < cut:
+        stored = _sync_candles(symbol, "5m")
+    if len(stored) and stored["time"][-1] >= live["time"][-1]:
+        return stored             # the store is newer (e.g. quotes stopped)
+    arr  = np.concatenate([stored[stored["time"] < cut], live])
+    keys = arr["time"] // 300 * 300
+    out  = cs.resample(arr, keys)
+    out["time"] = np.unique(keys)           # label by bucket start, not its first live minute
+    return out
+
+
+def prefetch_daily(symbols):
+    """
+    Bring the daily store of many symbols up to date with a few batched
+    yf.download() calls (full history for symbols never seen, a delta from
+    the oldest second-to-last bar for stale ones, full history again for any
+    whose adjusted history was re-based) instead of one .history() per symbol.
+
+    Each symbol's cs.lock(sym, "1d") is held from the age check to the save,
+    as in _sync_candles; symbols another caller is already syncing are left
+    to it rather than downloaded twice.
+    """
+    held = []
+    try:
+        stale = []
+        for s in dict.fromkeys(symbols):
+            if cs.age(s, "1d") < _BASE_TTL["1d"]:
+                continue
+            lk = cs.lock(s, "1d")
+            if not lk.acquire(blocking=False):
+                continue                                 # in flight elsewhere
+            held.append(lk)
+            if cs.age(s, "1d") < _BASE_TTL["1d"]:        # synced while we looked
+                continue
+            stale.append(s)
+        if stale:
+            _prefetch_locked(stale)
+    finally:
+        for lk in held:
+            lk.release()
+
+
+def _download_daily(syms, **when):
+    """{symbol: candle array} from one yf.download(); None if it failed."""
+    import pandas as pd
+
+    try:
+        df = yf.download(syms, interval="1d", group_by="ticker", auto_adjust=True,
+                         threads=True, progress=False, **when)
+    except Exception as e:
+        print(f"  ⚠ Batch daily download failed for {len(syms)} symbols: {e}")
+        return None
+    multi = isinstance(df.columns, pd.MultiIndex)
+    return {sym: cs.from_history(df[sym] if multi else df) for sym in syms
+            if not multi or sym in df.columns.get_level_values(0)}
+
+
+def _prefetch_locked(stale):
+    stored = {s: cs.load(s, "1d") for s in stale}
+    fresh  = [s for s in stale if not len(stored[s])]
+    update = [s for s in stale if len(stored[s])]
+
+    got = {}
+    if update:
+        since = min(int(stored[s]["time"][max(len(stored[s]) - 2, 0)]) for s in update)
+        delta = _download_daily(update, start=datetime.fromtimestamp(since, tz=timezone.utc)) or {}
+        for s, new in delta.items():
+            if cs.rebased(stored[s], new):
+                print(f"  ↻ {s} 1d: adjusted history changed, re-fetching")
+                fresh.append(s)
+            else:
+                got[s] = new
+    full = _download_daily(fresh, period="max") if fresh else None
+
+    for sym, new in got.items():
+        if len(new):
+            cs.merge(sym, "1d", new)
+        else:
+            cs.touch(sym, "1d")
+    for sym, new in (full or {}).items():
+        if len(new):
+            cs.save(sym, "1d", new)
+        else:
+            cs.touch(sym, "1d")
+
+
+def get_daily_series(symbol):
+    """Full daily history from the local store (synced if stale)."""
+    return _sync_candles(symbol, "1d")
+
+
+def get_base_array(symbol, tf):
+    """The whole base series a timeframe is cut from (5m for 1D–1M, daily above)."""
+    base, _ = _TF_VIEW.get(tf, ("1d", None))
+    return _intraday_view(symbol) if tf == "1D" else _sync_candles(symbol, base)
+
+
+def get_candle_array(symbol, tf):
+    """
+    Sliced/resampled bars for a timeframe as a candle_store array, cached for
+    the base's TTL. Shared by get_candles() and the analytics modules.
     """
     k = f"candle:{symbol}:{tf}"
     c = _get(k)
-    if c:
+    if c is not None:
         return c
+    base, bars = _TF_VIEW.get(tf, ("1d", None))
+    arr   = get_base_array(symbol, tf)
+    start = _tf_start(tf)
+    if start is not None:
+        arr = arr[np.searchsorted(arr["time"], start, side="left"):]
+    if bars is not None and len(arr):
+        arr = cs.resample(arr, _view_keys(arr, bars))
+    if len(arr):
+        _set(k, arr, _LIVE_TTL if tf == "1D" else _BASE_TTL.get(base, 900))
+    return arr
+
+
+def get_candles(symbol, tf="3M", fmt="rows", delta=False, max_points=None):
+    """
+    Sliced and resampled from the symbol's base series in the local candle
+    store; the in-memory cache in front of it uses the base's re-sync TTL
+    (intraday 300 s, longer timeframes 900 s). 1D is stitched from the store
+    and the quote-built intraday bars and cached for 60 s.
+
+    fmt="rows"     → candles: [{time, open, high, low, close, volume}, …]
+    fmt="columnar" → parallel time/open/high/low/close/volume arrays;
+                     delta=True delta-encodes time (see candle_store.to_columnar)
+    max_points         → bucket-aggregate down to at most this many bars, so
+                         5Y/MAX payloads stay chart-width sized
+    """
     try:
-        interval = _TF_INTERVAL.get(tf, "1d")
-        start, end = _tf_dates(tf)
-        ticker = yf.Ticker(symbol)
-        hist   = ticker.history(period="max", interval=interval) if start is None \
-                 else ticker.history(start=start, end=end, interval=interval)
-
-        if hist.empty:
+        arr = get_candle_array(symbol, tf)
+        if not len(arr):
             return {"error": "No chart data"}
+        arr = cs.downsample(arr, max_points)
 
-        candles = []
-        for ts, row in hist.iterrows():
-            try:
-                unix = int(ts.timestamp()) if hasattr(ts, "timestamp") else int(ts.value // 1_000_000_000)
-                candles.append({
-                    "time":   unix,
-                    "open":   round(float(row["Open"]),   2),
-                    "high":   round(float(row["High"]),   2),
-                    "low":    round(float(row["Low"]),    2),
-                    "close":  round(float(row["Close"]),  2),
-                    "volume": int(row["Volume"]) if row["Volume"] == row["Volume"] else 0,
-                })
-            except Exception:
-                pass
-
-        data = {"symbol": symbol, "timeframe": tf, "candles": candles, "count": len(candles)}
-        candle_ttl = 300 if tf in ("1D", "1W") else 900
-        _set(k, data, candle_ttl)
+        data = {"symbol": symbol, "timeframe": tf}
+        if fmt == "columnar":
+            cols = cs.to_columnar(arr, delta=delta)
+            data.update(format="columnar", count=len(cols["time"]), **cols)
+        else:
+            candles = cs.to_records(arr)
+            data.update(candles=candles, count=len(candles))
         return data
     except Exception as e:
         return {"error": str(e)}
 
 
+# ── Sparklines ────────────────────────────────────────────────────────────────
+_SPARK_DAYS   = {"1W": 7, "1M": 31, "3M": 92, "6M": 183, "1Y": 366, "5Y": 365*5+2}
+_SPARK_LEVELS = 100
+
+
+def _sparkline(arr, days, points):
+    t = cs.trading_days(arr["time"])
+    close = np.asarray(arr["close"][np.searchsorted(t, t[-1] - days, side="left"):], dtype=np.float64)
+    close = close[np.isfinite(close)]
+    if len(close) < 2:
+        return None
+    first = close[0]
+    if len(close) > points:
+        # last close of each bucket, so the final point is the latest close
+        keys  = cs.bucket_keys(len(close), points)
+        close = close[np.r_[np.flatnonzero(keys[1:] != keys[:-1]), len(close) - 1]]
+    lo, hi = float(close.min()), float(close.max())
+    span   = hi - lo
+    q = np.zeros(len(close), dtype=np.int64) if span <= 0 else \
+        np.rint((close - lo) / span * (_SPARK_LEVELS - 1)).astype(np.int64)
+    return {
+        "lo":         round(lo, 2),
+        "hi":         round(hi, 2),
+        "last":       round(float(close[-1]), 2),
+        "change_pct": round((close[-1] / first - 1) * 100, 2) if first else None,
+        "v":          q.tolist(),
+    }
+
+
+def get_sparklines(symbols, rng="1M", points=30):
+    """
+    Downsampled daily closes for many symbols in one payload. Stale or unseen
+    symbols are filled by one batched prefetch_daily(); each series is then
+    quantized to integers 0…_SPARK_LEVELS-1 between its lo and hi, which is
+    all a sparkline needs:  price ≈ lo + v / (levels - 1) * (hi - lo).
+    """
+    symbols = list(dict.fromkeys(symbols))
+    out, todo = {}, []
+    for sym in symbols:
+        c = _get(f"spark:{sym}:{rng}:{points}")
+        if c is not None:
+            out[sym] = c
+        else:
+            todo.append(sym)
+    if todo:
+        prefetch_daily(todo)
+        for sym in todo:
+            try:
+                arr = get_daily_series(sym)
+                line = _sparkline(arr, _SPARK_DAYS[rng], points) if len(arr) else None
+            except Exception as e:
+                print(f"  ⚠ Sparkline failed for {sym}: {e}")
+                line = None
+            if line:
+                _set(f"spark:{sym}:{rng}:{points}", line, _BASE_TTL["1d"])
+                out[sym] = line
+    return {
+        "range":   rng,
+        "points":  points,
+        "levels":  _SPARK_LEVELS,
+        "series":  out,
+        "missing": [s for s in symbols if s not in out],
+    }
+
+
 # ── Dashboard composite ────────────────────────────────────────────────────────
 def get_full_dashboard(symbol):
     """
@@ -758,9 +1307,11 @@ def clear_cache(symbol=None):
             keys = [k for k in _cache if f":{symbol}" in k]
             for k in keys:
                 del _cache[k]
+            ib.clear(symbol)
             return {"cleared": keys}
         n = len(_cache)
         _cache = {}
+        ib.clear()
         return {"cleared_all": n}
 
 
@@ -771,4 +1322,4 @@ def cache_stats():
             {"key": k, "age_sec": round(now - v["ts"]), "ttl": v["ttl"]}
             for k, v in _cache.items()
         ]
-    return {"entries": len(entries), "keys": entries}
\ No newline at end of file
+    return {"entries": len(entries), "keys": entries, "intraday_bars": ib.stats()}
\ No newline at end of file
@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import candle_store as cs
+
+
+@pytest.fixture(autouse=True)
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cs, "_DIR", str(tmp_path))
+
+
+def _history(start, periods, tz, freq="5min"):
+    idx = pd.date_range(start, periods=periods, freq=freq, tz=tz)
+    c = np.linspace(100, 110, periods)
+    return pd.DataFrame({"Open": c, "High": c + 1, "Low": c - 1, "Close": c,
+                         "Volume": np.full(periods, 1000.0)}, index=idx)
+
+
+@pytest.mark.parametrize("tz, session", [
+    ("Asia/Kolkata",     "2024-03-04 09:15"),
+    ("America/New_York", "2024-03-04 09:30"),
+])
+def test_from_history_stores_unix_time(tz, session):
+    hist = _history(session, 75, tz)
+    arr = cs.from_history(hist)
+    assert arr["time"].tolist() == [int(ts.timestamp()) for ts in hist.index]
+
+
+@pytest.mark.parametrize("tz, session", [
+    ("Asia/Kolkata",     "2024-03-04 09:15"),
+    ("America/New_York", "2024-03-04 09:30"),
+])
+def test_delta_start_is_last_stored_bar(tz, session):
+    hist = _history(session, 75, tz)
+    merged = cs.merge("SYM", "5m", cs.from_history(hist.iloc[:40]))
+    # what _sync_candles asks yfinance for next
+    start = datetime.fromtimestamp(int(merged["time"][-1]), tz=timezone.utc)
+    assert start == hist.index[39].to_pydatetime()
+
+    delta = hist[hist.index >= start]
+    merged = cs.merge("SYM", "5m", cs.from_history(delta))
+    assert len(merged) == 75
+    assert np.all(np.diff(merged["time"]) == 300)
+    assert cs.load("SYM", "5m")["time"].tolist() == merged["time"].tolist()
+
+
+def test_v1_files_are_ignored_and_removed(tmp_path):
+    legacy = tmp_path / "SYM__1d.npy"
+    np.save(legacy, cs.from_history(_history("2024-01-01", 5, "UTC", "D")))
+    assert not len(cs.load("SYM", "1d"))
+    cs.save("SYM", "1d", cs.from_history(_history("2024-01-01", 5, "UTC", "D")))
+    assert not legacy.exists()
+    assert len(cs.load("SYM", "1d")) == 5
+
+
+def test_rebased_ignores_forming_bar_and_spots_adjustment():
+    old = cs.from_history(_history("2024-01-01", 10, "UTC", "D"))
+    new = np.array(old[-2:])
+    new["close"][-1] *= 1.03                      # last bar was still forming
+    assert not cs.rebased(old, new)
+    new["close"][0] *= 0.5                        # 2:1 split re-based the history
+    assert cs.rebased(old, new)
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+import compute_pool as cp
+
+
+def crash_once(marker):
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)                    # like an OOM kill
+    return "ok"
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def loaded_modules():
+    import kernels
+    kernels.indicator("sma5", np.arange(20.0))
+    return sorted(m for m in ("stock_service", "yfinance", "curl_cffi") if m in sys.modules)
+
+
+@pytest.fixture
+def pool():
+    cp.start(workers=1)
+    yield
+    cp.shutdown()
+
+
+def test_worker_death_restarts_pool(pool, tmp_path):
+    assert cp.run(crash_once, str(tmp_path / "crashed")) == "ok"
+    assert cp.run(sleep, 0) == 0
+
+
+def test_stuck_workers_are_recycled(pool):
+    before = cp._executor
+    with pytest.raises(cp.TaskTimeout):
+        cp.run(sleep, 30, timeout=0.5)
+    assert cp._executor is not before
+    t0 = time.time()
+    assert cp.run(sleep, 0) == 0
+    assert time.time() - t0 < 10
+
+
+def test_workers_import_only_light_modules(pool):
+    assert cp.run(loaded_modules) == []
+
+
+def test_cgroup_quota_caps_cores(monkeypatch):
+    monkeypatch.setattr(cp, "_cgroup_cpus", lambda: 0.5)
+    assert cp._cores() == 1
+    monkeypatch.setattr(cp, "_cgroup_cpus", lambda: None)
+    assert cp._cores() >= 1
@@ -0,0 +1,42 @@
+import threading
+import time
+
+import stock_service as ss
+
+
+def _concurrently(n, fn):
+    out, errs = [], []
+
+    def run():
+        try:
+            out.append(fn())
+        except Exception as e:
+            errs.append(e)
+    threads = [threading.Thread(target=run) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out, errs
+
+
+def test_none_result_is_shared_and_cached():
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return None
+    out, errs = _concurrently(5, lambda: ss._fetch_once("test:none", 60, fetch))
+    assert errs == [] and out == [None] * 5
+    assert ss._fetch_once("test:none", 60, fetch) is None
+    assert len(calls) == 1
+
+
+def test_followers_get_the_leaders_error():
+    def fetch():
+        time.sleep(0.05)
+        raise ValueError("upstream down")
+    out, errs = _concurrently(4, lambda: ss._fetch_once("test:err", 60, fetch))
+    assert out == [] and len(errs) == 4
+    assert all(isinstance(e, ValueError) for e in errs)
@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+import pytest
+
+import candle_store as cs
+import indicators as ind
+import stock_service as ss
+
+
+@pytest.fixture
+def daily(monkeypatch):
+    n = 3000
+    arr = np.empty(n, dtype=cs.CANDLE_DTYPE)
+    today = int(time.time()) // 86400 * 86400
+    arr["time"] = today - 86400 * np.arange(n)[::-1] - 19800      # NSE local midnight
+    rng = np.random.default_rng(7)
+    arr["close"] = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    arr["open"] = arr["high"] = arr["low"] = arr["close"]
+    arr["volume"] = 1000
+    monkeypatch.setattr(ss, "_sync_candles", lambda symbol, interval: arr)
+    ind._memo.clear()
+    return arr
+
+
+def test_last_value_is_the_same_on_every_daily_timeframe(daily):
+    last = {}
+    for tf in ("3M", "1Y", "5Y", "MAX"):
+        res = ind.get_indicators("ABC.NS", tf, ["sma200", "rsi14", "macd"])
+        last[tf] = res["indicators"]
+        if tf != "MAX":                        # warm-up done before the window starts
+            assert res["indicators"]["sma200"]["value"][0] is not None
+    for tf in ("1Y", "5Y", "MAX"):
+        assert last[tf]["sma200"]["value"][-1] == last["3M"]["sma200"]["value"][-1]
+        assert last[tf]["rsi14"]["value"][-1] == last["3M"]["rsi14"]["value"][-1]
+        assert last[tf]["macd"]["macd"][-1] == last["3M"]["macd"]["macd"][-1]
+    expected = round(float(daily["close"][-200:].mean()), 4)
+    assert last["MAX"]["sma200"]["value"][-1] == expected
+
+
+def test_times_match_candle_view(daily):
+    for tf in ("3M", "5Y", "MAX"):
+        for mp in (None, 50):
+            res = ind.get_indicators("ABC.NS", tf, ["sma20"], max_points=mp)
+            view = ss.get_candle_array("ABC.NS", tf)
+            view = cs.downsample(view, mp) if mp else view
+            assert res["time"] == view["time"].tolist()
+            ss.clear_cache("ABC.NS")
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import candle_store as cs
+import intraday_bars as ib
+import stock_service as ss
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(cs, "_DIR", str(tmp_path))
+    monkeypatch.setattr(ss, "_sync_candles", lambda symbol, interval: cs.load(symbol, interval))
+    ib.clear()
+    yield
+    ib.clear()
+
+
+@pytest.mark.parametrize("symbol, tz, session", [
+    ("TCS.NS", "Asia/Kolkata",     "2024-03-04 09:15"),
+    ("AAPL",   "America/New_York", "2024-03-04 09:30"),
+])
+def test_stored_run_stitches_onto_live_run(symbol, tz, session):
+    # Yahoo delivered the first hour of 5m bars, stamped in exchange time
+    idx = pd.date_range(session, periods=12, freq="5min", tz=tz)
+    c = np.linspace(100, 101, 12)
+    cs.save(symbol, "5m", cs.from_history(pd.DataFrame(
+        {"Open": c, "High": c, "Low": c, "Close": c, "Volume": np.full(12, 10.0)}, index=idx)))
+
+    # quotes polled from the 11th bar on, for 40 minutes
+    live_start = int(idx[10].timestamp()) + 60
+    for i in range(40):
+        ib.observe(symbol, 200.0 + i, ts=live_start + i * 60)
+
+    view = ss._intraday_view(symbol)
+    t = view["time"]
+    assert t[0] == int(idx[0].timestamp())
+    assert np.all(np.diff(t) == 300)                       # no overlap, no hole
+    assert t[-1] == (live_start + 39 * 60) // 300 * 300
+    assert view["close"][-1] == 239.0                      # the live bars were used
+    assert view["close"][9] == c[9]                        # stored bars before the cut kept
+    assert view["open"][10] == 200.0                       # bucket of the cut rebuilt from live
+
+
+def test_store_newer_than_live_wins():
+    idx = pd.date_range("2024-03-04 09:15", periods=12, freq="5min", tz="Asia/Kolkata")
+    c = np.full(12, 100.0)
+    cs.save("INFY.NS", "5m", cs.from_history(pd.DataFrame(
+        {"Open": c, "High": c, "Low": c, "Close": c, "Volume": c}, index=idx)))
+    for i in range(3):
+        ib.observe("INFY.NS", 50.0, ts=int(idx[2].timestamp()) + i * 60)
+    view = ss._intraday_view("INFY.NS")
+    assert len(view) == 12 and np.all(view["close"] == 100.0)
+
+
+def test_volume_from_two_feeds_and_a_new_day():
+    t = int(pd.Timestamp("2024-03-04 04:00", tz="UTC").timestamp())
+    # NIFTY 50 batch and get_quote() alternate, their day totals a little apart
+    for i, cum in enumerate([1000, 980, 1010, 990, 1030]):
+        ib.observe("TCS.NS", 100.0, cum_volume=cum, ts=t + i * 60)
+    assert ib.bars("TCS.NS")["volume"].tolist() == [0, 0, 10, 0, 20]
+
+    ib.observe("TCS.NS", 101.0, cum_volume=50, ts=t + 86400)           # next session
+    assert ib.bars("TCS.NS")["volume"][-1] == 50
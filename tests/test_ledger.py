@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+import ledger
+import portfolio_repo
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    rows, reads = [{"id": 1, "symbol": "INFY.NS", "side": "buy", "qty": 10, "price": 100.0, "date": "2024-01-02"}], []
+
+    def trades(username):
+        reads.append(username)
+        time.sleep(0.05)
+        return list(rows)
+
+    monkeypatch.setattr(portfolio_repo, "trades", trades)
+    monkeypatch.setattr(portfolio_repo, "add_trades", lambda username, new: rows.extend(new))
+    ledger.clear()
+    yield rows, reads
+    ledger.clear()
+
+
+def test_failed_write_leaves_book_untouched(stored, monkeypatch):
+    b = ledger.book("alice")
+    pos = b.positions["INFY.NS"]
+
+    def fail(username, rows):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(portfolio_repo, "add_trades", fail)
+    with pytest.raises(RuntimeError):
+        ledger.record("alice", [{"symbol": "INFY.NS", "side": "sell", "qty": 4, "price": 120.0, "date": "2024-02-01"},
+                                {"symbol": "TCS.NS", "side": "buy", "qty": 1, "price": 3000.0, "date": "2024-02-01"}])
+    assert ledger.book("alice") is b
+    assert b.positions["INFY.NS"] is pos and pos.qty == 10 and len(pos.trades) == 1
+    assert "TCS.NS" not in b.positions and b.count == 1
+
+
+def test_record_swaps_in_after_write(stored):
+    b = ledger.book("alice")
+    out = ledger.record("alice", [{"symbol": "INFY.NS", "side": "sell", "qty": 4, "price": 120.0, "date": "2024-02-01"}])
+    assert out["positions"][0]["qty"] == 6
+    assert b.positions["INFY.NS"].qty == 6 and b.positions["INFY.NS"].realized == 80.0 and b.count == 2
+
+
+def test_book_built_once_for_concurrent_callers(stored):
+    _, reads = stored
+    books = []
+    threads = [threading.Thread(target=lambda: books.append(ledger.book("Alice"))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert len(reads) == 1 and all(b is books[0] for b in books)
+
+
+def test_rollback_restores_lots_after_closing_sells(stored, monkeypatch):
+    rows, _ = stored
+    rows.append({"id": 2, "symbol": "INFY.NS", "side": "buy", "qty": 5, "price": 110.0, "date": "2024-01-05"})
+    b = ledger.book("alice")
+    pos = b.positions["INFY.NS"]
+    before = ([lot[:] for lot in pos.lots], pos.qty, pos.cost, pos.realized, list(pos.trades))
+
+    def fail(username, rows):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(portfolio_repo, "add_trades", fail)
+    with pytest.raises(RuntimeError):
+        ledger.record("alice", [{"symbol": "INFY.NS", "side": "buy", "qty": 2, "price": 90.0, "date": "2024-02-01"},
+                                {"symbol": "INFY.NS", "side": "sell", "qty": 12, "price": 120.0, "date": "2024-02-02"},
+                                {"symbol": "INFY.NS", "side": "sell", "qty": 5, "price": 130.0, "date": "2024-02-03"}])
+    assert ([lot[:] for lot in pos.lots], pos.qty, pos.cost, pos.realized, pos.trades) == before
+
+    with pytest.raises(ValueError):                 # oversell: rejected before the write
+        ledger.record("alice", [{"symbol": "INFY.NS", "side": "sell", "qty": 7, "price": 120.0, "date": "2024-02-01"},
+                                {"symbol": "INFY.NS", "side": "sell", "qty": 9, "price": 120.0, "date": "2024-02-02"}])
+    assert ([lot[:] for lot in pos.lots], pos.qty, pos.cost, pos.realized, pos.trades) == before
+
+
+def test_holdings_while_a_new_symbol_is_recorded(stored, monkeypatch):
+    ledger.book("alice")
+    monkeypatch.setattr(ledger.ss, "get_quotes", lambda syms: {s: {"current": 120.0, "currency": "USD"} for s in syms})
+
+    def fx(a, b):                                   # a new symbol lands while the rate is fetched
+        ledger.record("alice", [{"symbol": "AAPL", "side": "buy", "qty": 1, "price": 150.0, "date": "2024-03-01"}])
+        return 83.0
+
+    monkeypatch.setattr(ledger.ss, "get_fx_rate", fx)
+    monkeypatch.setattr(ledger.ss, "_symbol_currency", lambda s: "USD")
+    out = ledger.holdings("alice")
+    assert [h["symbol"] for h in out["holdings"]] == ["INFY.NS"]
+    assert out["totals"]["trades"] == 1
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+import mf_analytics as mfa
+import nav_store
+
+
+def _series(start, n, step=1.0):
+    arr = np.zeros(n, dtype=nav_store.NAV_DTYPE)
+    arr["day"] = nav_store.today() - np.arange(n)[::-1] * 2     # a NAV every other day
+    arr["nav"] = start + step * np.arange(n)
+    return arr
+
+
+def test_compare_returns_match_point_return(monkeypatch):
+    funds = {1: ({"scheme_name": "A"}, _series(10.0, 700)),
+             2: ({"scheme_name": "B"}, _series(50.0, 700, 0.3))}
+    monkeypatch.setattr(nav_store, "series_many", lambda codes: {c: funds[c] for c in codes})
+    out = mfa.compare([1, 2])
+    for f in out["funds"]:
+        arr = funds[f["schemeCode"]][1]
+        for k, span in (("return_1y", 365), ("return_3y", 1095)):
+            assert round(f[k] * 100, 2) == nav_store.point_return(arr, span)
+        assert f["return_5y"] is None                 # 1398 days of history
+
+
+def test_import_stays_light():
+    code = "import sys, mf_analytics; print(sorted({'backtest', 'stock_service', 'yfinance'} & set(sys.modules)))"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out  = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import mf_service as mf
+
+_LIST = [{"schemeCode": 1, "schemeName": "Alpha Large Cap Fund - Direct Plan - Growth"},
+         {"schemeCode": 2, "schemeName": "Beta Liquid Fund - Direct Plan - Growth"}]
+
+
+class Resp:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return _LIST
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(mf, "_PATH", str(tmp_path / "mf_list.json"))
+    monkeypatch.setattr(mf, "_list_cache", {"ts": 0, "data": None, "schemes": {}, "failed": 0, "error": None})
+    monkeypatch.setattr(mf.mf_index, "build", lambda funds: None)
+
+
+def test_one_download_for_concurrent_callers(store, monkeypatch):
+    calls, gate = [], threading.Event()
+
+    def get(url, timeout):
+        calls.append(url)
+        gate.wait(5)
+        return Resp()
+
+    monkeypatch.setattr(mf.requests, "get", get)
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(mf.load_list())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    gate.set()
+    for t in threads:
+        t.join(5)
+    assert len(calls) == 1
+    assert [o["total"] for o in out] == [2] * 4
+
+
+def test_failure_is_not_retried_and_stale_list_is_served(store, monkeypatch):
+    monkeypatch.setattr(mf.requests, "get", lambda url, timeout: Resp())
+    assert mf.load_list()["total"] == 2
+    mf._list_cache["ts"] = 0                        # expired
+
+    calls = []
+
+    def down(url, timeout):
+        calls.append(url)
+        raise requests.ConnectionError("down")
+
+    monkeypatch.setattr(mf.requests, "get", down)
+    assert mf.load_list()["total"] == 2
+    assert mf.load_list()["total"] == 2
+    assert len(calls) == 1
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+import news_index as ni
+import news_service as ns
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(ns, "_PATH", str(tmp_path / "news.json"))
+    monkeypatch.setattr(ns, "_loaded", True)
+    for d in (ns._articles, ns._by_key, ns._seen, ns._by_symbol):
+        d.clear()
+    monkeypatch.setattr(ns, "_fetch_feed", lambda *f: [])
+    monkeypatch.setattr(ns, "FEEDS", [("feed", "Feed", "#000")])
+    yield
+    for d in (ns._articles, ns._by_key, ns._seen, ns._by_symbol):
+        d.clear()
+    ns._changed()
+
+
+def _feed(items, monkeypatch):
+    monkeypatch.setattr(ns, "_fetch_feed", lambda *f: items)
+
+
+def test_feed_copy_replaces_ingested_headline(store, monkeypatch):
+    now = time.time()
+    ns.ingest([{"title": "Infosys wins large deal", "link": "y", "ts": now}], "yahoo", "INFY.NS")
+    assert ns.latest() == []
+    _feed([{"title": "Infosys wins large deal", "source": "ET", "color": "#f97316", "link": "et",
+            "published": "", "ts": now, "symbols": []}], monkeypatch)
+    assert ns.poll_once() == 1
+    assert [a["link"] for a in ns.latest()] == ["et"]
+    assert [a["link"] for a in ns.for_symbol("INFY.NS")] == ["et"]
+    assert ni.search("infosys")[0]["origin"] is None
+
+
+def test_index_reuses_doc_ids(store, monkeypatch):
+    now = time.time()
+    for i in range(5):
+        _feed([{"title": f"Market update {i}", "source": "ET", "color": "", "link": str(i),
+                "published": "", "ts": now - ns.RETENTION_DAYS * 86400 + 5 + i * 1e-3, "symbols": []}],
+              monkeypatch)
+        ns.poll_once()
+    ni.search("market")
+    peak = ni._next_id
+    monkeypatch.setattr(ns.time, "time", lambda: now + 10)    # all of them expire
+    for i in range(5):
+        _feed([{"title": f"Market close {i}", "source": "ET", "color": "", "link": str(i),
+                "published": "", "ts": now, "symbols": []}], monkeypatch)
+        ns.poll_once()
+    assert len(ni.search("market")) == 5
+    assert ni._next_id == peak
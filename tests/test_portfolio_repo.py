@@ -0,0 +1,25 @@
+import portfolio_repo as repo
+import portfolio_store
+
+
+class SlowStore(portfolio_store.SQLiteStore):
+    """Runs `during_read` after reading holdings, before load() caches them."""
+
+    during_read = None
+
+    def holdings(self, owner):
+        rows = super().holdings(owner)
+        if self.during_read:
+            fn, self.during_read = self.during_read, None
+            fn()
+        return rows
+
+
+def test_read_overlapping_a_write_is_not_cached(tmp_path, monkeypatch):
+    st = SlowStore(str(tmp_path / "p.db"))
+    monkeypatch.setattr(repo, "_store", st)
+    repo.clear()
+    repo.save("Alice", "INFY.NS", 1, 100, 1)
+    st.during_read = lambda: repo.save("alice", "TCS.NS", 2, 200, 2)
+    assert [h["symbol"] for h in repo.load("alice")] == ["INFY.NS"]      # read before the write
+    assert [h["symbol"] for h in repo.load("alice")] == ["INFY.NS", "TCS.NS"]
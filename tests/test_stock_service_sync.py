@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import candle_store as cs
+import stock_service as ss
+
+
+class FakeTicker:
+    def __init__(self, hist):
+        self.hist = hist
+        self.calls = []
+        self.starts = []
+
+    def history(self, period=None, start=None, interval="1d", **kw):
+        self.calls.append(period or "delta")
+        self.starts.append(start)
+        if start is None:
+            return self.hist
+        return self.hist[self.hist.index >= pd.Timestamp(start)]
+
+
+def _daily(n, factor=1.0):
+    idx = pd.date_range("2024-01-01", periods=n, freq="D", tz="Asia/Kolkata")
+    c = (100.0 + np.arange(n)) * factor
+    return pd.DataFrame({"Open": c, "High": c, "Low": c, "Close": c,
+                         "Volume": np.full(n, 10.0)}, index=idx)
+
+
+@pytest.fixture
+def ticker(tmp_path, monkeypatch):
+    monkeypatch.setattr(cs, "_DIR", str(tmp_path))
+    t = FakeTicker(_daily(30))
+    monkeypatch.setattr(ss, "_ticker", lambda symbol: t)
+    return t
+
+
+def test_delta_sync_appends(ticker):
+    ss._sync_candles("ABC.NS", "1d")
+    ticker.hist = _daily(32)
+    os.utime(cs._path("ABC.NS", "1d"), (0, 0))    # stale
+    arr = ss._sync_candles("ABC.NS", "1d")
+    assert ticker.calls == ["max", "delta"]
+    assert len(arr) == 32
+
+
+def test_split_refetches_full_history(ticker):
+    ss._sync_candles("ABC.NS", "1d")
+    ticker.hist = _daily(31, factor=0.5)            # split: whole history re-based
+    os.utime(cs._path("ABC.NS", "1d"), (0, 0))
+    arr = ss._sync_candles("ABC.NS", "1d")
+    assert ticker.calls == ["max", "delta", "max"]
+    assert np.allclose(arr["close"], ticker.hist["Close"].to_numpy())
+
+
+class FakeDownload:
+    def __init__(self, hists):
+        self.hists = hists
+        self.calls = []
+
+    def __call__(self, syms, period=None, start=None, **kw):
+        self.calls.append((tuple(syms), period or "delta"))
+        frames = {s: self.hists[s] if start is None else self.hists[s][self.hists[s].index >= pd.Timestamp(start)]
+                  for s in syms}
+        return pd.concat(frames, axis=1)
+
+
+def test_prefetch_rebased_symbol_is_replaced(tmp_path, monkeypatch):
+    monkeypatch.setattr(cs, "_DIR", str(tmp_path))
+    dl = FakeDownload({"A.NS": _daily(30), "B.NS": _daily(30)})
+    monkeypatch.setattr(ss.yf, "download", dl)
+    ss.prefetch_daily(["A.NS", "B.NS"])
+    dl.hists = {"A.NS": _daily(31), "B.NS": _daily(31, factor=0.5)}
+    for s in ("A.NS", "B.NS"):
+        os.utime(cs._path(s, "1d"), (0, 0))
+    ss.prefetch_daily(["A.NS", "B.NS"])
+    assert dl.calls[1:] == [(("A.NS", "B.NS"), "delta"), (("B.NS",), "max")]
+    assert np.allclose(cs.load("A.NS", "1d")["close"], dl.hists["A.NS"]["Close"].to_numpy())
+    assert np.allclose(cs.load("B.NS", "1d")["close"], dl.hists["B.NS"]["Close"].to_numpy())
+
+
+def test_prefetch_skips_symbols_in_flight(tmp_path, monkeypatch):
+    monkeypatch.setattr(cs, "_DIR", str(tmp_path))
+    dl = FakeDownload({"A.NS": _daily(30), "B.NS": _daily(30)})
+    monkeypatch.setattr(ss.yf, "download", dl)
+    with cs.lock("B.NS", "1d"):                      # another caller is syncing B
+        ss.prefetch_daily(["A.NS", "B.NS"])
+    assert dl.calls == [(("A.NS",), "max")]
+    assert cs.lock("A.NS", "1d").acquire(blocking=False)
+    cs.lock("A.NS", "1d").release()
+
+
+def test_intraday_store_past_the_window_is_refetched(tmp_path, monkeypatch):
+    monkeypatch.setattr(cs, "_DIR", str(tmp_path))
+    now = pd.Timestamp.now(tz="UTC").floor("5min")
+    old = pd.date_range(now - pd.Timedelta(days=90), periods=10, freq="5min")
+    cs.save("ABC.NS", "5m", cs.from_history(pd.DataFrame(
+        {"Open": 1.0, "High": 1.0, "Low": 1.0, "Close": 1.0, "Volume": 1.0}, index=old)))
+    os.utime(cs._path("ABC.NS", "5m"), (0, 0))
+
+    recent = pd.date_range(now - pd.Timedelta(days=2), periods=10, freq="5min")
+    t = FakeTicker(pd.DataFrame({"Open": 2.0, "High": 2.0, "Low": 2.0, "Close": 2.0, "Volume": 1.0},
+                                index=recent))
+    monkeypatch.setattr(ss, "_ticker", lambda symbol: t)
+    arr = ss._sync_candles("ABC.NS", "5m")
+    assert len(t.starts) == 1                        # one fetch of the 31-day window, no delta from 90 days ago
+    assert pd.Timestamp(t.starts[0]) > now - pd.Timedelta(days=32)
+    assert len(arr) == 10 and (arr["close"] == 2.0).all()